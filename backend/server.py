@@ -1,16 +1,48 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 import os
-import requests
+import httpx
+import orjson
 import asyncio
+import json
+import time
+import hashlib
+import base64
+import math
+import re
+import heapq
+import random
+import bisect
+import unicodedata
+import mmap
+import struct
+import sys
+import threading
+import hmac
+import contextvars
+import uuid
+import fcntl
+import tempfile
+import gzip
+import functools
+import array
+from collections import Counter, OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any, Literal
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Dict, Any, Literal, Callable, Awaitable, Hashable, Union, Annotated
 import logging
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from pathlib import Path
 from dotenv import load_dotenv
 
+try:
+    import brotli
+except ImportError:  # A required dependency, but a missing wheel only costs br: responses fall back to gzip
+    brotli = None
+
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -21,8 +53,8 @@ logger = logging.getLogger(__name__)
 
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
-client = AsyncIOMotorClient(mongo_url)
-db = client.get_database('kingshit_fu')
+client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=int(os.environ.get('MONGO_TIMEOUT_MS', 2000)))
+db = client.get_database(os.environ.get('DB_NAME', 'kingshit_fu'))
 
 app = FastAPI(title="KingShit.fu API", description="Movie & TV Show Streaming Aggregator API with Casting Support")
 
@@ -67,10 +99,73 @@ class SearchResponse(BaseModel):
     total_pages: int
     content_type: Optional[str] = None
     platform_filter: Optional[str] = None
+    next_cursor: Optional[str] = None  # Opaque continuation token for filtered pagination
 
 class TrendingResponse(BaseModel):
     results: List[ContentResult]
 
+# Sub-requests accepted by POST /api/batch, discriminated by ``op``; the
+# fields mirror the query parameters of the matching GET route
+class BatchSearch(BaseModel):
+    op: Literal['search']
+    id: Optional[str] = None
+    q: str
+    page: int = Field(1, ge=1, le=500)
+    content_type: Literal['multi', 'movie', 'tv'] = 'multi'
+    platform: Optional[str] = None
+    cursor: Optional[str] = None
+
+class BatchTrending(BaseModel):
+    op: Literal['trending']
+    id: Optional[str] = None
+    content_type: Literal['all', 'movie', 'tv'] = 'all'
+
+class BatchPlatformContent(BaseModel):
+    op: Literal['platform']
+    id: Optional[str] = None
+    platform_key: str
+    content_type: Literal['multi', 'movie', 'tv'] = 'multi'
+    page: int = Field(1, ge=1, le=100)
+
+class BatchPlatforms(BaseModel):
+    op: Literal['platforms']
+    id: Optional[str] = None
+
+class BatchCastSupport(BaseModel):
+    op: Literal['cast-support']
+    id: Optional[str] = None
+
+BatchOperation = Union[BatchSearch, BatchTrending, BatchPlatformContent, BatchPlatforms, BatchCastSupport]
+
+class BatchRequest(BaseModel):
+    requests: List[Annotated[BatchOperation, Field(discriminator='op')]] = Field(..., min_length=1, max_length=16)
+
+# Fast path for data we built ourselves: responses are assembled with
+# ``model_construct`` (no validation) and items are projected onto
+# ContentResult's fields, so each item is walked once, by the encoder, instead
+# of two or three times.
+_CONTENT_RESULT_FIELDS = tuple(
+    (name, None if field.is_required() else field.default) for name, field in ContentResult.model_fields.items()
+)
+
+def trusted_results(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{name: item.get(name, default) for name, default in _CONTENT_RESULT_FIELDS} for item in items]
+
+def trusted_search_response(data: Dict[str, Any]) -> SearchResponse:
+    return SearchResponse.model_construct(**{**data, 'results': trusted_results(data['results'])})
+
+def trusted_trending_response(items: List[Dict[str, Any]]) -> TrendingResponse:
+    return TrendingResponse.model_construct(results=trusted_results(items))
+
+def _encode_model(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def encode_json(data: Any) -> bytes:
+    """Serialize plain data or trusted models with orjson"""
+    return orjson.dumps(data, default=_encode_model)
+
 # MASSIVELY EXPANDED free streaming platforms (35+ platforms!)
 SUPPORTED_PLATFORMS = {
     # Original Major Platforms
@@ -365,21 +460,1470 @@ SUPPORTED_PLATFORMS = {
     }
 }
 
-class TMDBClient:
+# TMDB watch-provider names that differ from our platform display names.
+# Names are compared lower-cased with non-alphanumerics removed.
+TMDB_PROVIDER_ALIASES = {
+    'tubitv': 'tubi',
+    'imdbtvamazonchannel': 'imdb',
+    'youtubefree': 'youtube',
+    'therokuchannel': 'roku',
+    'fandangoathomefree': 'vudu',
+    'vudufree': 'vudu',
+    'peacock': 'peacock',
+    'peacockpremium': 'peacock',
+    'plex': 'plex',
+    'plexchannel': 'plex',
+    'xumo': 'xumo',
+    'philo': 'philo',
+    'freevee': 'freevee',
+    'amazonfreevee': 'freevee',
+    'hoopla': 'hoopla',
+    'thecw': 'cw',
+    'redbox': 'redbox',
+    'cbssports': 'cbssports',
+    'haystacknews': 'haystack',
+    'asiancrush': 'asiantv',
+    'kocowa': 'kocowa',
+    'screambox': 'screambox',
+    'stadium': 'stadium'
+}
+
+class PlatformRegistry:
+    """``SUPPORTED_PLATFORMS`` compiled once at startup for the per-item hot path.
+
+    Holds the eligible platform keys per content type, per-platform URL
+    prefixes, and cast capabilities as integer bitmasks. Aggregating cast
+    support across a title's platforms is a bitwise OR, and the resulting
+    ``cast_support`` dicts are prebuilt per mask and shared by every response.
+    """
+
+    CAST_TYPES = ('chromecast', 'airplay', 'dlna')
+    CONTENT_TYPES = ('movie', 'tv')
+
+    def __init__(self, platforms: Dict[str, Dict[str, Any]]):
+        self.platforms = platforms
+        self.keys = frozenset(platforms)
+        self.eligible: Dict[str, List[str]] = {
+            content_type: [k for k, v in platforms.items() if content_type in v['content_types']]
+            for content_type in self.CONTENT_TYPES
+        }
+        self.url_prefix: Dict[tuple, str] = {
+            (k, content_type): f"{v['base_url']}/{content_type}/"
+            for k, v in platforms.items() for content_type in self.CONTENT_TYPES
+        }
+        self.cast_mask: Dict[str, int] = {
+            k: sum(1 << bit for bit, cast_type in enumerate(self.CAST_TYPES) if v.get('cast_support', {}).get(cast_type))
+            for k, v in platforms.items()
+        }
+        self._cast_support_by_mask: List[Dict[str, bool]] = [
+            {cast_type: bool(mask & (1 << bit)) for bit, cast_type in enumerate(self.CAST_TYPES)}
+            for mask in range(1 << len(self.CAST_TYPES))
+        ]
+        self.provider_platforms: Dict[str, str] = {
+            **{self.normalize_provider(v['name']): k for k, v in platforms.items()},
+            **{name: k for name, k in TMDB_PROVIDER_ALIASES.items() if k in platforms}
+        }
+        self.cast_stats: Dict[str, int] = {
+            **{
+                cast_type: sum(1 for mask in self.cast_mask.values() if mask & (1 << bit))
+                for bit, cast_type in enumerate(self.CAST_TYPES)
+            },
+            'total_platforms': len(platforms)
+        }
+
+    @staticmethod
+    def normalize_provider(name: str) -> str:
+        return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+    def platform_for_provider(self, provider_name: str) -> Optional[str]:
+        return self.provider_platforms.get(self.normalize_provider(provider_name or ''))
+
+    def entry(self, platform_key: str, content_type: str, content_id: int, quality: str) -> Dict[str, Any]:
+        info = self.platforms[platform_key]
+        return {
+            'platform': platform_key,
+            'name': info['name'],
+            'url': f"{self.url_prefix[platform_key, content_type]}{content_id}",
+            'quality': quality,
+            'cost': 'Free',
+            'description': info['description'],
+            'cast_support': info['cast_support']
+        }
+
+    def cast_support(self, platform_keys) -> Dict[str, bool]:
+        mask = 0
+        cast_mask = self.cast_mask
+        for platform_key in platform_keys:
+            mask |= cast_mask.get(platform_key, 0)
+        return self._cast_support_by_mask[mask]
+
+platform_registry = PlatformRegistry(SUPPORTED_PLATFORMS)
+
+def prometheus_labels(names: tuple, values: tuple) -> str:
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Histogram:
+    """Prometheus-style latency histogram keyed by a fixed tuple of label values.
+
+    ``observe`` is a bisect and three increments, so it is cheap enough to call
+    on every request; cumulative bucket counts are only built by ``render``.
+    """
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+
+    def observe(self, values: tuple, seconds: float):
+        series = self._series.get(values)
+        if series is None:
+            # Per-bucket counts, then the running sum and total count
+            series = self._series[values] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        series[bisect.bisect_left(self.buckets, seconds)] += 1
+        series[-2] += seconds
+        series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{prometheus_labels(self.labels + ("le",), values + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{prometheus_labels(self.labels, values)} {series[-2]}')
+            lines.append(f'{self.name}_count{prometheus_labels(self.labels, values)} {series[-1]}')
+        return lines
+
+def prometheus_metric(name: str, kind: str, documentation: str, labels: tuple, samples: Dict[tuple, Any]) -> List[str]:
+    """Render a counter or gauge family from {label values: value}"""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+    lines.extend(f'{name}{prometheus_labels(labels, values)} {value}' for values, value in samples.items())
+    return lines
+
+class UpstreamUnavailable(Exception):
+    """Upstream was not (or could not be) reached: throttled, circuit open, or out of retries"""
+
+class SearchPageUnreachable(Exception):
+    """A filtered page lies further into the upstream results than one request may read"""
+
+class TokenBucket:
+    """Request-rate limiter: ``rate`` tokens per second with bursts of up to ``capacity``.
+
+    ``acquire`` reserves a token ahead of time and sleeps until it is due, so
+    concurrent callers queue in arrival order instead of polling.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self.throttled = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self, max_wait: float) -> bool:
+        self._refill()
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        if wait > max_wait:
+            self.rejected += 1
+            return False
+        self.tokens -= 1
+        if wait:
+            self.throttled += 1
+            await asyncio.sleep(wait)
+        return True
+
+class RetryBudget:
+    """Limits retries and hedges to a fraction of first attempts.
+
+    Every first attempt deposits ``ratio`` of a token (up to ``max_balance``);
+    every retry or hedge spends a whole one, so a failing upstream sees at most
+    ``1 + ratio`` times normal traffic instead of ``1 + max_retries`` times.
+    """
+
+    def __init__(self, ratio: float, max_balance: float = 10.0):
+        self.ratio = ratio
+        self.max_balance = max_balance
+        self.balance = max_balance
+        self.spent = 0
+        self.exhausted = 0
+
+    def deposit(self):
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.balance < 1:
+            self.exhausted += 1
+            return False
+        self.balance -= 1
+        self.spent += 1
+        return True
+
+    def refund(self):
+        """Return a withdrawn token whose retry or hedge was not sent after all"""
+        self.balance = min(self.max_balance, self.balance + 1)
+        self.spent -= 1
+
+class CircuitBreaker:
+    """Opens after ``threshold`` consecutive failures and fails fast for ``cooldown`` seconds.
+
+    After the cooldown a single probe request is let through (half-open); its
+    outcome closes the circuit again or restarts the cooldown.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def probing(self) -> bool:
+        return self._probing
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+            self.state = self.HALF_OPEN
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+                logger.warning(f"Upstream circuit opened after {self.failures} consecutive failures")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+class LatencyTracker:
+    """Rolling window of response times with a periodically recomputed p95"""
+
+    def __init__(self, window: int = 256, min_samples: int = 20):
+        self.samples: deque = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.p95: Optional[float] = None
+        self._since_update = 0
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+        self._since_update += 1
+        if len(self.samples) >= self.min_samples and (self.p95 is None or self._since_update >= self.min_samples):
+            ordered = sorted(self.samples)
+            self.p95 = ordered[int(len(ordered) * 0.95) - 1]
+            self._since_update = 0
+
+class UpstreamHost:
+    """Per-origin governance state: concurrency slot, rate limit, breaker and latency"""
+
+    def __init__(self, name: str, max_concurrency: int, rate: float, burst: float, threshold: int, cooldown: float):
+        self.name = name
+        self.slot = asyncio.Semaphore(max_concurrency)
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(threshold, cooldown)
+        self.latency = LatencyTracker()
+        self.requests = 0
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'throttled': self.bucket.throttled,
+            'rate_limited': self.bucket.rejected,
+            'circuit': self.breaker.state,
+            'circuit_opened': self.breaker.opened,
+            'circuit_rejected': self.breaker.rejected,
+            'p95_ms': None if self.latency.p95 is None else round(self.latency.p95 * 1000, 1)
+        }
+
+class UpstreamClient:
+    """Long-lived async HTTP connection pool shared by every upstream call.
+
+    One ``httpx.AsyncClient`` is kept open for the life of the process so TCP and
+    TLS connections are reused (keep-alive) instead of being re-established per
+    request. ``max_per_host`` additionally caps concurrent requests to any single
+    origin so one slow host cannot exhaust the whole pool.
+
+    Each origin is also governed: requests are paced by a token bucket sized to
+    the API quota, 429/5xx/transport failures are retried with jittered backoff
+    out of a shared retry budget, a circuit breaker fails fast while the origin
+    is down, and a request still outstanding past the origin's p95 latency is
+    hedged with a second copy. When upstream cannot be reached
+    ``UpstreamUnavailable`` is raised so callers can fall back to cached data.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, pool_size: int = 100, max_per_host: int = 50, keepalive: int = 20,
+                 keepalive_expiry: float = 30.0, connect_timeout: float = 3.0, read_timeout: float = 10.0,
+                 rate_limit: float = 40.0, rate_burst: float = 40.0, queue_timeout: float = 2.0,
+                 max_retries: int = 2, retry_budget: float = 0.2, breaker_threshold: int = 5,
+                 breaker_cooldown: float = 30.0, hedge: bool = True, hedge_min_delay: float = 0.05):
+        self.pool_size = pool_size
+        self.max_per_host = max_per_host
+        self.limits = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(connect=connect_timeout, read=read_timeout, write=read_timeout, pool=connect_timeout)
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.budget = RetryBudget(retry_budget)
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts: Dict[str, UpstreamHost] = {}
+        self.latency = Histogram(
+            'upstream_request_duration_seconds', 'Upstream HTTP request latency, per attempt', ('host', 'status')
+        )
+        self.errors: Dict[tuple, int] = {}
+
+    @classmethod
+    def from_env(cls) -> 'UpstreamClient':
+        # The TMDB quota is per API key, so worker processes split it
+        workers = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+        return cls(
+            pool_size=int(os.environ.get('UPSTREAM_POOL_SIZE', 100)),
+            max_per_host=int(os.environ.get('UPSTREAM_MAX_PER_HOST', 50)),
+            keepalive=int(os.environ.get('UPSTREAM_KEEPALIVE', 20)),
+            keepalive_expiry=float(os.environ.get('UPSTREAM_KEEPALIVE_EXPIRY', 30)),
+            connect_timeout=float(os.environ.get('UPSTREAM_CONNECT_TIMEOUT', 3)),
+            read_timeout=float(os.environ.get('UPSTREAM_READ_TIMEOUT', 10)),
+            rate_limit=float(os.environ.get('UPSTREAM_RATE_LIMIT', 40)) / workers,
+            rate_burst=max(1.0, float(os.environ.get('UPSTREAM_RATE_BURST', 40)) / workers),
+            queue_timeout=float(os.environ.get('UPSTREAM_QUEUE_TIMEOUT', 2)),
+            max_retries=int(os.environ.get('UPSTREAM_MAX_RETRIES', 2)),
+            retry_budget=float(os.environ.get('UPSTREAM_RETRY_BUDGET', 0.2)),
+            breaker_threshold=int(os.environ.get('UPSTREAM_BREAKER_THRESHOLD', 5)),
+            breaker_cooldown=float(os.environ.get('UPSTREAM_BREAKER_COOLDOWN', 30)),
+            hedge=os.environ.get('UPSTREAM_HEDGE', 'true').lower() == 'true',
+            hedge_min_delay=float(os.environ.get('UPSTREAM_HEDGE_MIN_DELAY', 0.05))
+        )
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    def _host(self, url: str) -> UpstreamHost:
+        name = httpx.URL(url).host
+        host = self._hosts.get(name)
+        if host is None:
+            host = self._hosts[name] = UpstreamHost(
+                name, self.max_per_host, self.rate_limit, self.rate_burst, self.breaker_threshold, self.breaker_cooldown
+            )
+        return host
+
+    async def _send(self, host: UpstreamHost, url: str, params: Dict[str, Any], headers: Dict[str, str]) -> httpx.Response:
+        async with host.slot:
+            started = time.perf_counter()
+            response = await self.client.get(url, params=params, headers=headers)
+            elapsed = time.perf_counter() - started
+            host.latency.record(elapsed)
+            self.latency.observe((host.name, str(response.status_code)), elapsed)
+            return response
+
+    async def _attempt(self, host: UpstreamHost, url: str, params: Dict[str, Any],
+                       headers: Dict[str, str]) -> httpx.Response:
+        """One paced attempt, hedged with a second copy if it outlives the host's p95"""
+        if not await host.bucket.acquire(self.queue_timeout):
+            raise UpstreamUnavailable(f"{host.name}: rate limit queue is full")
+        tasks = {asyncio.ensure_future(self._send(host, url, params, headers))}
+        hedge = None
+        try:
+            if self.hedge and host.latency.p95 is not None:
+                done, _ = await asyncio.wait(tasks, timeout=max(self.hedge_min_delay, host.latency.p95))
+                # Spend the retry budget first: a refused hedge must not burn a rate-limit token
+                if not done and self.budget.withdraw():
+                    if host.bucket.try_acquire():
+                        host.hedges += 1
+                        hedge = asyncio.ensure_future(self._send(host, url, params, headers))
+                        tasks.add(hedge)
+                    else:
+                        self.budget.refund()
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer a successful copy; surface an error only once every copy has failed
+                for task in sorted(done, key=lambda task: task.exception() is not None):
+                    if task.exception() is None or not tasks:
+                        if task is hedge:
+                            host.hedge_wins += 1
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 5.0)
+        # Full jitter keeps synchronized clients from retrying in lockstep
+        return random.uniform(0, min(2.0, 0.1 * 2 ** attempt))
+
+    def _record_error(self, host: UpstreamHost, reason: str):
+        key = (host.name, reason)
+        self.errors[key] = self.errors.get(key, 0) + 1
+
+    async def get(self, url: str, params: Dict[str, Any] = None, headers: Dict[str, str] = None) -> httpx.Response:
+        host = self._host(url)
+        if not host.breaker.allow():
+            self._record_error(host, 'circuit_open')
+            raise UpstreamUnavailable(f"{host.name}: circuit open")
+        host.requests += 1
+        self.budget.deposit()
+        probe = host.breaker.probing
+        attempt = 0
+        try:
+            while True:
+                response, error = None, None
+                try:
+                    response = await self._attempt(host, url, params, headers)
+                except httpx.TransportError as e:
+                    error = e
+                    self._record_error(host, type(e).__name__)
+                except UpstreamUnavailable:
+                    self._record_error(host, 'rate_limited')
+                    raise
+                if response is not None and response.status_code >= 400:
+                    self._record_error(host, str(response.status_code))
+                if response is not None and response.status_code not in self.RETRY_STATUSES:
+                    host.breaker.record_success()
+                    return response
+                host.breaker.record_failure()
+                failure = error or f"HTTP {response.status_code}"
+                if attempt >= self.max_retries or host.breaker.state != CircuitBreaker.CLOSED or not self.budget.withdraw():
+                    raise UpstreamUnavailable(f"{host.name}: {failure}") from error
+                attempt += 1
+                host.retries += 1
+                await asyncio.sleep(self._backoff(attempt, response))
+        finally:
+            # A probe that ended without an outcome (rate-limited, cancelled) must
+            # not hold the half-open slot forever; count it as failed
+            if probe and host.breaker.probing:
+                host.breaker.record_failure()
+
+    async def get_json(self, url: str, params: Dict[str, Any] = None, headers: Dict[str, str] = None) -> Dict[str, Any]:
+        response = await self.get(url, params=params, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    def render_metrics(self) -> List[str]:
+        hosts = self._hosts.values()
+        return [
+            *self.latency.render(),
+            *prometheus_metric('upstream_errors_total', 'counter', 'Upstream failures by host and reason',
+                               ('host', 'reason'), self.errors),
+            *prometheus_metric('upstream_retries_total', 'counter', 'Upstream retries', ('host',),
+                               {(host.name,): host.retries for host in hosts}),
+            *prometheus_metric('upstream_hedges_total', 'counter', 'Hedged upstream requests sent', ('host',),
+                               {(host.name,): host.hedges for host in hosts}),
+            *prometheus_metric('upstream_circuit_open', 'gauge', '1 while the host circuit breaker is not closed',
+                               ('host',), {(host.name,): int(host.breaker.state != CircuitBreaker.CLOSED) for host in hosts})
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'retry_budget': round(self.budget.balance, 2),
+            'retry_budget_exhausted': self.budget.exhausted,
+            'hosts': {name: host.stats() for name, host in self._hosts.items()}
+        }
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# Seconds, or a function of the loaded value giving seconds (None for the default)
+TTLSpec = Union[None, float, Callable[[Any], Optional[float]]]
+
+class TTLCache:
+    """Bounded in-memory cache with per-entry TTL, LRU eviction and single-flight loads.
+
+    Capacity is capped by entry count and, optionally, by the approximate
+    serialized size of the stored values. Concurrent ``get_or_load`` calls for the
+    same missing key share one loader invocation instead of each going upstream.
+    With ``stale_ttl`` set, expired entries are kept that much longer and are
+    returned by ``get_or_load`` when the loader fails (stale-if-error). A cache
+    attached to a ``SharedCache`` with ``share`` checks it before loading and
+    publishes what it loads, so worker processes fill it for each other.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int = 1024, max_bytes: int = 0,
+                 sizeof: Callable[[Any], int] = None, stale_ttl: float = 0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: len(json.dumps(value, default=str)))
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_served = 0
+        self.shared: Optional['SharedCache'] = None
+        self._codec: Optional[tuple] = None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def share(self, shared: 'SharedCache', encode: Callable[[Any], bytes], decode: Callable[[bytes], Any]):
+        """Back this cache with the cross-process tier; ``encode``/``decode`` convert values to bytes"""
+        self.shared = shared
+        self._codec = (encode, decode)
+        shared.on_invalidate(self.name, self.invalidate)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: TTLSpec) -> Any:
+        if self.shared is None:
+            value = await loader()
+            if value is not None:
+                self.set(key, value, ttl(value) if callable(ttl) else ttl)
+            return value
+        generation = self.shared.generation(self.name)
+        shared_key = orjson.dumps(key)
+        found = await self.shared.get(self.name, shared_key)
+        if found is not None:
+            value, ttl = self._codec[1](found[0]), found[1]
+        else:
+            value = await loader()
+            if value is None:
+                return None
+            if callable(ttl):
+                ttl = ttl(value)
+            await self.shared.set(self.name, shared_key, self._codec[0](value), self.ttl if ttl is None else ttl,
+                                  generation)
+        # Don't keep a value loaded across an invalidation
+        if self.shared.generation(self.name) == generation:
+            self.set(key, value, ttl)
+        return value
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, size, value = entry
+        now = time.monotonic()
+        if expires_at < now:
+            if expires_at + self.stale_ttl < now:
+                self._remove(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float = None):
+        size = self.sizeof(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), size, value)
+        self.bytes += size
+        while len(self._data) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def loading(self, key: Hashable) -> bool:
+        """Whether a ``get_or_load`` for ``key`` is in flight"""
+        return key in self._inflight
+
+    def get_stale(self, key: Hashable) -> Any:
+        """Return an entry that is expired but still inside its stale window"""
+        entry = self._data.get(key)
+        if entry is None or entry[0] + self.stale_ttl < time.monotonic():
+            return None
+        return entry[2]
+
+    def invalidate(self, key: Hashable = None):
+        if key is None:
+            self._data.clear()
+            self.bytes = 0
+        elif key in self._data:
+            self._remove(key)
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+    async def _load_or_stale(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: TTLSpec) -> Any:
+        try:
+            return await self._load(key, loader, ttl)
+        except Exception:
+            stale = self.get_stale(key)
+            if stale is None:
+                raise
+            self.stale_served += 1
+            return stale
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: TTLSpec = None) -> Any:
+        """Return the cached value or load it once for all concurrent callers.
+
+        ``ttl`` overrides the cache's own, either as seconds or as a function of
+        the loaded value (returning None keeps the default). The load runs in a
+        task of its own that every caller, the first included, waits on through
+        ``shield``: a cancelled caller stops waiting without cancelling the load
+        for the others, and a load nobody waits for anymore still fills the cache.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        else:
+            pending = self._inflight[key] = asyncio.ensure_future(self._load_or_stale(key, loader, ttl))
+
+            def finished(task: asyncio.Task):
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                if not task.cancelled():
+                    task.exception()  # Mark retrieved so a load whose callers all left doesn't log
+
+            pending.add_done_callback(finished)
+        return await asyncio.shield(pending)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'stale_served': self.stale_served,
+            'inflight': len(self._inflight)
+        }
+
+class SharedCacheStore:
+    """The shared tier's entries: byte keys and values per namespace, bounded by total size.
+
+    Each namespace has a generation. ``invalidate`` drops the namespace and bumps
+    its generation, and a ``set`` tagged with an older generation is refused, so
+    a load that started before an invalidation can't repopulate it with old data.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self.generations: Dict[str, int] = {}
+        self.evictions = 0
+        self.rejected = 0
+
+    def get(self, namespace: str, key: bytes) -> Optional[tuple]:
+        """Return (value, remaining ttl) or None"""
+        entry = self._data.get((namespace, key))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        remaining = expires_at - time.monotonic()
+        if remaining <= 0:
+            self._remove((namespace, key))
+            return None
+        self._data.move_to_end((namespace, key))
+        return value, remaining
+
+    def set(self, namespace: str, key: bytes, value: bytes, ttl: float, generation: int) -> bool:
+        if generation != self.generations.get(namespace, 0):
+            self.rejected += 1
+            return False
+        if len(value) > self.max_bytes:
+            return False
+        self._remove((namespace, key))
+        self._data[(namespace, key)] = (time.monotonic() + ttl, value)
+        self.bytes += len(value)
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+        return True
+
+    def invalidate(self, namespace: str) -> int:
+        for entry in [entry for entry in self._data if entry[0] == namespace]:
+            self._remove(entry)
+        self.generations[namespace] = generation = self.generations.get(namespace, 0) + 1
+        return generation
+
+    def _remove(self, entry: tuple):
+        removed = self._data.pop(entry, None)
+        if removed is not None:
+            self.bytes -= len(removed[1])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self._data),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'evictions': self.evictions,
+            'rejected_sets': self.rejected,
+            'generations': self.generations
+        }
+
+class SharedCache:
+    """Cache tier shared by the worker processes on one host, served over a Unix socket.
+
+    Workers elect a leader with an exclusive ``flock`` on ``<path>.lock``; the
+    leader serves a ``SharedCacheStore`` from its own event loop and every
+    worker, the leader included, talks to it through the socket. If the leader
+    exits its lock is released and the next worker to notice takes over with
+    an empty store. Mongo stays the durable tier behind this one.
+
+    Every worker holds a subscription connection. Invalidations are pushed over
+    it so each worker drops its in-process copies of that namespace, and on
+    (re)connecting a worker adopts the leader's generations and drops all of
+    them, since it may have missed pushes. Like the catalog, every operation
+    fails soft: errors count as misses and the tier is skipped for ``backoff``
+    seconds.
+    """
+
+    # Request: op, namespace length, key length, value length, generation, ttl
+    REQUEST = struct.Struct('!BBHIQd')
+    # Response: status, value length, generation, remaining ttl
+    RESPONSE = struct.Struct('!BIQd')
+    GET, SET, INVALIDATE, SUBSCRIBE, STATS = range(1, 6)
+    OK, MISS, REJECTED, PUSH = range(4)
+    POOL_SIZE = 16
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, timeout: float = 0.5, backoff: float = 5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.backoff = backoff
+        self.store: Optional[SharedCacheStore] = None
+        self.generations: Dict[str, int] = {}
+        self._listeners: Dict[str, List[Callable[[], None]]] = {}
+        self._lead_callbacks: List[Callable[[], None]] = []
+        self._idle: List[tuple] = []
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set = set()
+        self._subscribers: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._unavailable_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.invalidations = 0
+
+    @property
+    def leader(self) -> bool:
+        return self._server is not None
+
+    def on_invalidate(self, namespace: str, callback: Callable[[], None]):
+        """Call ``callback`` whenever ``namespace`` is invalidated by any worker"""
+        self._listeners.setdefault(namespace, []).append(callback)
+
+    def on_lead(self, callback: Callable[[], None]):
+        """Call ``callback`` when this process becomes the leader, at startup or on failover"""
+        self._lead_callbacks.append(callback)
+
+    def generation(self, namespace: str) -> int:
+        return self.generations.get(namespace, 0)
+
+    async def _lead(self) -> bool:
+        """Become the leader if no other process holds the lock"""
+        if self._server is not None:
+            return True
+        lock = open(f"{self.path}.lock", 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock.close()
+            return False
+        self._lock_file = lock
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Left behind by a leader that died
+        self.store = SharedCacheStore(self.max_bytes)
+        self._server = await asyncio.start_unix_server(self._serve, path=self.path)
+        logger.info(f"Serving the shared cache on {self.path} (pid {os.getpid()})")
+        for callback in self._lead_callbacks:
+            callback()
+        return True
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                op, ns_len, key_len, value_len, generation, ttl = self.REQUEST.unpack(
+                    await reader.readexactly(self.REQUEST.size)
+                )
+                payload = await reader.readexactly(ns_len + key_len + value_len)
+                namespace = payload[:ns_len].decode()
+                key, value = payload[ns_len:ns_len + key_len], payload[ns_len + key_len:]
+                if op == self.SUBSCRIBE:
+                    self._subscribers.add(writer)
+                    # Start the subscriber off with every current generation
+                    writer.write(self._push_frame('', 0))
+                    for name, current in self.store.generations.items():
+                        writer.write(self._push_frame(name, current))
+                    continue
+                if op == self.GET:
+                    found = self.store.get(namespace, key)
+                    frame = (self.RESPONSE.pack(self.MISS, 0, 0, 0) if found is None
+                             else self.RESPONSE.pack(self.OK, len(found[0]), 0, found[1]) + found[0])
+                elif op == self.SET:
+                    stored = self.store.set(namespace, key, value, ttl, generation)
+                    frame = self.RESPONSE.pack(self.OK if stored else self.REJECTED, 0, 0, 0)
+                elif op == self.INVALIDATE:
+                    current = self.store.invalidate(namespace)
+                    for subscriber in list(self._subscribers):
+                        subscriber.write(self._push_frame(namespace, current))
+                    frame = self.RESPONSE.pack(self.OK, 0, current, 0)
+                else:
+                    stats = encode_json(self.store.stats())
+                    frame = self.RESPONSE.pack(self.OK, len(stats), 0, 0) + stats
+                writer.write(frame)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            pass  # Loop shutting down; returning quietly avoids asyncio logging the cancelled handler
+        finally:
+            self._connections.discard(writer)
+            self._subscribers.discard(writer)
+            writer.close()
+
+    def _push_frame(self, namespace: str, generation: int) -> bytes:
+        encoded = namespace.encode()
+        return self.RESPONSE.pack(self.PUSH, len(encoded), generation, 0) + encoded
+
+    async def _connect(self) -> tuple:
+        try:
+            return await asyncio.wait_for(asyncio.open_unix_connection(self.path), self.timeout)
+        except (OSError, asyncio.TimeoutError):
+            if not await self._lead():
+                raise
+            return await asyncio.wait_for(asyncio.open_unix_connection(self.path), self.timeout)
+
+    async def _request(self, op: int, namespace: str = '', key: bytes = b'', value: bytes = b'',
+                       generation: int = 0, ttl: float = 0) -> Optional[tuple]:
+        """Send one request; returns (status, generation, remaining ttl, payload) or None on failure"""
+        if time.monotonic() < self._unavailable_until:
+            return None
+        connection = None
+        try:
+            connection = self._idle.pop() if self._idle else await self._connect()
+            reader, writer = connection
+            encoded = namespace.encode()
+            writer.write(self.REQUEST.pack(op, len(encoded), len(key), len(value), generation, ttl) + encoded + key + value)
+            status, length, generation, remaining = self.RESPONSE.unpack(
+                await asyncio.wait_for(reader.readexactly(self.RESPONSE.size), self.timeout)
+            )
+            payload = await asyncio.wait_for(reader.readexactly(length), self.timeout) if length else b''
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            if connection is not None:
+                connection[1].close()
+            self.errors += 1
+            self._unavailable_until = time.monotonic() + self.backoff
+            logger.warning(f"Shared cache unavailable, bypassing for {self.backoff:.0f}s: {e!r}")
+            return None
+        except BaseException:
+            # Cancelled mid-exchange: the connection may hold half a response
+            if connection is not None:
+                connection[1].close()
+            raise
+        if len(self._idle) < self.POOL_SIZE:
+            self._idle.append(connection)
+        else:
+            writer.close()
+        return status, generation, remaining, payload
+
+    async def get(self, namespace: str, key: bytes) -> Optional[tuple]:
+        """Return (value, remaining ttl) or None"""
+        reply = await self._request(self.GET, namespace, key)
+        if reply is None or reply[0] != self.OK:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return reply[3], reply[2]
+
+    async def set(self, namespace: str, key: bytes, value: bytes, ttl: float, generation: int):
+        await self._request(self.SET, namespace, key, value, generation, ttl)
+
+    async def invalidate(self, namespace: str):
+        """Drop ``namespace`` here, in the shared store and in every other worker"""
+        self.invalidations += 1
+        self._notify(namespace)
+        await self._request(self.INVALIDATE, namespace)
+
+    def _notify(self, namespace: str):
+        for callback in self._listeners.get(namespace, ()):
+            callback()
+
+    async def _subscribe(self):
+        while True:
+            writer = None
+            try:
+                reader, writer = await self._connect()
+                writer.write(self.REQUEST.pack(self.SUBSCRIBE, 0, 0, 0, 0, 0))
+                while True:
+                    status, length, generation, _ = self.RESPONSE.unpack(await reader.readexactly(self.RESPONSE.size))
+                    namespace = (await reader.readexactly(length)).decode() if length else ''
+                    if not namespace:
+                        # (Re)connected: pushes may have been missed, so start from a clean slate
+                        self.generations = {}
+                        for name in self._listeners:
+                            self._notify(name)
+                    elif self.generations.get(namespace) != generation:
+                        self.generations[namespace] = generation
+                        self._notify(namespace)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                logger.warning(f"Shared cache subscription lost, retrying in {self.backoff:.0f}s: {e!r}")
+            finally:
+                if writer is not None:
+                    writer.close()
+            for _, idle_writer in self._idle:
+                idle_writer.close()
+            self._idle.clear()
+            await asyncio.sleep(self.backoff)
+
+    async def start(self):
+        await self._lead()
+        if self._task is None:
+            self._task = asyncio.create_task(self._subscribe())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            # Followers see their connections drop and elect a new leader
+            for writer in list(self._connections):
+                writer.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        reply = await self._request(self.STATS)
+        return {
+            'path': self.path,
+            'leader': self.leader,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'errors': self.errors,
+            'invalidations': self.invalidations,
+            'store': orjson.loads(reply[3]) if reply is not None else None
+        }
+
+class AvailabilityIndex:
+    """In-memory platform availability store.
+
+    ``by_platform`` is the inverted index (platform key -> content keys) used to
+    answer platform filters with set intersections; ``by_content`` is the reverse
+    map (content key -> {platform key: quality}). Built platform lists are kept
+    per content key so repeated lookups are a single dictionary hit. New
+    assignments are tracked as dirty until they have been persisted; titles
+    whose provider lookup failed hold an empty placeholder and are tracked as
+    unresolved until a real assignment replaces it.
+    """
+
+    QUALITIES = ('HD', 'Full HD', '4K')
+
     def __init__(self):
+        self.by_platform: Dict[str, set] = {platform_key: set() for platform_key in platform_registry.keys}
+        self.by_content: Dict[str, Dict[str, str]] = {}
+        self._platform_lists: Dict[str, List[Dict[str, Any]]] = {}
+        self._dirty: set = set()
+        self.unresolved: set = set()
+
+    @staticmethod
+    def content_key(content_type: str, content_id: int) -> str:
+        return f"{content_type}:{content_id}"
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.by_content
+
+    def set(self, content_type: str, content_id: int, availability: Dict[str, str], persist: bool = True):
+        key = self.content_key(content_type, content_id)
+        for platform_key in self.by_content.get(key, ()):
+            self.by_platform[platform_key].discard(key)
+        availability = {k: q for k, q in availability.items() if k in platform_registry.keys}
+        self.by_content[key] = availability
+        for platform_key in availability:
+            self.by_platform[platform_key].add(key)
+        self._platform_lists.pop(key, None)
+        self.unresolved.discard(key)
+        if persist:
+            self._dirty.add(key)
+
+    def mark_unresolved(self, content_type: str, content_id: int):
+        """Give a title whose lookup failed an empty, unpersisted placeholder unless it already has data"""
+        key = self.content_key(content_type, content_id)
+        if key not in self.by_content:
+            self.set(content_type, content_id, {}, persist=False)
+            self.unresolved.add(key)
+
+    def any_unresolved(self, items: List[Dict[str, Any]]) -> bool:
+        return any(self.content_key(item['content_type'], item['id']) in self.unresolved for item in items)
+
+    def ensure(self, content_type: str, content_id: int) -> str:
+        """Return the content key, assigning availability if it has none yet"""
+        key = self.content_key(content_type, content_id)
+        if key not in self.by_content:
+            self.set(content_type, content_id, self._default_availability(content_type, content_id))
+        return key
+
+    @classmethod
+    def stable_availability(cls, content_type: str, content_id: int) -> Dict[str, str]:
+        """Availability derived only from hashes, so the same title always lands on the same platforms.
+
+        The platform count comes from a hash of the content key; platforms are
+        ranked, and each one's quality picked, by a hash of (content id, platform).
+        """
+        eligible = platform_registry.eligible.get(content_type, [])
+        if not eligible:
+            return {}
+        count_digest = hashlib.blake2b(f"{content_type}:{content_id}".encode(), digest_size=1).digest()
+        count = min(len(eligible), 2 + count_digest[0] % max(1, min(5, len(eligible)) - 1))
+        digests = {k: hashlib.blake2b(f"{content_id}:{k}".encode(), digest_size=4).digest() for k in eligible}
+        ranked = sorted(eligible, key=lambda k: digests[k][:3])
+        return {k: cls.QUALITIES[digests[k][3] % len(cls.QUALITIES)] for k in ranked[:count]}
+
+    def _default_availability(self, content_type: str, content_id: int) -> Dict[str, str]:
+        # Stable stand-in until real provider data exists
+        return self.stable_availability(content_type, content_id)
+
+    def platforms(self, content_type: str, content_id: int) -> List[Dict[str, Any]]:
+        key = self.ensure(content_type, content_id)
+        built = self._platform_lists.get(key)
+        if built is None:
+            built = self._platform_lists[key] = [
+                platform_registry.entry(platform_key, content_type, content_id, quality)
+                for platform_key, quality in self.by_content[key].items()
+            ]
+        return built
+
+    def on_platform(self, platform_key: str) -> set:
+        return self.by_platform.get(platform_key, set())
+
+    def load(self, docs: List[Dict[str, Any]]):
+        for doc in docs:
+            content_type, _, content_id = doc['_id'].partition(':')
+            self.set(content_type, int(content_id), doc.get('platforms', {}), persist=False)
+
+    def take_dirty(self) -> List[Dict[str, Any]]:
+        docs = [{'_id': key, 'platforms': self.by_content[key]} for key in self._dirty if key in self.by_content]
+        self._dirty.clear()
+        return docs
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'titles': len(self.by_content),
+            'pending_writes': len(self._dirty),
+            'by_platform': {k: len(v) for k, v in self.by_platform.items()}
+        }
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+CONTENT_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+@functools.lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content coding from an Accept-Encoding header; None means identity.
+
+    Honours q-values (``q=0`` refuses a coding) and ``*``; ties go to the
+    coding listed first in ``CONTENT_ENCODINGS``. Clients send a handful of
+    distinct headers, so results are memoized.
+    """
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(','):
+        coding, _, params = part.partition(';')
+        weight = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip()] = weight
+    wildcard = weights.get('*', 0.0)
+    best = max(CONTENT_ENCODINGS, key=lambda coding: weights.get(coding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def negotiated_body(request: Request, body: bytes, headers: Dict[str, str]) -> bytes:
+    """Compress ``body`` for the client when it's worth it, adding the matching headers"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body
+    headers['Vary'] = 'Accept-Encoding'
+    encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+    if encoding is None:
+        return body
+    headers['Content-Encoding'] = encoding
+    return compress_body(body, encoding)
+
+class PreparedResponse:
+    """A JSON body serialized once to bytes, with a strong content-hash ETag.
+
+    ``to_response`` answers a matching ``If-None-Match`` with an empty 304 so
+    repeat visits only cost headers on the wire. Bodies of at least
+    ``COMPRESS_MIN_BYTES`` are served compressed when the client accepts it;
+    each coding is compressed once and kept alongside the body, so cached
+    responses never pay for compression again. Every coding gets its own
+    ETag (``"<hash>-gzip"``), as distinct representations must.
+    """
+
+    __slots__ = ('body', 'etag', 'max_age', '_encoded')
+
+    def __init__(self, body: bytes, max_age: int = 0):
+        self.body = body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.max_age = max_age
+        self._encoded: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_data(cls, data: Any, max_age: int = 0) -> 'PreparedResponse':
+        """Serialize plain data or a model built with one of the ``trusted_*`` helpers"""
+        return cls(encode_json(data), max_age)
+
+    def __len__(self) -> int:
+        return len(self.body)
+
+    def pack(self) -> bytes:
+        return struct.pack('!I', self.max_age) + self.body
+
+    @classmethod
+    def unpack(cls, data: bytes) -> 'PreparedResponse':
+        return cls(data[4:], struct.unpack_from('!I', data)[0])
+
+    def encoded(self, encoding: str) -> bytes:
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = compress_body(self.body, encoding)
+        return body
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        return f'{self.etag[:-1]}-{encoding}"' if encoding else self.etag
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == '*':
+            return True
+        # Weak comparison, as RFC 9110 requires for If-None-Match. Any coding's
+        # tag validates: they all name the same underlying body.
+        prefix = self.etag[:-1] + '-'
+        return any(
+            tag == self.etag or (tag.startswith(prefix) and tag.endswith('"'))
+            for tag in (part.strip().removeprefix('W/') for part in if_none_match.split(','))
+        )
+
+    def to_response(self, request: Request) -> Response:
+        headers = {'Cache-Control': f'public, max-age={self.max_age}'}
+        encoding = None
+        if len(self.body) >= COMPRESS_MIN_BYTES:
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = negotiate_encoding(request.headers.get('accept-encoding'))
+        headers['ETag'] = self.variant_etag(encoding)
+        if self.matches(request.headers.get('if-none-match')):
+            return Response(status_code=304, headers=headers)
+        if encoding is None:
+            return Response(content=self.body, media_type='application/json', headers=headers)
+        headers['Content-Encoding'] = encoding
+        return Response(content=self.encoded(encoding), media_type='application/json', headers=headers)
+
+class TMDBMetadata:
+    """TMDB reference data (genre names, image configuration) loaded once.
+
+    Starts from built-in defaults, is replaced by whatever was last persisted,
+    and is refreshed from TMDB in the background. Enhancement only does
+    dictionary lookups against the tables held here.
+    """
+
+    DEFAULT_GENRES = {
+        'movie': {
+            28: "Action", 12: "Adventure", 16: "Animation", 35: "Comedy", 80: "Crime",
+            99: "Documentary", 18: "Drama", 10751: "Family", 14: "Fantasy", 36: "History",
+            27: "Horror", 10402: "Music", 9648: "Mystery", 10749: "Romance", 878: "Sci-Fi",
+            10770: "TV Movie", 53: "Thriller", 10752: "War", 37: "Western"
+        },
+        'tv': {
+            10759: "Action & Adventure", 16: "Animation", 35: "Comedy", 80: "Crime",
+            99: "Documentary", 18: "Drama", 10751: "Family", 10762: "Kids", 9648: "Mystery",
+            10763: "News", 10764: "Reality", 10765: "Sci-Fi & Fantasy", 10766: "Soap",
+            10767: "Talk", 10768: "War & Politics", 37: "Western"
+        }
+    }
+    DEFAULT_IMAGES = {
+        'secure_base_url': 'https://image.tmdb.org/t/p/',
+        'poster_sizes': ['w92', 'w154', 'w185', 'w342', 'w500', 'w780', 'original'],
+        'backdrop_sizes': ['w300', 'w780', 'w1280', 'original']
+    }
+
+    def __init__(self, poster_size: str = 'w500', backdrop_size: str = 'w1280', refresh_interval: float = 86400,
+                 retry_interval: float = 600):
+        self.poster_size = poster_size
+        self.backdrop_size = backdrop_size
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.refreshed_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self.load({'genres': self.DEFAULT_GENRES, 'images': self.DEFAULT_IMAGES})
+
+    @staticmethod
+    def _pick_size(sizes: List[str], wanted: str) -> str:
+        """Use ``wanted`` if offered, otherwise the closest width (or original)"""
+        if wanted in sizes:
+            return wanted
+        widths = [size for size in sizes if size.startswith('w') and size[1:].isdigit()]
+        if not widths or not wanted[1:].isdigit():
+            return 'original'
+        return min(widths, key=lambda size: abs(int(size[1:]) - int(wanted[1:])))
+
+    def load(self, doc: Dict[str, Any]):
+        self.genres: Dict[str, Dict[int, str]] = {
+            content_type: {int(genre_id): name for genre_id, name in table.items()}
+            for content_type, table in doc['genres'].items()
+        }
+        self.images: Dict[str, Any] = doc['images']
+        base_url = self.images['secure_base_url']
+        self.poster_base = base_url + self._pick_size(self.images['poster_sizes'], self.poster_size)
+        self.backdrop_base = base_url + self._pick_size(self.images['backdrop_sizes'], self.backdrop_size)
+
+    def dump(self) -> Dict[str, Any]:
+        # Mongo keys must be strings
+        return {
+            'genres': {ct: {str(k): v for k, v in table.items()} for ct, table in self.genres.items()},
+            'images': self.images
+        }
+
+    def size_for_width(self, kind: str, width: Optional[int]) -> str:
+        """The smallest ``kind`` image size at least ``width`` pixels wide, or the configured default"""
+        sizes = self.images.get(f'{kind}_sizes', [])
+        if width is None:
+            return self._pick_size(sizes, self.backdrop_size if kind == 'backdrop' else self.poster_size)
+        widths = sorted(int(size[1:]) for size in sizes if size.startswith('w') and size[1:].isdigit())
+        return next((f'w{candidate}' for candidate in widths if candidate >= width), 'original')
+
+    def genre_names(self, content_type: str, genre_ids: List[int]) -> List[str]:
+        table = self.genres.get(content_type, {})
+        return [table[genre_id] for genre_id in genre_ids if genre_id in table]
+
+    def poster_url(self, path: Optional[str]) -> Optional[str]:
+        return f"{self.poster_base}{path}" if path else None
+
+    def backdrop_url(self, path: Optional[str]) -> Optional[str]:
+        return f"{self.backdrop_base}{path}" if path else None
+
+    async def _run(self, fetch: Callable[[], Awaitable[Dict[str, Any]]],
+                   on_refresh: Callable[[Dict[str, Any]], Awaitable], on_change: Callable[[], Awaitable] = None):
+        while True:
+            try:
+                previous = self.dump()
+                self.load(await fetch())
+                self.refreshed_at = datetime.utcnow()
+                await on_refresh(self.dump())
+                if on_change is not None and self.dump() != previous:
+                    await on_change()
+                delay = self.refresh_interval
+            except Exception as e:
+                logger.error(f"TMDB metadata refresh failed, keeping current tables: {e}")
+                delay = self.retry_interval
+            await asyncio.sleep(delay)
+
+    def start(self, fetch: Callable[[], Awaitable[Dict[str, Any]]], on_refresh: Callable[[Dict[str, Any]], Awaitable],
+              on_change: Callable[[], Awaitable] = None):
+        """Refresh in the background; ``on_change`` runs after a refresh that altered the tables"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(fetch, on_refresh, on_change))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+class TMDBClient:
+    PAGE_SIZE = 28  # Limit to 28 results per page
+    MAX_UPSTREAM_PAGE = 500  # TMDB rejects page numbers above this
+    MAX_UPSTREAM_PAGES_PER_REQUEST = int(os.environ.get('SEARCH_FILTER_MAX_UPSTREAM_PAGES', 10))
+
+    def __init__(self, http: UpstreamClient, availability: AvailabilityIndex, metadata: TMDBMetadata,
+                 offline: 'OfflineCatalog'):
         self.api_key = os.environ.get('TMDB_API_KEY', '')
-        self.base_url = 'https://api.themoviedb.org/3'
+        # 'offline' serves the fixture catalog even when a key is configured
+        self.mode = os.environ.get('TMDB_MODE', 'live').lower()
+        self.offline = offline
+        self.base_url = os.environ.get('TMDB_BASE_URL', 'https://api.themoviedb.org/3').rstrip('/')
+        self.watch_region = os.environ.get('TMDB_WATCH_REGION', 'US')
+        self.http = http
+        self.availability = availability
+        self.metadata = metadata
+        self.enrichment_slots = asyncio.Semaphore(int(os.environ.get('ENRICH_CONCURRENCY', 8)))
+        # Expired upstream data is kept this much longer to serve while TMDB is unreachable
+        stale_ttl = float(os.environ.get('UPSTREAM_STALE_TTL', 24 * 3600))
+        self.provider_cache = TTLCache(
+            'watch_providers',
+            ttl=float(os.environ.get('WATCH_PROVIDER_TTL', 6 * 3600)),
+            max_entries=int(os.environ.get('WATCH_PROVIDER_CACHE_ENTRIES', 20000)),
+            stale_ttl=stale_ttl
+        )
+        self.tv_detail_cache = TTLCache(
+            'tv_details',
+            ttl=float(os.environ.get('TV_DETAIL_TTL', 24 * 3600)),
+            max_entries=int(os.environ.get('TV_DETAIL_CACHE_ENTRIES', 20000)),
+            stale_ttl=stale_ttl
+        )
+        self.upstream_pages = TTLCache('upstream_pages', ttl=300, max_entries=1024, stale_ttl=stale_ttl)
+        self.page_states = TTLCache('search_cursors', ttl=1800, max_entries=8192)
+        # Upstream result counts by (query, type), so the local index can tell how much of a query it covers
+        self.search_totals = TTLCache(
+            'search_totals', ttl=float(os.environ.get('SEARCH_TOTALS_TTL', 6 * 3600)), max_entries=8192
+        )
         self.headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         }
+
+    @property
+    def live(self) -> bool:
+        """Whether requests go to TMDB rather than the offline catalog"""
+        return bool(self.api_key) and self.mode != 'offline'
         
-    async def search_content(self, query: str, page: int = 1, content_type: str = 'multi', platform_filter: str = None) -> Dict[str, Any]:
+    async def search_content(self, query: str, page: int = 1, content_type: str = 'multi', platform_filter: str = None,
+                             cursor: Dict[str, Any] = None) -> Dict[str, Any]:
         """Search for movies and TV shows using TMDB API"""
-        if not self.api_key:
-            return self._mock_search_response(query, page, content_type, platform_filter)
+        if not self.live:
+            return self.offline.search(query, page, content_type, platform_filter)
             
         try:
+            default_type = content_type if content_type in ('movie', 'tv') else 'movie'
+            if platform_filter:
+                data = await self._search_filtered(query, page, content_type, platform_filter, cursor)
+            else:
+                upstream_page = await self._fetch_search_page(query, page, content_type)
+                data = {
+                    'results': [item for _, item in upstream_page['items']][:self.PAGE_SIZE],
+                    'page': page,
+                    'total_results': upstream_page['total_results'],
+                    'total_pages': upstream_page['total_pages']
+                }
+            
+            # Enhance results with platform availability
+            data['results'] = await self._enhance_page(data['results'], default_type)
+            data['content_type'] = content_type
+            data['platform_filter'] = platform_filter
+            data['source'] = 'tmdb'
+            return data
+            
+        except (UpstreamUnavailable, SearchPageUnreachable):
+            raise  # The caller decides between a stale cached page and an error
+        except Exception as e:
+            logger.error(f"TMDB search error: {e}")
+            return self.offline.search(query, page, content_type, platform_filter)
+    
+    async def stream_search(self, query: str, page: int = 1, content_type: str = 'multi'):
+        """Yield an unfiltered page's header, then (position, item) pairs as each item is enhanced.
+
+        The header goes out as soon as the upstream page is in hand; items follow
+        in completion order, so the first one waits only on its own lookups.
+        """
+        default_type = content_type if content_type in ('movie', 'tv') else 'movie'
+        upstream_page = await self._fetch_search_page(query, page, content_type)
+        items = [item for _, item in upstream_page['items']][:self.PAGE_SIZE]
+        yield {
+            'page': page,
+            'total_results': upstream_page['total_results'],
+            'total_pages': upstream_page['total_pages'],
+            'content_type': content_type,
+            'platform_filter': None,
+            'source': 'tmdb',
+            'count': len(items)
+        }
+        
+        async def resolve(position: int, item: Dict[str, Any]):
+            return position, item, await self._resolve_item(item, default_type)
+        
+        for completed in asyncio.as_completed([resolve(position, item) for position, item in enumerate(items)]):
+            position, item, details = await completed
+            enhanced_item = await self._enhance_content_data(item, default_type, details)
+            if enhanced_item:
+                yield position, enhanced_item
+    
+    async def _fetch_search_page(self, query: str, page: int, content_type: str) -> Dict[str, Any]:
+        """Fetch one raw TMDB search page as (content key, item) pairs, cached briefly"""
+        cache_key = (' '.join(query.lower().split()), page, content_type)
+        
+        async def load() -> Dict[str, Any]:
             if content_type == 'multi':
                 url = f"{self.base_url}/search/multi"
             elif content_type == 'movie':
@@ -396,94 +1940,254 @@ class TMDBClient:
                 'include_adult': False
             }
             
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
+            data = await self.http.get_json(url, params=params)
             
-            # Enhance results with platform availability
-            enhanced_results = []
-            for item in data.get('results', []):
-                # Skip person results from multi search
-                if item.get('media_type') == 'person':
-                    continue
-                    
-                enhanced_item = await self._enhance_content_data(item, platform_filter)
-                if enhanced_item:  # Only add if platform filter matches
-                    enhanced_results.append(enhanced_item)
+            # Skip person results from multi search
+            default_type = content_type if content_type in ('movie', 'tv') else 'movie'
+            items = [item for item in data.get('results', []) if item.get('media_type') != 'person']
+            upstream_page = {
+                'items': [
+                    (self.availability.content_key(self._content_type(item, default_type), item.get('id')), item)
+                    for item in items
+                ],
+                'total_results': data.get('total_results', len(items)),
+                'total_pages': min(data.get('total_pages', 1), self.MAX_UPSTREAM_PAGE)
+            }
+            self.search_totals.set((cache_key[0], content_type), upstream_page['total_results'])
+            return upstream_page
+        
+        return await self.upstream_pages.get_or_load(cache_key, load)
+    
+    def upstream_total(self, query: str, content_type: str) -> Optional[int]:
+        """How many results TMDB reported for a query when it was last searched upstream"""
+        return self.search_totals.get((' '.join(query.lower().split()), content_type))
+    
+    async def _iter_matches(self, query: str, content_type: str, platform_filter: str, state: Dict[str, Any],
+                            budget: Dict[str, int]):
+        """Lazily walk upstream pages from ``state`` yielding platform matches.
+
+        ``state`` is advanced in place so that, whenever the caller stops
+        consuming, it points at the first unexamined upstream item.
+        ``budget['pages']`` is shared by every call made for one request and
+        charged once per upstream page, not again when a page picks up partway
+        through the one before it left off.
+        """
+        while state['u'] <= state.get('t', state['u']) and (budget['pages'] > 0 or state['o']):
+            if not state['o']:
+                budget['pages'] -= 1
+            upstream_page = await self._fetch_search_page(query, state['u'], content_type)
+            state['t'] = upstream_page['total_pages']
+            state['r'] = upstream_page['total_results']
             
-            data['results'] = enhanced_results[:28]  # Limit to 28 results per page
-            data['content_type'] = content_type
-            data['platform_filter'] = platform_filter
-            return data
-            
-        except Exception as e:
-            logger.error(f"TMDB search error: {e}")
-            return self._mock_search_response(query, page, content_type, platform_filter)
+            # Platform filter is a set intersection against the availability index
+            items = upstream_page['items']
+            default_type = content_type if content_type in ('movie', 'tv') else 'movie'
+            await self._resolve_items([item for _, item in items[state['o']:]], default_type)
+            matching = {key for key, _ in items} & self.availability.on_platform(platform_filter)
+            while state['o'] < len(items):
+                key, item = items[state['o']]
+                state['o'] += 1
+                state['s'] += 1
+                if key in matching:
+                    state['m'] += 1
+                    yield item
+            state['u'] += 1
+            state['o'] = 0
     
-    async def get_trending_content(self, content_type: str = 'all') -> Dict[str, Any]:
-        """Get trending movies and TV shows from TMDB"""
-        if not self.api_key:
-            return self._mock_trending_response(content_type)
-            
+    async def _search_filtered(self, query: str, page: int, content_type: str, platform_filter: str,
+                               cursor: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Fill a page with platform matches, continuing from where the previous page stopped"""
+        search_key = search_cache_key(query, 1, content_type, platform_filter)
+        state = dict(cursor) if cursor else self.page_states.get((search_key, page))
+        start_page = page
+        if state is None:
+            # Resume from the closest earlier page we know the start of
+            start_page = next(
+                (p for p in range(page - 1, 0, -1) if self.page_states.get((search_key, p)) is not None), 1
+            )
+            state = dict(self.page_states.get((search_key, start_page)) or {'u': 1, 'o': 0, 's': 0, 'm': 0})
+        
+        # One upstream budget covers the whole replay, not each page along the way
+        budget = {'pages': self.MAX_UPSTREAM_PAGES_PER_REQUEST}
+        for current_page in range(start_page, page + 1):
+            self.page_states.set((search_key, current_page), dict(state))
+            matches = []
+            stream = self._iter_matches(query, content_type, platform_filter, state, budget)
+            try:
+                async for item in stream:
+                    matches.append(item)
+                    if len(matches) == self.PAGE_SIZE:
+                        break
+            finally:
+                await stream.aclose()
+            if current_page < page and len(matches) < self.PAGE_SIZE and state['u'] <= state.get('t', 0):
+                # Out of budget short of the requested page; the states recorded so far
+                # let a retry (or the previous page's cursor) carry on from here
+                raise SearchPageUnreachable(
+                    f"Page {page} needs more than {self.MAX_UPSTREAM_PAGES_PER_REQUEST} upstream pages; "
+                    f"reached page {current_page}"
+                )
+            if current_page < page and not matches:
+                break
+        
+        exhausted = state['u'] > state.get('t', 0)
+        if current_page < page:
+            matches = []
+        if not exhausted:
+            self.page_states.set((search_key, page + 1), dict(state))
+        
+        if exhausted:
+            total_results = state['m']
+            total_pages = max(1, math.ceil(total_results / self.PAGE_SIZE))
+        else:
+            # Project the observed match rate onto the upstream total
+            ratio = state['m'] / state['s'] if state['s'] else 0
+            total_results = max(round(state.get('r', 0) * ratio), (page - 1) * self.PAGE_SIZE + len(matches) + 1)
+            total_pages = max(math.ceil(total_results / self.PAGE_SIZE), page + 1)
+        
+        return {
+            'results': matches,
+            'page': page,
+            'total_results': total_results,
+            'total_pages': total_pages,
+            'next_cursor': None if exhausted else encode_cursor(search_key, page + 1, state)
+        }
+    
+    async def fetch_metadata(self) -> Dict[str, Any]:
+        """Fetch genre lists for both content types and the image configuration"""
+        params = {'api_key': self.api_key}
+        movie_genres, tv_genres, configuration = await asyncio.gather(
+            self.http.get_json(f"{self.base_url}/genre/movie/list", params=params),
+            self.http.get_json(f"{self.base_url}/genre/tv/list", params=params),
+            self.http.get_json(f"{self.base_url}/configuration", params=params)
+        )
+        return {
+            'genres': {
+                'movie': {genre['id']: genre['name'] for genre in movie_genres.get('genres', [])},
+                'tv': {genre['id']: genre['name'] for genre in tv_genres.get('genres', [])}
+            },
+            'images': {**TMDBMetadata.DEFAULT_IMAGES, **configuration.get('images', {})}
+        }
+    
+    async def fetch_trending(self) -> List[Dict[str, Any]]:
+        """Fetch and enhance the weekly trending list across movies and TV.
+
+        Raises on upstream failure so callers can keep serving their last good copy.
+        """
+        if not self.live:
+            return self.offline.trending()
+
+        url = f"{self.base_url}/trending/all/week"
+        params = {'api_key': self.api_key}
+
+        data = await self.http.get_json(url, params=params)
+
+        # Enhance results with platform availability (skipping person results)
+        items = [item for item in data.get('results', []) if item.get('media_type') != 'person']
+        return await self._enhance_page(items)
+    
+    async def fetch_watch_providers(self, content_type: str, content_id: int) -> Dict[str, str]:
+        """Map a title's free/ad-supported TMDB watch providers onto platform keys"""
+        url = f"{self.base_url}/{content_type}/{content_id}/watch/providers"
+        data = await self.http.get_json(url, params={'api_key': self.api_key})
+        return self._map_watch_providers(content_type, content_id, data)
+    
+    def _map_watch_providers(self, content_type: str, content_id: int, data: Dict[str, Any]) -> Dict[str, str]:
+        region = data.get('results', {}).get(self.watch_region, {})
+        # TMDB has no stream quality; keep what we already knew, default to HD
+        known = self.availability.by_content.get(self.availability.content_key(content_type, content_id), {})
+        platforms = {}
+        for offer_type in ('free', 'ads'):
+            for provider in region.get(offer_type, []):
+                platform_key = platform_registry.platform_for_provider(provider.get('provider_name'))
+                if platform_key:
+                    platforms.setdefault(platform_key, known.get(platform_key, 'HD'))
+        return platforms
+    
+    async def fetch_tv_details(self, content_id: int) -> Dict[str, Any]:
+        """Fetch season/episode counts, with watch providers appended to the same call"""
+        url = f"{self.base_url}/tv/{content_id}"
+        params = {'api_key': self.api_key, 'append_to_response': 'watch/providers'}
+        data = await self.http.get_json(url, params=params)
+        if 'watch/providers' in data:
+            self.provider_cache.set(
+                ('tv', content_id), self._map_watch_providers('tv', content_id, data['watch/providers'])
+            )
+        return {'seasons': data.get('number_of_seasons'), 'episodes': data.get('number_of_episodes')}
+    
+    async def _tv_details(self, content_id: int) -> Optional[Dict[str, Any]]:
+        async def load() -> Dict[str, Any]:
+            async with self.enrichment_slots:
+                return await self.fetch_tv_details(content_id)
+        
         try:
-            if content_type == 'all':
-                url = f"{self.base_url}/trending/all/week"
-            elif content_type == 'movie':
-                url = f"{self.base_url}/trending/movie/week"
-            elif content_type == 'tv':
-                url = f"{self.base_url}/trending/tv/week"
-            else:
-                url = f"{self.base_url}/trending/all/week"
-                
-            params = {'api_key': self.api_key}
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Enhance results with platform availability
-            enhanced_results = []
-            for item in data.get('results', [])[:28]:  # Limit to 28 trending items
-                if item.get('media_type') == 'person':  # Skip person results
-                    continue
-                enhanced_item = await self._enhance_content_data(item)
-                if enhanced_item:
-                    enhanced_results.append(enhanced_item)
-            
-            return {'results': enhanced_results}
-            
+            return await self.tv_detail_cache.get_or_load(content_id, load)
         except Exception as e:
-            logger.error(f"TMDB trending error: {e}")
-            return self._mock_trending_response(content_type)
-    
-    async def _enhance_content_data(self, item: Dict[str, Any], platform_filter: str = None) -> Optional[Dict[str, Any]]:
-        """Enhance content data with genre names and platform availability"""
-        # Determine content type
-        content_type = item.get('media_type', 'movie')
-        if 'first_air_date' in item and item.get('first_air_date'):
-            content_type = 'tv'
-        elif 'release_date' in item and item.get('release_date'):
-            content_type = 'movie'
+            logger.warning(f"TV details lookup failed for tv/{content_id}: {e}")
+            return None
+    
+    async def _resolve_availability(self, content_type: str, content_id: int):
+        """Update the availability index for one title from its watch providers"""
+        if not self.live:
+            return
         
-        # Get genre names (simplified - in production you'd cache this)
-        genre_map = {
-            28: "Action", 35: "Comedy", 18: "Drama", 27: "Horror",
-            878: "Sci-Fi", 53: "Thriller", 10749: "Romance", 16: "Animation",
-            80: "Crime", 99: "Documentary", 10751: "Family", 14: "Fantasy",
-            36: "History", 10402: "Music", 9648: "Mystery", 10770: "TV Movie",
-            37: "Western", 10752: "War", 10759: "Action & Adventure",
-            10762: "Kids", 10763: "News", 10764: "Reality", 10765: "Sci-Fi & Fantasy",
-            10766: "Soap", 10767: "Talk", 10768: "War & Politics"
-        }
+        async def load() -> Dict[str, str]:
+            async with self.enrichment_slots:
+                return await self.fetch_watch_providers(content_type, content_id)
         
-        genre_names = [genre_map.get(genre_id, "Unknown") for genre_id in item.get('genre_ids', [])]
+        try:
+            platforms = await self.provider_cache.get_or_load((content_type, content_id), load)
+        except Exception as e:
+            logger.warning(f"Watch providers lookup failed for {content_type}/{content_id}: {e}")
+            self.availability.mark_unresolved(content_type, content_id)
+            return
+        key = self.availability.content_key(content_type, content_id)
+        if self.availability.by_content.get(key) != platforms:
+            self.availability.set(content_type, content_id, platforms)
+    
+    async def _resolve_item(self, item: Dict[str, Any], default_type: str) -> Optional[Dict[str, Any]]:
+        """Resolve availability (and TV details) for one title; returns the details"""
+        content_type = self._content_type(item, default_type)
+        details = None
+        if content_type == 'tv' and self.live:
+            # One details call also seeds the provider cache for this show
+            details = await self._tv_details(item.get('id'))
+        await self._resolve_availability(content_type, item.get('id'))
+        return details
+    
+    async def _resolve_items(self, items: List[Dict[str, Any]], default_type: str = 'movie') -> List[Optional[Dict[str, Any]]]:
+        return await asyncio.gather(*(self._resolve_item(item, default_type) for item in items))
+    
+    async def _enhance_page(self, items: List[Dict[str, Any]], default_type: str = 'movie') -> List[Dict[str, Any]]:
+        """Resolve a page's availability and TV details concurrently, then enhance preserving order"""
+        details = await self._resolve_items(items, default_type)
+        enhanced_results = []
+        for item, item_details in zip(items, details):
+            enhanced_item = await self._enhance_content_data(item, default_type, item_details)
+            if enhanced_item:
+                enhanced_results.append(enhanced_item)
+        return enhanced_results
+    
+    @staticmethod
+    def _content_type(item: Dict[str, Any], default: str = 'movie') -> str:
+        """Determine content type from media_type and the date fields present"""
+        if item.get('first_air_date'):
+            return 'tv'
+        if item.get('release_date'):
+            return 'movie'
+        return item.get('media_type', default)
+    
+    async def _enhance_content_data(self, item: Dict[str, Any], default_type: str = 'movie',
+                                    details: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """Enhance content data with genre names, platform availability and TV details"""
+        content_type = self._content_type(item, default_type)
+        details = details or {}
         
-        # Get platform availability
-        platforms = await self._get_platform_availability(item.get('id'), content_type, platform_filter)
+        # Get genre names from the cached TMDB genre lists
+        genre_names = self.metadata.genre_names(content_type, item.get('genre_ids', []))
         
-        # If platform filter is specified and no platforms match, skip this item
-        if platform_filter and not platforms:
-            return None
+        # Get platform availability
+        platforms = self._get_platform_availability(item.get('id'), content_type)
         
         # Get title based on content type
         title = item.get('title') if content_type == 'movie' else item.get('name', '')
@@ -495,8 +2199,8 @@ class TMDBClient:
             'id': item.get('id'),
             'title': title,
             'overview': item.get('overview', ''),
-            'poster_path': f"https://image.tmdb.org/t/p/w500{item.get('poster_path')}" if item.get('poster_path') else None,
-            'backdrop_path': f"https://image.tmdb.org/t/p/w1280{item.get('backdrop_path')}" if item.get('backdrop_path') else None,
+            'poster_path': self.metadata.poster_url(item.get('poster_path')),
+            'backdrop_path': self.metadata.backdrop_url(item.get('backdrop_path')),
             'release_date': item.get('release_date', ''),
             'first_air_date': item.get('first_air_date', ''),
             'vote_average': item.get('vote_average', 0),
@@ -504,319 +2208,2389 @@ class TMDBClient:
             'genre_names': genre_names,
             'platforms': platforms,
             'content_type': content_type,
-            'seasons': item.get('number_of_seasons') if content_type == 'tv' else None,
-            'episodes': item.get('number_of_episodes') if content_type == 'tv' else None,
+            'seasons': details.get('seasons', item.get('number_of_seasons')) if content_type == 'tv' else None,
+            'episodes': details.get('episodes', item.get('number_of_episodes')) if content_type == 'tv' else None,
             'cast_support': cast_support
         }
     
     def _get_cast_support(self, platforms: List[Dict[str, Any]]) -> Dict[str, bool]:
         """Aggregate casting support from all available platforms"""
-        cast_support = {
-            'chromecast': False,
-            'airplay': False,
-            'dlna': False
-        }
-        
-        for platform in platforms:
-            platform_key = platform.get('platform')
-            if platform_key in SUPPORTED_PLATFORMS:
-                platform_cast = SUPPORTED_PLATFORMS[platform_key].get('cast_support', {})
-                for cast_type, supported in platform_cast.items():
-                    if supported:
-                        cast_support[cast_type] = True
-        
-        return cast_support
+        return platform_registry.cast_support(platform['platform'] for platform in platforms)
     
-    async def _get_platform_availability(self, content_id: int, content_type: str, platform_filter: str = None) -> List[Dict[str, Any]]:
-        """Get platform availability for content (enhanced mock implementation)"""
-        import random
-        
-        available_platforms = []
-        
-        # Get platforms that support this content type
-        eligible_platforms = {}
-        for platform_key, platform_info in SUPPORTED_PLATFORMS.items():
-            if content_type in platform_info['content_types']:
-                eligible_platforms[platform_key] = platform_info
-        
-        # If platform filter is specified, only use that platform
-        if platform_filter and platform_filter in eligible_platforms:
-            platform_info = eligible_platforms[platform_filter]
-            available_platforms.append({
-                'platform': platform_filter,
-                'name': platform_info['name'],
-                'url': f"{platform_info['base_url']}/{content_type}/{content_id}",
-                'quality': random.choice(['HD', 'Full HD', '4K']),
-                'cost': 'Free',
-                'description': platform_info['description'],
-                'cast_support': platform_info['cast_support']
-            })
-        else:
-            # Random selection of platforms for mock data
-            platform_keys = list(eligible_platforms.keys())
-            if platform_keys:
-                num_platforms = random.randint(2, min(5, len(platform_keys)))
-                selected_platforms = random.sample(platform_keys, num_platforms)
-                
-                for platform_key in selected_platforms:
-                    platform_info = eligible_platforms[platform_key]
-                    available_platforms.append({
-                        'platform': platform_key,
-                        'name': platform_info['name'],
-                        'url': f"{platform_info['base_url']}/{content_type}/{content_id}",
-                        'quality': random.choice(['HD', 'Full HD', '4K']),
-                        'cost': 'Free',
-                        'description': platform_info['description'],
-                        'cast_support': platform_info['cast_support']
-                    })
-        
-        return available_platforms
-    
-    def _mock_search_response(self, query: str, page: int, content_type: str, platform_filter: str) -> Dict[str, Any]:
-        """Enhanced mock search response with movies and TV shows"""
-        mock_content = [
-            # Movies
-            {
-                'id': 603, 'title': 'The Matrix', 'overview': 'A computer programmer discovers reality is a simulation.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/f89U3ADr1oiB1s9GkdPOEpXUk5H.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/fNG7i7RqMErkcqhohV2a6cV1Ehy.jpg',
-                'release_date': '1999-03-30', 'vote_average': 8.7, 'vote_count': 24000,
-                'genre_names': ['Action', 'Sci-Fi'], 'content_type': 'movie'
-            },
-            {
-                'id': 27205, 'title': 'Inception', 'overview': 'A thief enters dreams to plant ideas.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/9gk7adHYeDvHkCSEqAvQNLV5Uge.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/s3TBrRGB1iav7gFOCNx3H31MoES.jpg',
-                'release_date': '2010-07-15', 'vote_average': 8.8, 'vote_count': 35000,
-                'genre_names': ['Action', 'Sci-Fi', 'Thriller'], 'content_type': 'movie'
-            },
-            # TV Shows
-            {
-                'id': 1399, 'title': 'Game of Thrones', 'overview': 'Noble families fight for the Iron Throne.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/7WUHnWGx5OO145IRxPDUkQSh4C7.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/suopoADq0k8YZr4dQXcU6pToj6s.jpg',
-                'first_air_date': '2011-04-17', 'vote_average': 9.2, 'vote_count': 45000,
-                'genre_names': ['Drama', 'Fantasy', 'Action & Adventure'], 'content_type': 'tv',
-                'seasons': 8, 'episodes': 73
-            },
-            {
-                'id': 1396, 'title': 'Breaking Bad', 'overview': 'A chemistry teacher becomes a meth manufacturer.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/ggFHVNu6YYI5L9pCfOacjizRGt.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/tsRy63Mu5cu8etL1X7ZLyf7UP1M.jpg',
-                'first_air_date': '2008-01-20', 'vote_average': 9.5, 'vote_count': 55000,
-                'genre_names': ['Drama', 'Crime', 'Thriller'], 'content_type': 'tv',
-                'seasons': 5, 'episodes': 62
-            }
+    def _get_platform_availability(self, content_id: int, content_type: str) -> List[Dict[str, Any]]:
+        """Get platform availability for content from the availability index"""
+        return self.availability.platforms(content_type, content_id)
+
+class OfflineCatalog:
+    """Deterministic stand-in for TMDB, built once at import.
+
+    Serves search and trending when running offline (``TMDB_MODE=offline`` or
+    no API key) and is the fallback when TMDB fails. A few well-known seed
+    titles are padded out to ``size`` generated ones. Every field, availability
+    included (``AvailabilityIndex.stable_availability``), comes from hashes
+    rather than random draws, so identical requests produce identical bodies
+    and ETags and are cached like live responses.
+    """
+
+    TRENDING_SIZE = 60
+    # (content_type, id, title, overview, date, genre ids, poster, backdrop, vote average, vote count, seasons, episodes)
+    SEEDS = [
+        ('movie', 155, 'The Dark Knight', 'Batman faces the Joker in Gotham City.', '2008-07-18', [28, 80, 18],
+         '/qJ2tW6WMUDux911r6m7haRef0WH.jpg', '/hqkIcbrOHL86UncnHIsHVcVmzue.jpg', 9.0, 32000, None, None),
+        ('tv', 1402, 'The Walking Dead', 'Survivors navigate a zombie apocalypse.', '2010-10-31', [10759, 18, 10765],
+         '/rqeYMLryjcawh2JeRpCVUDXYM5b.jpg', '/KoYWXbnYuS3b0GyQPkbuexlVK9.jpg', 8.1, 18000, 11, 177),
+        ('movie', 680, 'Pulp Fiction', 'Interconnected stories of crime in Los Angeles.', '1994-09-10', [80, 18],
+         '/d5iIlFn5s0ImszYzBPb8JPIfbXD.jpg', '/4cDFJr4HnXN5AdPw4AKrmLlMWdO.jpg', 8.9, 27000, None, None),
+        ('tv', 1408, 'House', 'Brilliant but misanthropic doctor solves medical mysteries.', '2004-11-16', [18, 9648],
+         '/3Cz7ySOQJmqiuTdrc6CY0r65yDI.jpg', '/cKrhEw44GJlBnFOmgGqTdwjC6wm.jpg', 8.6, 15000, 8, 176),
+        ('movie', 603, 'The Matrix', 'A computer programmer discovers reality is a simulation.', '1999-03-30', [28, 878],
+         '/f89U3ADr1oiB1s9GkdPOEpXUk5H.jpg', '/fNG7i7RqMErkcqhohV2a6cV1Ehy.jpg', 8.7, 24000, None, None),
+        ('movie', 27205, 'Inception', 'A thief enters dreams to plant ideas.', '2010-07-15', [28, 878, 53],
+         '/9gk7adHYeDvHkCSEqAvQNLV5Uge.jpg', '/s3TBrRGB1iav7gFOCNx3H31MoES.jpg', 8.8, 35000, None, None),
+        ('tv', 1399, 'Game of Thrones', 'Noble families fight for the Iron Throne.', '2011-04-17', [18, 10765, 10759],
+         '/7WUHnWGx5OO145IRxPDUkQSh4C7.jpg', '/suopoADq0k8YZr4dQXcU6pToj6s.jpg', 9.2, 45000, 8, 73),
+        ('tv', 1396, 'Breaking Bad', 'A chemistry teacher becomes a meth manufacturer.', '2008-01-20', [18, 80],
+         '/ggFHVNu6YYI5L9pCfOacjizRGt.jpg', '/tsRy63Mu5cu8etL1X7ZLyf7UP1M.jpg', 9.5, 55000, 5, 62)
+    ]
+    FIRST_GENERATED_ID = 10_000_000  # Well clear of real TMDB ids
+    ADJECTIVES = ('Silent', 'Broken', 'Golden', 'Hidden', 'Crimson', 'Midnight', 'Frozen', 'Lost', 'Wild', 'Electric',
+                  'Burning', 'Endless', 'Savage', 'Quiet', 'Final', 'Distant', 'Hollow', 'Iron', 'Velvet', 'Northern',
+                  'Perfect', 'Restless', 'Twisted', 'Little', 'Black', 'Bright', 'Deadly', 'Forgotten')
+    NOUNS = ('Night', 'River', 'Empire', 'Ghost', 'Summer', 'City', 'Storm', 'Legacy', 'Shadow', 'Heart', 'Knight',
+             'Star', 'Love', 'War', 'House', 'Dragon', 'King', 'Space', 'Detective', 'Island', 'Zombie', 'Family',
+             'Office', 'Crime', 'Queen', 'Planet', 'Robot', 'Frontier', 'Secret', 'Murder', 'Mystery', 'School',
+             'Music', 'Heist', 'Ocean', 'Winter', 'Alien', 'Spy')
+    TITLES = ('The {adj} {noun}', '{adj} {noun}', '{noun} of the {other}', 'The Last {noun}', '{noun} and {other}')
+    ROLES = ('detective', 'teacher', 'pilot', 'chef', 'thief', 'doctor', 'journalist', 'soldier', 'musician',
+             'scientist', 'farmer', 'lawyer')
+    PLACES = ('a small town', 'the city', 'the capital', 'a remote island', 'the frontier', 'an old house',
+              'deep space', 'the suburbs')
+    OVERVIEWS = (
+        'When a {role} uncovers a {adj} {noun}, nothing in {place} stays the same.',
+        'A {role} and an unlikely ally race against time across {place} to stop a {noun}.',
+        'Years after the {noun}, a {role} returns to {place} to settle an old score.',
+        'In {place}, a {adj} {role} is drawn into a world of {other}.'
+    )
+
+    def __init__(self, metadata: TMDBMetadata, size: int = 2000):
+        self.metadata = metadata
+        self.items: List[Dict[str, Any]] = []
+        self.by_platform: Dict[str, set] = {platform_key: set() for platform_key in platform_registry.keys}
+        popularity: Dict[str, float] = {}
+        for rank, seed in enumerate(self.SEEDS):
+            item = self._build(*seed)
+            self._add(item)
+            popularity[self._key(item)] = 1000.0 - rank
+        titles = Counter(item['title'] for item in self.items)
+        for index in range(max(0, size - len(self.SEEDS))):
+            item, score = self._generate(index, titles)
+            self._add(item)
+            popularity[self._key(item)] = score
+        self.index = SearchIndex()
+        self.index.add_many(self.items)
+        self.popular = sorted(self.items, key=lambda item: (-item['vote_count'], item['id']))
+        self.trending_items = sorted(self.items, key=lambda item: -popularity[self._key(item)])[:self.TRENDING_SIZE]
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @staticmethod
+    def _key(item: Dict[str, Any]) -> str:
+        return f"{item['content_type']}:{item['id']}"
+
+    def _add(self, item: Dict[str, Any]):
+        self.items.append(item)
+        for platform in item['platforms']:
+            self.by_platform[platform['platform']].add(self._key(item))
+
+    def _build(self, content_type: str, content_id: int, title: str, overview: str, date: str,
+               genre_ids: List[int], poster: str, backdrop: str, vote_average: float, vote_count: int,
+               seasons: Optional[int], episodes: Optional[int]) -> Dict[str, Any]:
+        """A complete ``ContentResult`` document with hash-derived availability"""
+        platforms = [
+            platform_registry.entry(platform_key, content_type, content_id, quality)
+            for platform_key, quality in AvailabilityIndex.stable_availability(content_type, content_id).items()
         ]
-        
-        # Filter by content type
-        if content_type == 'movie':
-            mock_content = [item for item in mock_content if item['content_type'] == 'movie']
-        elif content_type == 'tv':
-            mock_content = [item for item in mock_content if item['content_type'] == 'tv']
-        
-        # Add platform availability with casting support
-        for item in mock_content:
-            platforms = []
-            platform_keys = list(SUPPORTED_PLATFORMS.keys())
-            
-            if platform_filter and platform_filter in SUPPORTED_PLATFORMS:
-                platform_info = SUPPORTED_PLATFORMS[platform_filter]
-                if item['content_type'] in platform_info['content_types']:
-                    platforms.append({
-                        'platform': platform_filter,
-                        'name': platform_info['name'],
-                        'url': f"{platform_info['base_url']}/{item['content_type']}/{item['id']}",
-                        'quality': 'HD',
-                        'cost': 'Free',
-                        'description': platform_info['description'],
-                        'cast_support': platform_info['cast_support']
-                    })
-            else:
-                # Add random platforms
-                import random
-                eligible_platforms = [k for k, v in SUPPORTED_PLATFORMS.items() 
-                                    if item['content_type'] in v['content_types']]
-                selected = random.sample(eligible_platforms, min(4, len(eligible_platforms)))
-                
-                for platform_key in selected:
-                    platform_info = SUPPORTED_PLATFORMS[platform_key]
-                    platforms.append({
-                        'platform': platform_key,
-                        'name': platform_info['name'],
-                        'url': f"{platform_info['base_url']}/{item['content_type']}/{item['id']}",
-                        'quality': random.choice(['HD', 'Full HD']),
-                        'cost': 'Free',
-                        'description': platform_info['description'],
-                        'cast_support': platform_info['cast_support']
-                    })
-            
-            item['platforms'] = platforms
-            item['cast_support'] = self._get_cast_support(platforms)
-        
         return {
-            'results': mock_content,
-            'total_results': len(mock_content),
+            'id': content_id,
+            'title': title,
+            'overview': overview,
+            'poster_path': self.metadata.poster_url(poster),
+            'backdrop_path': self.metadata.backdrop_url(backdrop),
+            'release_date': date if content_type == 'movie' else '',
+            'first_air_date': date if content_type == 'tv' else '',
+            'vote_average': vote_average,
+            'vote_count': vote_count,
+            'genre_names': self.metadata.genre_names(content_type, genre_ids),
+            'platforms': platforms,
+            'content_type': content_type,
+            'seasons': seasons,
+            'episodes': episodes,
+            'cast_support': platform_registry.cast_support(platform['platform'] for platform in platforms)
+        }
+
+    def _generate(self, index: int, titles: Counter) -> tuple:
+        """Build generated title ``index``; returns (item, trending popularity)"""
+        digest = hashlib.blake2b(f"offline:{index}".encode(), digest_size=16).digest()
+        content_type = 'movie' if index % 2 == 0 else 'tv'
+        words = {
+            'adj': self.ADJECTIVES[digest[0] % len(self.ADJECTIVES)],
+            'noun': self.NOUNS[digest[1] % len(self.NOUNS)],
+            'other': self.NOUNS[digest[2] % len(self.NOUNS)]
+        }
+        title = self.TITLES[digest[3] % len(self.TITLES)].format(**words)
+        titles[title] += 1
+        if titles[title] > 1:
+            title = f"{title} {titles[title]}"
+        overview = self.OVERVIEWS[digest[4] % len(self.OVERVIEWS)].format(
+            role=self.ROLES[digest[5] % len(self.ROLES)], place=self.PLACES[digest[6] % len(self.PLACES)],
+            **{name: word.lower() for name, word in words.items()}
+        )
+        year = 1970 + digest[7] % 56
+        genre_table = sorted(TMDBMetadata.DEFAULT_GENRES[content_type])
+        genre_ids = list(dict.fromkeys(genre_table[b % len(genre_table)] for b in digest[8:9 + digest[9] % 3]))
+        artwork = self.SEEDS[digest[10] % len(self.SEEDS)]
+        seasons = 1 + digest[11] % 10 if content_type == 'tv' else None
+        item = self._build(
+            content_type, self.FIRST_GENERATED_ID + index, title, overview,
+            f"{year}-{1 + digest[12] % 12:02d}-{1 + digest[13] % 28:02d}", genre_ids, artwork[6], artwork[7],
+            round(5 + digest[14] % 45 / 10, 1),
+            # Vote counts fall off with the index so the catalog has a long tail
+            20 + int.from_bytes(digest[14:16], 'big') % max(1, 30000 // (1 + index // 100)),
+            seasons, seasons * (6 + digest[15] % 8) if seasons else None
+        )
+        # Newer titles trend more, as they do upstream
+        return item, (1 + digest[15]) * (year - 1969) / 30
+
+    def search(self, query: str, page: int, content_type: str, platform_filter: Optional[str]) -> Dict[str, Any]:
+        """A search page shaped like ``TMDBClient.search_content``'s"""
+        page_size = TMDBClient.PAGE_SIZE
+        allowed = self.by_platform.get(platform_filter, set()) if platform_filter else None
+        total, hits = self.index.search(query, content_type, allowed, limit=page * page_size)
+        if total:
+            results = hits[(page - 1) * page_size:]
+        else:
+            # Nothing matched (or a browse query such as "popular"): page through the most-voted titles
+            matching = [
+                item for item in self.popular
+                if content_type not in ('movie', 'tv') or item['content_type'] == content_type
+                if allowed is None or self._key(item) in allowed
+            ]
+            total = len(matching)
+            results = matching[(page - 1) * page_size:page * page_size]
+        return {
+            'results': results,
+            'total_results': total,
             'page': page,
-            'total_pages': 1,
+            'total_pages': max(1, math.ceil(total / page_size)),
             'content_type': content_type,
-            'platform_filter': platform_filter
+            'platform_filter': platform_filter,
+            'source': 'offline'
         }
-    
-    def _mock_trending_response(self, content_type: str) -> Dict[str, Any]:
-        """Enhanced mock trending response with both movies and TV shows"""
-        trending_content = [
-            # Movies
-            {
-                'id': 155, 'title': 'The Dark Knight', 'overview': 'Batman faces the Joker in Gotham City.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/qJ2tW6WMUDux911r6m7haRef0WH.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/hqkIcbrOHL86UncnHIsHVcVmzue.jpg',
-                'release_date': '2008-07-18', 'vote_average': 9.0, 'vote_count': 32000,
-                'genre_names': ['Action', 'Crime', 'Drama'], 'content_type': 'movie'
-            },
-            {
-                'id': 680, 'title': 'Pulp Fiction', 'overview': 'Interconnected stories of crime in Los Angeles.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/d5iIlFn5s0ImszYzBPb8JPIfbXD.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/4cDFJr4HnXN5AdPw4AKrmLlMWdO.jpg',
-                'release_date': '1994-09-10', 'vote_average': 8.9, 'vote_count': 27000,
-                'genre_names': ['Crime', 'Drama'], 'content_type': 'movie'
-            },
-            # TV Shows
-            {
-                'id': 1402, 'title': 'The Walking Dead', 'overview': 'Survivors navigate a zombie apocalypse.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/rqeYMLryjcawh2JeRpCVUDXYM5b.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/KoYWXbnYuS3b0GyQPkbuexlVK9.jpg',
-                'first_air_date': '2010-10-31', 'vote_average': 8.1, 'vote_count': 18000,
-                'genre_names': ['Action & Adventure', 'Drama', 'Horror'], 'content_type': 'tv',
-                'seasons': 11, 'episodes': 177
-            },
-            {
-                'id': 1408, 'title': 'House', 'overview': 'Brilliant but misanthropic doctor solves medical mysteries.',
-                'poster_path': 'https://image.tmdb.org/t/p/w500/3Cz7ySOQJmqiuTdrc6CY0r65yDI.jpg',
-                'backdrop_path': 'https://image.tmdb.org/t/p/w1280/cKrhEw44GJlBnFOmgGqTdwjC6wm.jpg',
-                'first_air_date': '2004-11-16', 'vote_average': 8.6, 'vote_count': 15000,
-                'genre_names': ['Drama', 'Mystery'], 'content_type': 'tv',
-                'seasons': 8, 'episodes': 176
-            }
+
+    def trending(self, content_type: str = 'all') -> List[Dict[str, Any]]:
+        if content_type in ('movie', 'tv'):
+            return [item for item in self.trending_items if item['content_type'] == content_type]
+        return list(self.trending_items)
+
+class ContentCatalog:
+    """Persistent Mongo-backed store of enhanced ``ContentResult`` documents.
+
+    Items are keyed ``"<content_type>:<id>"``. Search pages and the trending
+    list are stored as ordered lists of those keys so a fresh process can
+    answer them without going upstream. Every operation fails soft: when Mongo
+    is unreachable the catalog backs off and callers fall through to TMDB.
+    """
+
+    def __init__(self, database, search_page_ttl: int = 6 * 3600, backoff: float = 30.0):
+        self.items = database.catalog
+        self.search_pages = database.search_pages
+        self.snapshots = database.snapshots
+        self.availability = database.availability
+        self.search_page_ttl = search_page_ttl
+        self.backoff = backoff
+        self._unavailable_until = 0.0
+        self._pending: set = set()
+        self._subscribers: List[Callable[[List[Dict[str, Any]]], None]] = []
+
+    def subscribe(self, callback: Callable[[List[Dict[str, Any]]], None]):
+        """Call ``callback`` with every batch of items added to the catalog"""
+        self._subscribers.append(callback)
+
+    @staticmethod
+    def item_key(content_type: str, content_id: int) -> str:
+        return f"{content_type}:{content_id}"
+
+    @staticmethod
+    def page_key(key: tuple) -> str:
+        return json.dumps(key, separators=(',', ':'))
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._unavailable_until
+
+    def _failed(self, operation: str, error: Exception):
+        self._unavailable_until = time.monotonic() + self.backoff
+        logger.warning(f"Catalog {operation} failed, bypassing for {self.backoff:.0f}s: {error}")
+
+    async def ensure_indexes(self):
+        try:
+            await self.items.create_index([('id', ASCENDING), ('content_type', ASCENDING)], unique=True)
+            await self.items.create_index([('title', ASCENDING)])
+            await self.items.create_index([('platforms.platform', ASCENDING)])
+            await self.items.create_index([('updated_at', DESCENDING)])
+            await self.search_pages.create_index([('updated_at', ASCENDING)], expireAfterSeconds=self.search_page_ttl)
+            await self.availability.create_index([('platforms', ASCENDING)])
+        except Exception as e:
+            self._failed('index creation', e)
+
+    async def upsert_items(self, items: List[Dict[str, Any]]):
+        if not items:
+            return
+        for callback in self._subscribers:
+            callback(items)
+        if not self.available:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {'_id': self.item_key(item['content_type'], item['id'])},
+                {'$set': {**item, 'updated_at': now}},
+                upsert=True
+            )
+            for item in items
         ]
-        
-        # Filter by content type
-        if content_type == 'movie':
-            trending_content = [item for item in trending_content if item['content_type'] == 'movie']
-        elif content_type == 'tv':
-            trending_content = [item for item in trending_content if item['content_type'] == 'tv']
-        
-        # Add platform availability with casting support
-        for item in trending_content:
-            import random
-            eligible_platforms = [k for k, v in SUPPORTED_PLATFORMS.items() 
-                                if item['content_type'] in v['content_types']]
-            selected = random.sample(eligible_platforms, min(3, len(eligible_platforms)))
-            
-            platforms = []
-            for platform_key in selected:
-                platform_info = SUPPORTED_PLATFORMS[platform_key]
-                platforms.append({
-                    'platform': platform_key,
-                    'name': platform_info['name'],
-                    'url': f"{platform_info['base_url']}/{item['content_type']}/{item['id']}",
-                    'quality': random.choice(['HD', 'Full HD']),
-                    'cost': 'Free',
-                    'description': platform_info['description'],
-                    'cast_support': platform_info['cast_support']
-                })
-            
-            item['platforms'] = platforms
-            item['cast_support'] = self._get_cast_support(platforms)
-        
-        return {'results': trending_content}
+        try:
+            await self.items.bulk_write(operations, ordered=False)
+        except Exception as e:
+            self._failed('bulk upsert', e)
+
+    async def load_items(self, limit: int) -> List[Dict[str, Any]]:
+        """Most recently updated items, for rebuilding in-memory indexes"""
+        if not self.available:
+            return []
+        try:
+            cursor = self.items.find({}, {'_id': 0, 'updated_at': 0}).sort('updated_at', DESCENDING).limit(limit)
+            return [doc async for doc in cursor]
+        except Exception as e:
+            self._failed('item scan', e)
+            return []
+
+    async def get_items(self, keys: List[str]) -> Optional[List[Dict[str, Any]]]:
+        """Fetch items in ``keys`` order; None if any of them is missing"""
+        if not keys:
+            return []
+        cursor = self.items.find({'_id': {'$in': keys}}, {'updated_at': 0})
+        found = {doc.pop('_id'): doc async for doc in cursor}
+        if len(found) < len(set(keys)):
+            return None
+        return [found[key] for key in keys]
+
+    async def _load_list(self, collection, list_id: str) -> Optional[Dict[str, Any]]:
+        if not self.available:
+            return None
+        try:
+            doc = await collection.find_one({'_id': list_id})
+            if doc is None:
+                return None
+            results = await self.get_items(doc.pop('keys'))
+        except Exception as e:
+            self._failed('read', e)
+            return None
+        if results is None:
+            return None
+        doc.pop('_id', None)
+        doc.pop('updated_at', None)
+        doc['results'] = results
+        return doc
+
+    async def _save_list(self, collection, list_id: str, data: Dict[str, Any]):
+        results = data.get('results', [])
+        await self.upsert_items(results)
+        if not self.available:
+            return
+        doc = {k: v for k, v in data.items() if k != 'results'}
+        doc['keys'] = [self.item_key(item['content_type'], item['id']) for item in results]
+        doc['updated_at'] = datetime.utcnow()
+        try:
+            await collection.replace_one({'_id': list_id}, doc, upsert=True)
+        except Exception as e:
+            self._failed('list write', e)
+
+    async def load_availability(self) -> List[Dict[str, Any]]:
+        if not self.available:
+            return []
+        try:
+            return [doc async for doc in self.availability.find({})]
+        except Exception as e:
+            self._failed('availability read', e)
+            return []
+
+    async def save_availability(self, docs: List[Dict[str, Any]]):
+        if not docs or not self.available:
+            return
+        operations = [
+            UpdateOne({'_id': doc['_id']}, {'$set': {'platforms': doc['platforms']}}, upsert=True)
+            for doc in docs
+        ]
+        try:
+            await self.availability.bulk_write(operations, ordered=False)
+        except Exception as e:
+            self._failed('availability write', e)
+
+    async def load_metadata(self) -> Optional[Dict[str, Any]]:
+        if not self.available:
+            return None
+        try:
+            return await self.snapshots.find_one({'_id': 'tmdb_metadata'}, {'_id': 0, 'updated_at': 0})
+        except Exception as e:
+            self._failed('metadata read', e)
+            return None
+
+    async def save_metadata(self, doc: Dict[str, Any]):
+        if not self.available:
+            return
+        try:
+            await self.snapshots.replace_one(
+                {'_id': 'tmdb_metadata'}, {**doc, 'updated_at': datetime.utcnow()}, upsert=True
+            )
+        except Exception as e:
+            self._failed('metadata write', e)
+
+    async def get_search_page(self, key: tuple) -> Optional[Dict[str, Any]]:
+        return await self._load_list(self.search_pages, self.page_key(key))
+
+    async def save_search_page(self, key: tuple, data: Dict[str, Any]):
+        await self._save_list(self.search_pages, self.page_key(key), data)
+
+    async def load_trending(self) -> Optional[List[Dict[str, Any]]]:
+        doc = await self._load_list(self.snapshots, 'trending')
+        return doc['results'] if doc else None
+
+    async def save_trending(self, items: List[Dict[str, Any]]):
+        await self._save_list(self.snapshots, 'trending', {'results': items})
+
+    def write_behind(self, coro: Awaitable):
+        """Run a catalog write without holding up the response"""
+        task = asyncio.create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def flush(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+class CatalogSnapshot:
+    """Versioned, memory-mapped on-disk copy of the warm catalog state.
+
+    Layout: a fixed header (magic, format version, item count and the offset
+    and length of each section), the enhanced items as individual orjson blobs,
+    a table of fixed-width ``(type, id, offset, length)`` records sorted by
+    ``(type, id)``, the search and suggest indexes over those items, and orjson
+    blobs for the trending list, the availability map and TMDB metadata.
+
+    The indexes are flat arrays addressed by document number (the position in
+    the record table): per-document lengths and vote counts, a sorted term
+    vocabulary with its postings, a sorted trigram table over the vocabulary,
+    and the sorted word-start strings of every title. They are stored in the
+    host's byte order, since a snapshot never leaves the host that wrote it.
+    Opening a snapshot only maps the file and checks the header; lookups are
+    binary searches over the mapped arrays and items are parsed one at a time
+    when a result needs them, so a cold worker is warm in milliseconds and
+    workers on one host share a single page-cache copy. Files are written to a
+    temporary name and renamed into place, so readers never see a torn file.
+    """
+
+    MAGIC = b'KSFUSNAP'
+    VERSION = 2
+    SECTIONS = ('records', 'lengths', 'votes', 'term_text', 'term_offsets', 'posting_offsets', 'posting_docs',
+                'posting_freqs', 'gram_keys', 'gram_offsets', 'gram_terms', 'title_text', 'title_offsets',
+                'title_docs', 'trending', 'availability', 'metadata')
+    # Section name -> array typecode for the sections read as arrays of integers
+    ARRAYS = {'lengths': 'I', 'votes': 'I', 'term_offsets': 'I', 'posting_offsets': 'I', 'posting_docs': 'I',
+              'posting_freqs': 'H', 'gram_offsets': 'I', 'gram_terms': 'I', 'title_offsets': 'I', 'title_docs': 'I'}
+    HEADER = struct.Struct('<8sII' + 'QQ' * len(SECTIONS))
+    RECORD = struct.Struct('<BxxxIQI')
+    TYPE_CODES = {'movie': 0, 'tv': 1}
+    TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+    def __init__(self, path: Path, buffer: mmap.mmap, count: int, sections: Dict[str, tuple]):
+        self.path = path
+        self.count = count
+        self._buffer = buffer
+        self._sections = sections
+        self._views = {name: memoryview(buffer)[offset:offset + length] for name, (offset, length) in sections.items()}
+        self._records = self._views['records']
+        for name, typecode in self.ARRAYS.items():
+            self._views[name] = self._views[name].cast(typecode)
+        self._lengths = self._views['lengths']
+        self._votes = self._views['votes']
+        self.term_count = max(len(self._views['term_offsets']) - 1, 0)
+        self.title_count = len(self._views['title_docs'])
+        self.total_length = sum(self._lengths)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @classmethod
+    def open(cls, path: Path) -> Optional['CatalogSnapshot']:
+        """Map a snapshot file; None if it is missing, truncated or from another format version"""
+        try:
+            with open(path, 'rb') as handle:
+                buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(buffer) < cls.HEADER.size:
+            buffer.close()
+            return None
+        magic, version, count, *bounds = cls.HEADER.unpack_from(buffer)
+        sections = {name: (bounds[2 * i], bounds[2 * i + 1]) for i, name in enumerate(cls.SECTIONS)}
+        if magic != cls.MAGIC or version != cls.VERSION or any(o + n > len(buffer) for o, n in sections.values()):
+            logger.warning(f"Ignoring snapshot {path}: unsupported format or truncated")
+            buffer.close()
+            return None
+        return cls(path, buffer, count, sections)
+
+    @staticmethod
+    def _lower_bound(count: int, value_at: Callable[[int], Any], target: Any) -> int:
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            if value_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _record(self, index: int) -> tuple:
+        return self.RECORD.unpack_from(self._records, index * self.RECORD.size)
+
+    def index_of(self, key: str) -> Optional[int]:
+        """Document number of a content key, found by binary search over the record table"""
+        content_type, _, content_id = key.partition(':')
+        if content_type not in self.TYPE_CODES or not content_id.isdigit():
+            return None
+        target = (self.TYPE_CODES[content_type], int(content_id))
+        index = self._lower_bound(self.count, lambda i: self._record(i)[:2], target)
+        return index if index < self.count and self._record(index)[:2] == target else None
+
+    def key_at(self, index: int) -> str:
+        type_code, item_id, _, _ = self._record(index)
+        return f"{self.TYPE_NAMES[type_code]}:{item_id}"
+
+    def doc_length(self, index: int) -> int:
+        return self._lengths[index]
+
+    def doc_votes(self, index: int) -> int:
+        return self._votes[index]
+
+    def raw(self, content_type: str, content_id: int) -> Optional[bytes]:
+        """The stored orjson bytes for one item"""
+        index = self.index_of(f"{content_type}:{content_id}")
+        if index is None:
+            return None
+        _, _, offset, length = self._record(index)
+        return self._buffer[offset:offset + length]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        content_type, _, content_id = key.partition(':')
+        raw = self.raw(content_type, content_id)
+        return orjson.loads(raw) if raw is not None else None
+
+    def items(self):
+        """Parse items one at a time in (type, id) order"""
+        for index in range(self.count):
+            _, _, offset, length = self._record(index)
+            yield orjson.loads(self._buffer[offset:offset + length])
+
+    def _string(self, text: str, offsets: str, index: int) -> bytes:
+        bounds = self._views[offsets]
+        return bytes(self._views[text][bounds[index]:bounds[index + 1]])
+
+    def term(self, index: int) -> str:
+        return self._string('term_text', 'term_offsets', index).decode()
+
+    def term_index(self, term: str) -> Optional[int]:
+        target = term.encode()
+        index = self._lower_bound(self.term_count, lambda i: self._string('term_text', 'term_offsets', i), target)
+        if index < self.term_count and self._string('term_text', 'term_offsets', index) == target:
+            return index
+        return None
+
+    def posting_count(self, term_index: int) -> int:
+        bounds = self._views['posting_offsets']
+        return bounds[term_index + 1] - bounds[term_index]
+
+    def postings(self, term_index: int):
+        """(document number, weighted term frequency) pairs for a term, in document order"""
+        bounds = self._views['posting_offsets']
+        start, end = bounds[term_index], bounds[term_index + 1]
+        return zip(self._views['posting_docs'][start:end], self._views['posting_freqs'][start:end])
+
+    def frequency(self, term_index: int, doc: int) -> int:
+        """Weighted frequency of a term in one document, 0 if absent"""
+        bounds = self._views['posting_offsets']
+        start, end = bounds[term_index], bounds[term_index + 1]
+        docs = self._views['posting_docs']
+        index = bisect.bisect_left(docs, doc, start, end)
+        return self._views['posting_freqs'][index] if index < end and docs[index] == doc else 0
+
+    def gram_terms(self, gram: str) -> List[str]:
+        """Vocabulary terms containing a trigram"""
+        keys = self._views['gram_keys']
+        count = len(self._views['gram_offsets']) - 1
+        target = gram.encode()
+        index = self._lower_bound(count, lambda i: bytes(keys[3 * i:3 * i + 3]), target)
+        if index >= count or bytes(keys[3 * index:3 * index + 3]) != target:
+            return []
+        bounds = self._views['gram_offsets']
+        return [self.term(term) for term in self._views['gram_terms'][bounds[index]:bounds[index + 1]]]
+
+    def title_docs(self, prefix: str):
+        """Document numbers with a title word start beginning with ``prefix`` (repeats possible)"""
+        target = prefix.encode()
+        string = functools.partial(self._string, 'title_text', 'title_offsets')
+        low = self._lower_bound(self.title_count, string, target)
+        # No UTF-8 sequence contains 0xff, so this bounds every continuation of the prefix
+        high = self._lower_bound(self.title_count, string, target + b'\xff')
+        return self._views['title_docs'][low:high]
+
+    def _blob(self, name: str) -> Any:
+        offset, length = self._sections[name]
+        return orjson.loads(self._buffer[offset:offset + length]) if length else None
+
+    def trending(self) -> List[Dict[str, Any]]:
+        return self._blob('trending') or []
+
+    def availability(self) -> Dict[str, Dict[str, str]]:
+        return self._blob('availability') or {}
+
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self._blob('metadata')
+
+    def close(self):
+        for view in self._views.values():
+            view.release()
+        self._buffer.close()
+
+    @classmethod
+    def write(cls, path: Path, docs: List[tuple], previous: Optional['CatalogSnapshot'], trending: List[Dict[str, Any]],
+              availability: Dict[str, Dict[str, str]], metadata: Optional[Dict[str, Any]]) -> int:
+        """Atomically write a snapshot; ``docs`` are (key, item or None) with None read from ``previous``.
+
+        Returns the number of items written. Blocking; run it off the event loop.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        ordered = []
+        for key, doc in docs:
+            content_type, _, content_id = key.partition(':')
+            if content_type in cls.TYPE_CODES:
+                ordered.append((cls.TYPE_CODES[content_type], int(content_id), doc))
+        ordered.sort(key=lambda entry: entry[:2])
+        records = []
+        lengths, votes = array.array('I'), array.array('I')
+        postings: Dict[str, tuple] = {}
+        titles: List[tuple] = []
+        try:
+            with open(temporary, 'wb') as handle:
+                handle.write(b'\0' * cls.HEADER.size)
+                offset = cls.HEADER.size
+                for type_code, content_id, doc in ordered:
+                    if doc is not None:
+                        raw = orjson.dumps(doc)
+                    elif previous is not None:
+                        # Items served from the old file are copied byte for byte
+                        raw = previous.raw(cls.TYPE_NAMES[type_code], content_id)
+                        doc = orjson.loads(raw) if raw is not None else None
+                    else:
+                        raw = None
+                    if raw is None:
+                        continue
+                    index = len(records)
+                    handle.write(raw)
+                    records.append(cls.RECORD.pack(type_code, content_id, offset, len(raw)))
+                    offset += len(raw)
+                    terms = SearchIndex.terms(doc)
+                    lengths.append(min(sum(terms.values()), 0xFFFFFFFF))
+                    votes.append(min(doc.get('vote_count') or 0, 0xFFFFFFFF))
+                    for term, frequency in terms.items():
+                        posting = postings.get(term)
+                        if posting is None:
+                            posting = postings[term] = (array.array('I'), array.array('H'))
+                        posting[0].append(index)
+                        posting[1].append(frequency)
+                    titles.extend((string.encode(), index) for string in SuggestIndex.entry_strings(doc.get('title')))
+
+                vocabulary = sorted(postings)
+                term_offsets, posting_offsets = array.array('I', [0]), array.array('I', [0])
+                posting_docs, posting_freqs = array.array('I'), array.array('H')
+                grams: Dict[str, List[int]] = {}
+                for term_index, term in enumerate(vocabulary):
+                    term_offsets.append(term_offsets[-1] + len(term))
+                    posting_docs.extend(postings[term][0])
+                    posting_freqs.extend(postings[term][1])
+                    posting_offsets.append(len(posting_docs))
+                    for gram in SearchIndex.grams(term):
+                        grams.setdefault(gram, []).append(term_index)
+                gram_offsets, gram_terms = array.array('I', [0]), array.array('I')
+                for gram in sorted(grams):
+                    gram_terms.extend(grams[gram])
+                    gram_offsets.append(len(gram_terms))
+                titles.sort()
+                title_offsets = array.array('I', [0])
+                for string, _ in titles:
+                    title_offsets.append(title_offsets[-1] + len(string))
+
+                blobs = {
+                    'records': b''.join(records),
+                    'lengths': lengths, 'votes': votes,
+                    'term_text': ''.join(vocabulary).encode(), 'term_offsets': term_offsets,
+                    'posting_offsets': posting_offsets, 'posting_docs': posting_docs, 'posting_freqs': posting_freqs,
+                    'gram_keys': ''.join(sorted(grams)).encode(), 'gram_offsets': gram_offsets, 'gram_terms': gram_terms,
+                    'title_text': b''.join(string for string, _ in titles), 'title_offsets': title_offsets,
+                    'title_docs': array.array('I', (index for _, index in titles)),
+                    'trending': orjson.dumps(trending),
+                    'availability': orjson.dumps(availability),
+                    'metadata': orjson.dumps(metadata) if metadata else b''
+                }
+                bounds = []
+                for name in cls.SECTIONS:
+                    blob = blobs[name]
+                    blob = blob.tobytes() if isinstance(blob, array.array) else blob
+                    handle.write(blob)
+                    bounds += [offset, len(blob)]
+                    offset += len(blob)
+                handle.seek(0)
+                handle.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(records), *bounds))
+                handle.flush()
+                os.fsync(handle.fileno())
+            os.replace(temporary, path)
+        finally:
+            if temporary.exists():
+                temporary.unlink()
+        return len(records)
+
+class SnapshotWriter:
+    """Rewrites the catalog snapshot on an interval whenever the warm state has changed"""
+
+    def __init__(self, path: Path, interval: float, collect: Callable[[], tuple]):
+        self.path = path
+        self.interval = interval
+        self.collect = collect
+        self.dirty = False
+        self.writes = 0
+        self.last_items = 0
+        self.last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_dirty(self, *_):
+        self.dirty = True
+
+    async def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            self.last_items = await asyncio.to_thread(CatalogSnapshot.write, self.path, *self.collect())
+            self.writes += 1
+            self.last_error = None
+        except Exception as e:
+            self.dirty = True
+            self.last_error = str(e)
+            logger.error(f"Snapshot write to {self.path} failed: {e}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the interval and write any pending changes, if this writer was started"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            await self.save()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'path': str(self.path), 'running': self._task is not None, 'writes': self.writes, 'items': self.last_items,
+                'pending': self.dirty, 'last_error': self.last_error}
+
+class ImageCache:
+    """Bounded on-disk cache of proxied TMDB images, evicted least-recently-used.
+
+    Files are named by a hash of (size, image path). Recency is kept in each
+    file's access time, set explicitly on every hit, so the LRU order survives
+    restarts through a directory scan. Modification times are never touched,
+    which keeps a cached file's ETag and Last-Modified stable. Concurrent
+    misses for one image share a single origin fetch, and an image another
+    worker already stored is adopted instead of fetched again. ``max_bytes``
+    bounds the directory as a whole, whichever worker stored the files: usage
+    is kept in a shared file under a lock and evictions work from a directory
+    scan. The image CDN is fetched with a plain client of its own, outside
+    the TMDB API's rate limit, retries and hedging, and downloads are
+    streamed and cut off at ``max_image_bytes``.
+    """
+
+    CACHE_CONTROL = 'public, max-age=31536000, immutable'  # TMDB image paths never change content
+    LOW_WATER = 0.9  # An eviction pass frees space down to this fraction of max_bytes
+    # TMDB serves some logos as SVG, which can carry script; it must never render as a page on this origin
+    SVG_HEADERS = {'Content-Security-Policy': "default-src 'none'", 'Content-Disposition': 'attachment'}
+
+    def __init__(self, directory: Path, max_bytes: int, origin: Callable[[], str],
+                 max_image_bytes: int = 10 * 1024 * 1024, timeout: float = 10.0, pool_size: int = 32):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_image_bytes = max_image_bytes
+        self.origin = origin
+        self.limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        self.timeout = httpx.Timeout(timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._entries: 'OrderedDict[str, float]' = OrderedDict()  # name -> mtime
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._loaded = False
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.evictions = 0
+        self.refetches = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _scan(self) -> List[tuple]:
+        """(atime, name, size, mtime) of every cached file, least recently used first"""
+        found = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith('.'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    found.append((stat.st_atime, entry.name, stat.st_size, stat.st_mtime))
+        return sorted(found)
+
+    def _load(self) -> List[str]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for _, name, _, mtime in self._scan():
+            self._entries[name] = mtime
+        return self._account()
+
+    def _account(self, added: Optional[int] = None) -> List[str]:
+        """Add ``added`` bytes to the usage shared by every worker on this directory, or rescan it.
+
+        The total lives in ``.usage`` and is read and written under an exclusive
+        ``flock``. When it goes over ``max_bytes`` the directory is scanned and
+        files are unlinked in access-time order, whichever worker stored them,
+        down to ``LOW_WATER`` of the budget. Returns the evicted names. Blocking.
+        """
+        evicted = []
+        with open(self.directory / '.usage', 'a+') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            handle.seek(0)
+            recorded = handle.read().strip()
+            usage = int(recorded) + added if added is not None and recorded.isdigit() else None
+            if usage is None or usage > self.max_bytes:
+                files = self._scan()
+                usage = sum(size for _, _, size, _ in files)
+                if usage > self.max_bytes:
+                    for _, name, size, _ in files[:-1]:
+                        if usage <= self.max_bytes * self.LOW_WATER:
+                            break
+                        try:
+                            os.unlink(self.directory / name)
+                        except FileNotFoundError:
+                            pass
+                        usage -= size
+                        evicted.append(name)
+            handle.truncate(0)
+            handle.write(str(usage))
+        self.bytes = usage
+        return evicted
+
+    def _forget(self, names: List[str]):
+        for name in names:
+            self._entries.pop(name, None)
+        self.evictions += len(names)
+
+    def _touch(self, name: str) -> bool:
+        try:
+            os.utime(self.directory / name, (time.time(), self._entries[name]))
+        except FileNotFoundError:
+            del self._entries[name]  # Evicted by another worker
+            return False
+        self._entries.move_to_end(name)
+        return True
+
+    def _adopt(self, name: str) -> bool:
+        try:
+            stat = (self.directory / name).stat()
+        except FileNotFoundError:
+            return False
+        self._entries[name] = stat.st_mtime
+        return True
+
+    def _store(self, name: str, content: bytes) -> tuple:
+        """Write a fetched file and count it; returns (mtime, evicted names). Blocking."""
+        temporary = self.directory / f".{name}.{os.getpid()}.tmp"
+        with open(temporary, 'wb') as out:
+            out.write(content)
+        os.replace(temporary, self.directory / name)
+        mtime = (self.directory / name).stat().st_mtime
+        return mtime, self._account(len(content))
+
+    async def _download(self, image_path: str, url: str) -> bytes:
+        too_large = ValueError(f"{image_path} is larger than {self.max_image_bytes} bytes")
+        async with self.client.stream('GET', url) as response:
+            if response.status_code == 404:
+                raise LookupError(image_path)
+            response.raise_for_status()
+            if int(response.headers.get('content-length') or 0) > self.max_image_bytes:
+                raise too_large
+            chunks, received = [], 0
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > self.max_image_bytes:
+                    raise too_large
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+    async def _fetch(self, name: str, size: str, image_path: str):
+        self.fetches += 1
+        content = await self._download(image_path, f"{self.origin()}{size}{image_path}")
+        mtime, evicted = await asyncio.to_thread(self._store, name, content)
+        self._entries[name] = mtime
+        self._forget(evicted)
+
+    async def get(self, size: str, image_path: str) -> Path:
+        """Path of the cached file for ``image_path`` at ``size``, fetching it on a miss.
+
+        Raises ``LookupError`` when the origin has no such image.
+        """
+        if not self._loaded:
+            self._forget(await asyncio.to_thread(self._load))
+            self._loaded = True
+        name = hashlib.blake2b(f"{size}{image_path}".encode(), digest_size=16).hexdigest() + Path(image_path).suffix
+        if name in self._entries and self._touch(name):
+            self.hits += 1
+            return self.directory / name
+        if self._adopt(name):
+            self.hits += 1
+            return self.directory / name
+        self.misses += 1
+        pending = self._inflight.get(name)
+        if pending is None:
+            pending = self._inflight[name] = asyncio.ensure_future(self._fetch(name, size, image_path))
+            pending.add_done_callback(lambda _: self._inflight.pop(name, None))
+        await asyncio.shield(pending)
+        return self.directory / name
+
+    async def serve(self, request: Request, size: str, image_path: str) -> Response:
+        """``get`` and ``response`` together; a file another worker evicts in between is fetched again"""
+        path = await self.get(size, image_path)
+        try:
+            return self.response(request, path)
+        except FileNotFoundError:
+            self.refetches += 1
+            return self.response(request, await self.get(size, image_path))
+
+    def response(self, request: Request, path: Path) -> Response:
+        """Serve a cached file, answering conditional requests with 304; ranges are handled by FileResponse"""
+        stat = path.stat()
+        headers = {'Cache-Control': self.CACHE_CONTROL, **(self.SVG_HEADERS if path.suffix == '.svg' else {})}
+        response = FileResponse(path, stat_result=stat, headers=headers)
+        validators = {'ETag': response.headers['etag'], 'Last-Modified': response.headers['last-modified'],
+                      'Cache-Control': self.CACHE_CONTROL}
+        if_none_match = request.headers.get('if-none-match')
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+            if '*' in tags or validators['ETag'] in tags:
+                return Response(status_code=304, headers=validators)
+        else:
+            if_modified_since = request.headers.get('if-modified-since')
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp() if if_modified_since else None
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and int(stat.st_mtime) <= since:
+                return Response(status_code=304, headers=validators)
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'directory': str(self.directory),
+            'files': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'fetches': self.fetches,
+            'inflight': len(self._inflight),
+            'evictions': self.evictions,
+            'refetches': self.refetches
+        }
+
+class SearchIndex:
+    """Local full-text index over the titles and overviews in the catalog.
+
+    An inverted index (term -> {content key: weighted term frequency}) ranked
+    with BM25, where title matches count ``TITLE_WEIGHT`` times. Query terms
+    missing from the vocabulary are matched to similar terms through a trigram
+    index, so small typos still hit. Items are added incrementally; re-adding
+    a key replaces its previous postings.
+
+    A ``CatalogSnapshot`` can be attached as a read-only base: its postings,
+    document lengths and trigram table are read from the mapped file, items
+    added later are indexed in memory on top of it, and base documents they
+    replace or remove are masked. Base items are only parsed when they are
+    returned as results.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    TITLE_WEIGHT = 3
+    MAX_CANDIDATES = 64
+    STOPWORDS = frozenset({'a', 'an', 'and', 'the', 'of', 'in', 'on', 'to', 'for', 'with', 'is'})
+    _TOKEN = re.compile(r'[a-z0-9]+')
+
+    def __init__(self):
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.votes: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.total_len = 0
+        self.trigrams: Dict[str, set] = {}
+        self.base: Optional[CatalogSnapshot] = None
+        self.masked: set = set()
+        self._base_len = 0
+
+    def __len__(self) -> int:
+        return len(self.docs) + (self.base.count - len(self.masked) if self.base is not None else 0)
+
+    def __contains__(self, key: str) -> bool:
+        if key in self.docs:
+            return True
+        index = self.base.index_of(key) if self.base is not None else None
+        return index is not None and index not in self.masked
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return [token for token in cls._TOKEN.findall((text or '').lower()) if token not in cls.STOPWORDS]
+
+    @staticmethod
+    def grams(term: str) -> set:
+        padded = f"${term}$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @classmethod
+    def terms(cls, item: Dict[str, Any]) -> Dict[str, int]:
+        """Weighted term frequencies of one item"""
+        terms: Dict[str, int] = {}
+        for token in cls.tokenize(item.get('title')):
+            terms[token] = terms.get(token, 0) + cls.TITLE_WEIGHT
+        for token in cls.tokenize(item.get('overview')):
+            terms[token] = terms.get(token, 0) + 1
+        return terms
+
+    def attach(self, base: CatalogSnapshot):
+        self.base = base
+        self.masked = set()
+        self._base_len = base.total_length
+        for key in self.docs:
+            self._mask(key)
+
+    def _mask(self, key: str):
+        index = self.base.index_of(key) if self.base is not None else None
+        if index is not None and index not in self.masked:
+            self.masked.add(index)
+            self._base_len -= self.base.doc_length(index)
+
+    def add(self, item: Dict[str, Any]):
+        key = f"{item['content_type']}:{item['id']}"
+        self.remove(key)
+        terms = self.terms(item)
+        self.docs[key] = item
+        self.votes[key] = item.get('vote_count') or 0
+        self.doc_terms[key] = terms
+        self.doc_len[key] = length = sum(terms.values())
+        self.total_len += length
+        for term, frequency in terms.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                for gram in self.grams(term):
+                    self.trigrams.setdefault(gram, set()).add(term)
+            posting[key] = frequency
+
+    def add_many(self, items: List[Dict[str, Any]]):
+        for item in items:
+            self.add(item)
+
+    def remove(self, key: str):
+        if key not in self.docs:
+            self._mask(key)
+            return
+        del self.docs[key]
+        self.votes.pop(key, None)
+        self.total_len -= self.doc_len.pop(key, 0)
+        for term in self.doc_terms.pop(key, {}):
+            posting = self.postings[term]
+            posting.pop(key, None)
+            if not posting:
+                del self.postings[term]
+                for gram in self.grams(term):
+                    self.trigrams[gram].discard(term)
+
+    def documents(self) -> List[tuple]:
+        """(key, item or None) for every document; None marks one read from the attached snapshot"""
+        documents = list(self.docs.items())
+        if self.base is not None:
+            documents += [(self.base.key_at(index), None) for index in range(self.base.count)
+                          if index not in self.masked]
+        return documents
+
+    def _document(self, key: str) -> Optional[Dict[str, Any]]:
+        doc = self.docs.get(key)
+        return doc if doc is not None or self.base is None else self.base.get(key)
+
+    def _term_index(self, term: str) -> Optional[int]:
+        return self.base.term_index(term) if self.base is not None else None
+
+    def _document_frequency(self, term: str) -> int:
+        """Documents containing a term; base documents masked since the snapshot still count"""
+        term_index = self._term_index(term)
+        base = self.base.posting_count(term_index) if term_index is not None else 0
+        return base + len(self.postings.get(term, ()))
+
+    def _posting(self, term: str, among: Optional[Dict[str, float]] = None) -> Dict[str, tuple]:
+        """{key: (frequency, document length, votes)} for a vocabulary term, optionally only over ``among``"""
+        overlay = self.postings.get(term, {})
+        term_index = self._term_index(term)
+        posting = {}
+        if among is not None and len(among) < self._document_frequency(term):
+            # Few survivors: look each one up rather than reading the whole posting list
+            for key in among:
+                if key in overlay:
+                    posting[key] = (overlay[key], self.doc_len[key], self.votes[key])
+                elif term_index is not None and key not in self.docs:
+                    doc = self.base.index_of(key)
+                    frequency = self.base.frequency(term_index, doc)
+                    if frequency:
+                        posting[key] = (frequency, self.base.doc_length(doc), self.base.doc_votes(doc))
+            return posting
+        if term_index is not None:
+            base = self.base
+            for doc, frequency in base.postings(term_index):
+                if doc not in self.masked:
+                    posting[base.key_at(doc)] = (frequency, base.doc_length(doc), base.doc_votes(doc))
+        for key, frequency in overlay.items():
+            posting[key] = (frequency, self.doc_len[key], self.votes[key])
+        return posting
+
+    @staticmethod
+    def _edit_distance(a: str, b: str, limit: int) -> int:
+        """Optimal string alignment distance (adjacent swaps count once), capped at limit + 1"""
+        if abs(len(a) - len(b)) > limit:
+            return limit + 1
+        previous2, previous = None, list(range(len(b) + 1))
+        for i in range(1, len(a) + 1):
+            current = [i] + [0] * len(b)
+            for j in range(1, len(b) + 1):
+                cost = a[i - 1] != b[j - 1]
+                current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+                if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                    current[j] = min(current[j], previous2[j - 2] + 1)
+            if min(current) > limit:
+                return limit + 1
+            previous2, previous = previous, current
+        return previous[-1]
+
+    def _expand(self, term: str) -> List[tuple]:
+        """(vocabulary term, weight) pairs matching a query term, allowing typos"""
+        if term in self.postings or self._term_index(term) is not None:
+            return [(term, 1.0)]
+        if len(term) < 4:
+            return []
+        # Trigram overlap shortlists candidates; edit distance confirms them
+        shared: Dict[str, int] = {}
+        for gram in self.grams(term):
+            candidates = set(self.trigrams.get(gram, ()))
+            if self.base is not None:
+                candidates.update(self.base.gram_terms(gram))
+            for candidate in candidates:
+                shared[candidate] = shared.get(candidate, 0) + 1
+        shortlist = sorted(shared, key=shared.get, reverse=True)[:self.MAX_CANDIDATES]
+        limit = 1 if len(term) < 8 else 2
+        matches = []
+        for candidate in shortlist:
+            distance = self._edit_distance(term, candidate, limit)
+            if distance <= limit:
+                matches.append((candidate, 1.0 - distance / (limit + 1)))
+        matches.sort(key=lambda pair: pair[1], reverse=True)
+        return matches[:3]
+
+    def search(self, query: str, content_type: str = 'multi', allowed: set = None,
+               limit: int = 28) -> tuple:
+        """Rank documents matching every query term.
+
+        Returns ``(total matches, top ``limit`` documents)``; ``allowed``
+        restricts results to a set of content keys.
+        """
+        terms = self.tokenize(query)
+        doc_count = len(self)
+        if not terms or not doc_count:
+            return 0, []
+        expanded = [self._expand(term) for term in terms]
+        if not all(expanded):
+            return 0, []
+
+        avg_len = max(self.total_len + self._base_len, 1) / doc_count
+        # Score the most selective term first; later terms only touch survivors
+        expanded.sort(key=lambda pairs: sum(self._document_frequency(term) for term, _ in pairs))
+        scores: Optional[Dict[str, float]] = None
+        votes: Dict[str, int] = {}
+        for pairs in expanded:
+            term_scores: Dict[str, float] = {}
+            for vocab_term, weight in pairs:
+                frequency_of = min(self._document_frequency(vocab_term), doc_count)
+                idf = math.log(1 + (doc_count - frequency_of + 0.5) / (frequency_of + 0.5))
+                for key, (frequency, length, key_votes) in self._posting(vocab_term, scores).items():
+                    if scores is not None and key not in scores:
+                        continue
+                    votes[key] = key_votes
+                    norm = frequency + self.K1 * (1 - self.B + self.B * length / avg_len)
+                    score = weight * idf * frequency * (self.K1 + 1) / norm
+                    if score > term_scores.get(key, 0.0):
+                        term_scores[key] = score
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {key: scores[key] + score for key, score in term_scores.items()}
+            if not scores:
+                return 0, []
+
+        prefix = f"{content_type}:" if content_type in ('movie', 'tv') else None
+        if prefix is not None or allowed is not None:
+            scores = {
+                key: score for key, score in scores.items()
+                if (prefix is None or key.startswith(prefix)) and (allowed is None or key in allowed)
+            }
+        top = heapq.nsmallest(limit, scores, key=lambda key: (-scores[key], -votes[key]))
+        docs = [self._document(key) for key in top]
+        return len(scores), [doc for doc in docs if doc is not None]
+
+    def stats(self) -> Dict[str, Any]:
+        base = self.base
+        return {'documents': len(self), 'snapshot_documents': base.count - len(self.masked) if base else 0,
+                'terms': len(self.postings) + (base.term_count if base else 0), 'trigrams': len(self.trigrams)}
+
+class SuggestIndex:
+    """Prefix index over catalogued titles for search-as-you-type.
+
+    Every title contributes one entry per word start ("the dark knight",
+    "dark knight", "knight") to a sorted array, so a prefix lookup is two
+    binary searches. Candidates in the range are ranked by ``vote_count``.
+    A prefix can match a large range ("the a"), so the top results of the
+    most recently typed ``MAX_CACHED_PREFIXES`` prefixes are cached until an
+    entry under that prefix changes. An attached ``CatalogSnapshot`` supplies
+    a second, mapped entry array in the same order; titles added later mask
+    their snapshot copy, and snapshot items are parsed only for display.
+    """
+
+    MAX_WORD_STARTS = 6
+    MAX_CACHED_PREFIXES = 20000
+    MAX_RESULTS = 20
+    FIELDS = ('id', 'content_type', 'title', 'release_date', 'first_air_date', 'poster_path', 'vote_count')
+
+    def __init__(self):
+        self.entries: List[tuple] = []
+        self.items: Dict[str, Dict[str, Any]] = {}
+        self._strings: Dict[str, List[str]] = {}
+        self._top: 'OrderedDict[str, List[str]]' = OrderedDict()
+        self.base: Optional[CatalogSnapshot] = None
+        self.masked: set = set()
+        self._base_items: Dict[int, Dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.items) + (self.base.count - len(self.masked) if self.base is not None else 0)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        decomposed = unicodedata.normalize('NFKD', text or '')
+        folded = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+        return ' '.join(''.join(ch if ch.isalnum() else ' ' for ch in folded).split())
+
+    @classmethod
+    def entry_strings(cls, title: str) -> List[str]:
+        words = cls.normalize(title).split()
+        return [' '.join(words[i:]) for i in range(min(len(words), cls.MAX_WORD_STARTS))]
+
+    @staticmethod
+    def _prefixes(string: str) -> List[str]:
+        return [string[:length] for length in range(1, len(string) + 1)]
+
+    @staticmethod
+    def _display(item: Dict[str, Any]) -> Dict[str, Any]:
+        date = item.get('release_date') or item.get('first_air_date') or ''
+        return {
+            'id': item['id'],
+            'title': item.get('title') or '',
+            'content_type': item['content_type'],
+            'year': int(date[:4]) if date[:4].isdigit() else None,
+            'poster_path': item.get('poster_path'),
+            'vote_count': item.get('vote_count', 0)
+        }
+
+    def attach(self, base: CatalogSnapshot):
+        self.base = base
+        self.masked = set()
+        self._base_items = {}
+        self._top.clear()
+        for key in self.items:
+            self._mask(key)
+
+    def _base_item(self, index: int) -> Dict[str, Any]:
+        item = self._base_items.get(index)
+        if item is None:
+            if len(self._base_items) >= self.MAX_CACHED_PREFIXES:
+                self._base_items.clear()
+            item = self._base_items[index] = self._display(self.base.get(self.base.key_at(index)))
+        return item
+
+    def _item(self, key: str) -> Dict[str, Any]:
+        item = self.items.get(key)
+        return item if item is not None else self._base_item(self.base.index_of(key))
+
+    def _votes(self, key: str) -> int:
+        return self._item(key)['vote_count']
+
+    def _mask(self, key: str):
+        index = self.base.index_of(key) if self.base is not None else None
+        if index is None or index in self.masked:
+            return
+        for string in self.entry_strings(self._base_item(index)['title']):
+            for prefix in self._prefixes(string):
+                if key in self._top.get(prefix, ()):
+                    del self._top[prefix]
+        self.masked.add(index)
+        self._base_items.pop(index, None)
+
+    def remove(self, key: str):
+        if key not in self.items:
+            self._mask(key)
+            return
+        for string in self._strings.pop(key, []):
+            index = bisect.bisect_left(self.entries, (string, key))
+            if index < len(self.entries) and self.entries[index] == (string, key):
+                del self.entries[index]
+            for prefix in self._prefixes(string):
+                # The runner-up is unknown, so recompute this prefix lazily
+                if key in self._top.get(prefix, ()):
+                    del self._top[prefix]
+        del self.items[key]
+
+    def _record(self, item: Dict[str, Any], key: str) -> List[str]:
+        self.items[key] = self._display(item)
+        strings = self._strings[key] = self.entry_strings(self.items[key]['title'])
+        return strings
+
+    def add(self, item: Dict[str, Any]):
+        key = f"{item['content_type']}:{item['id']}"
+        existing = self.items.get(key)
+        if existing is not None:
+            if existing['title'] == (item.get('title') or '') and existing['vote_count'] == item.get('vote_count', 0):
+                self._record(item, key)  # Ranking unchanged; just refresh the display fields
+                return
+        self.remove(key)
+        vote_count = item.get('vote_count', 0)
+        for string in self._record(item, key):
+            bisect.insort(self.entries, (string, key))
+            for prefix in self._prefixes(string):
+                top = self._top.get(prefix)
+                if top is None or key in top:
+                    continue
+                if len(top) < self.MAX_RESULTS or vote_count > self._votes(top[-1]):
+                    top.append(key)
+                    top.sort(key=self._votes, reverse=True)
+                    del top[self.MAX_RESULTS:]
+
+    def add_many(self, items: List[Dict[str, Any]]):
+        if len(items) > len(self.entries):
+            # Bulk load: cheaper to rebuild the array and sort once than to insort every entry
+            keys = {f"{item['content_type']}:{item['id']}": item for item in items}
+            replaced = {key for key in keys if key in self.items}
+            if replaced:
+                self.entries = [entry for entry in self.entries if entry[1] not in replaced]
+            for key, item in keys.items():
+                if key not in replaced:
+                    self._mask(key)
+                self.entries.extend((string, key) for string in self._record(item, key))
+            self.entries.sort()
+            self._top.clear()
+        else:
+            for item in items:
+                self.add(item)
+
+    def _rank(self, prefix: str, content_type: str = None) -> List[str]:
+        low = bisect.bisect_left(self.entries, (prefix,))
+        high = bisect.bisect_left(self.entries, (prefix + '\uffff',))
+        keys = {key for _, key in self.entries[low:high]}
+        if content_type is not None:
+            keys = {key for key in keys if key.startswith(f"{content_type}:")}
+        ranked = [(self.items[key]['vote_count'], key) for key in keys]
+        if self.base is not None:
+            base = self.base
+            docs = {doc for doc in base.title_docs(prefix) if doc not in self.masked}
+            if content_type is not None:
+                docs = {doc for doc in docs if base.key_at(doc).startswith(f"{content_type}:")}
+            ranked += [(base.doc_votes(doc), base.key_at(doc))
+                       for doc in heapq.nlargest(self.MAX_RESULTS, docs, key=base.doc_votes)]
+        return [key for _, key in heapq.nlargest(self.MAX_RESULTS, ranked, key=lambda pair: pair[0])]
+
+    def suggest(self, query: str, limit: int = 8, content_type: str = 'multi') -> List[Dict[str, Any]]:
+        prefix = self.normalize(query)
+        if not prefix:
+            return []
+        ranked = self._top.get(prefix)
+        if ranked is None:
+            ranked = self._top[prefix] = self._rank(prefix)
+            if len(self._top) > self.MAX_CACHED_PREFIXES:
+                self._top.popitem(last=False)
+        else:
+            self._top.move_to_end(prefix)
+        if content_type in ('movie', 'tv'):
+            filtered = [key for key in ranked if key.startswith(f"{content_type}:")]
+            # The shared top list may be dominated by the other type
+            ranked = filtered if len(filtered) >= limit or len(ranked) < self.MAX_RESULTS else self._rank(prefix, content_type)
+        return [self._item(key) for key in ranked[:limit]]
+
+    def stats(self) -> Dict[str, Any]:
+        titles = self.base.title_count if self.base is not None else 0
+        return {'titles': len(self), 'entries': len(self.entries) + titles, 'cached_prefixes': len(self._top)}
+
+class TrendingMaterializer:
+    """Keeps an in-memory snapshot of trending content refreshed on a schedule.
+
+    A single ``trending/all/week`` fetch backs all three views; ``movie`` and
+    ``tv`` are derived from it. Requests are answered from the snapshot, and a
+    failed refresh leaves the previous snapshot in place (stale-while-revalidate).
+    """
+
+    VIEW_SIZE = 28  # Limit to 28 trending items per view
+    MAX_AGE = 300
+
+    def __init__(self, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]], refresh_interval: float,
+                 retry_interval: float, on_refresh: Callable[[List[Dict[str, Any]]], Awaitable] = None):
+        self.fetch = fetch
+        self.on_refresh = on_refresh
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._views: Dict[str, Dict[str, Any]] = {}
+        self.items: List[Dict[str, Any]] = []
+        self._refreshed_at: Optional[float] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def age(self) -> Optional[float]:
+        return None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+
+    def load(self, items: List[Dict[str, Any]]):
+        """Swap in a new snapshot built from one combined trending list"""
+        views = {
+            'all': items[:self.VIEW_SIZE],
+            'movie': [item for item in items if item['content_type'] == 'movie'][:self.VIEW_SIZE],
+            'tv': [item for item in items if item['content_type'] == 'tv'][:self.VIEW_SIZE]
+        }
+        # Serialize each view once per refresh rather than once per request
+        self._views = {
+            name: PreparedResponse.from_data(trusted_trending_response(results), self.MAX_AGE)
+            for name, results in views.items()
+        }
+        self.items = items
+        self._refreshed_at = time.monotonic()
+
+    async def _refresh(self) -> bool:
+        try:
+            items = await self.fetch()
+            self.load(items)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.error(f"Trending refresh failed, serving last snapshot: {e}")
+            return False
+        self.refreshes += 1
+        self.last_error = None
+        if self.on_refresh is not None:
+            try:
+                await self.on_refresh(items)
+            except Exception as e:
+                # The new snapshot is already live; only persisting it failed
+                logger.error(f"Trending refresh hook failed: {e}")
+        return True
+
+    def refresh(self) -> asyncio.Task:
+        # Coalesce concurrent refresh triggers onto one upstream fetch
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._refresh())
+        return self._refreshing
+
+    async def get(self, content_type: str = 'all') -> Optional[PreparedResponse]:
+        if not self._views:
+            await self.refresh()
+        elif self.age > self.refresh_interval:
+            self.refresh()  # Serve stale now, revalidate in the background
+        return self._views.get(content_type)
+
+    async def _run(self):
+        while True:
+            try:
+                ok = await self.refresh()
+            except Exception as e:
+                # Never let one bad refresh end the schedule
+                ok = False
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Trending refresh crashed: {e!r}")
+            await asyncio.sleep(self.refresh_interval if ok else self.retry_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'age_seconds': None if self.age is None else round(self.age, 3),
+            'refresh_interval': self.refresh_interval,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'views': {name: len(view) for name, view in self._views.items()}
+        }
 
 # Initialize clients
-tmdb_client = TMDBClient()
+upstream = UpstreamClient.from_env()
+availability = AvailabilityIndex()
+metadata = TMDBMetadata(
+    poster_size=os.environ.get('TMDB_POSTER_SIZE', 'w500'),
+    backdrop_size=os.environ.get('TMDB_BACKDROP_SIZE', 'w1280'),
+    refresh_interval=float(os.environ.get('TMDB_METADATA_REFRESH_INTERVAL', 86400))
+)
+offline_catalog = OfflineCatalog(metadata, int(os.environ.get('OFFLINE_CATALOG_SIZE', 2000)))
+tmdb_client = TMDBClient(upstream, availability, metadata, offline_catalog)
+catalog = ContentCatalog(db, search_page_ttl=int(os.environ.get('CATALOG_SEARCH_PAGE_TTL', 6 * 3600)))
 
-# API Routes
-@app.get("/api/", tags=["Health"])
-async def root():
+search_index = SearchIndex()
+suggest_index = SuggestIndex()
+catalog.subscribe(search_index.add_many)
+catalog.subscribe(suggest_index.add_many)
+LOCAL_SEARCH_ENABLED = os.environ.get('LOCAL_SEARCH', 'true').lower() == 'true'
+LOCAL_SEARCH_MIN_HITS = int(os.environ.get('LOCAL_SEARCH_MIN_HITS', 10))
+# Share of a query's known upstream results the index must also match to answer it
+LOCAL_SEARCH_MIN_COVERAGE = float(os.environ.get('LOCAL_SEARCH_MIN_COVERAGE', 0.5))
+LOCAL_SEARCH_MAX_DOCS = int(os.environ.get('LOCAL_SEARCH_MAX_DOCS', 200000))
+
+search_cache = TTLCache(
+    'search',
+    ttl=float(os.environ.get('SEARCH_CACHE_TTL', 300)),
+    max_entries=int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 2048)),
+    max_bytes=int(os.environ.get('SEARCH_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    sizeof=len,
+    stale_ttl=float(os.environ.get('UPSTREAM_STALE_TTL', 24 * 3600))
+)
+SEARCH_MAX_AGE = 60
+# Which source ('local' or 'tmdb') answers each query's pages; outlives the page entries it governs
+search_owners = TTLCache('search_owners', ttl=search_cache.ttl * 6, max_entries=16384)
+# Pages with titles whose availability could not be resolved are kept only briefly and never persisted
+SEARCH_DEGRADED_TTL = float(os.environ.get('SEARCH_DEGRADED_TTL', 30))
+
+# With several worker processes, caches are backed by a tier they all share (see SharedCache)
+WEB_CONCURRENCY = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+SHARED_CACHE_SOCKET = os.environ.get('SHARED_CACHE_SOCKET') or (os.path.join(
+    tempfile.gettempdir(), f"kingshit-fu-{hashlib.blake2b(str(ROOT_DIR).encode(), digest_size=4).hexdigest()}.sock"
+) if WEB_CONCURRENCY > 1 else None)
+shared_cache = SharedCache(
+    SHARED_CACHE_SOCKET,
+    max_bytes=int(os.environ.get('SHARED_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+) if SHARED_CACHE_SOCKET else None
+if shared_cache is not None:
+    search_cache.share(shared_cache, PreparedResponse.pack, PreparedResponse.unpack)
+    tmdb_client.provider_cache.share(shared_cache, orjson.dumps, orjson.loads)
+    tmdb_client.tv_detail_cache.share(shared_cache, orjson.dumps, orjson.loads)
+
+def search_cache_key(query: str, page: int, content_type: str, platform: Optional[str]) -> tuple:
+    """Normalize search parameters so trivially different queries share an entry"""
+    return (' '.join(query.lower().split()), page, content_type, (platform or '').lower() or None)
+
+# Cursor-derived pages share the normal search caches, so only states this
+# service issued are accepted. Derived from the API key when unset so every
+# worker (and restart) agrees on it.
+CURSOR_SECRET = (os.environ.get('CURSOR_SECRET') or hashlib.blake2b(
+    os.environ.get('TMDB_API_KEY', '').encode(), person=b'search-cursor'
+).hexdigest()).encode()
+
+def cursor_signature(payload: bytes) -> str:
+    digest = hmac.new(CURSOR_SECRET, payload, hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).decode().rstrip('=')
+
+def encode_cursor(search_key: tuple, page: int, state: Dict[str, Any]) -> str:
+    """Pack filtered-pagination state into an opaque, signed URL-safe token"""
+    payload = json.dumps({'k': list(search_key), 'p': page, **state}, separators=(',', ':')).encode()
+    return f"{base64.urlsafe_b64encode(payload).decode().rstrip('=')}.{cursor_signature(payload)}"
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """Unpack a cursor token; raises ValueError if it is malformed or was not issued here"""
+    encoded, _, signature = token.partition('.')
+    try:
+        payload = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+    if not hmac.compare_digest(signature, cursor_signature(payload)):
+        raise ValueError("Invalid cursor: bad signature")
+    try:
+        payload = json.loads(payload)
+        state = {name: int(payload[name]) for name in ('u', 'o', 's', 'm')}
+        for name in ('t', 'r'):
+            if name in payload:
+                state[name] = int(payload[name])
+        return {'key': tuple(payload['k']), 'page': int(payload['p']), 'state': state}
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {e}") from e
+
+def claim_search(query: str, content_type: str, platform: Optional[str]):
+    """Pin a query's pagination to TMDB unless the local index already answers it"""
+    key = search_cache_key(query, 1, content_type, platform)
+    if search_owners.get(key) is None:
+        search_owners.set(key, 'tmdb')
+
+def local_search(query: str, page: int, content_type: str, platform: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Answer a search from the local index, or None if it should go upstream.
+
+    The index takes a query once TMDB's result count for it is known and the
+    index matches at least ``LOCAL_SEARCH_MIN_COVERAGE`` of that count (and
+    ``LOCAL_SEARCH_MIN_HITS`` titles). The choice is recorded per query in
+    ``search_owners``, so every page of a query, and its totals, come from
+    whichever source answered it first.
+    """
+    if not LOCAL_SEARCH_ENABLED:
+        return None
+    owner_key = search_cache_key(query, 1, content_type, platform)
+    owner = search_owners.get(owner_key)
+    if owner == 'tmdb':
+        return None
+    allowed = availability.on_platform(platform) if platform else None
+    page_size = TMDBClient.PAGE_SIZE
+    total, hits = search_index.search(query, content_type, allowed, limit=page * page_size)
+    if owner is None:
+        upstream_total = tmdb_client.upstream_total(query, content_type)
+        if upstream_total is None:
+            return None
+        # Coverage compares unfiltered counts, as TMDB's count is for the whole query
+        matched = total if allowed is None else search_index.search(query, content_type, limit=0)[0]
+        if matched < max(LOCAL_SEARCH_MIN_HITS, upstream_total * LOCAL_SEARCH_MIN_COVERAGE):
+            return None
+        search_owners.set(owner_key, 'local')
     return {
-        "message": "KingShit.fu API is running!", 
-        "status": "online", 
-        "platforms": len(SUPPORTED_PLATFORMS),
-        "casting_support": ["chromecast", "airplay", "dlna"],
-        "tv_compatibility": True
+        'results': hits[(page - 1) * page_size:],
+        'total_results': total,
+        'page': page,
+        'total_pages': max(1, math.ceil(total / page_size)),
+        'content_type': content_type,
+        'platform_filter': platform,
+        'source': 'local'
     }
 
+async def cached_search(query: str, page: int, content_type: str, platform: Optional[str],
+                        cursor: Dict[str, Any] = None) -> PreparedResponse:
+    key = search_cache_key(query, page, content_type, platform)
+    degraded = False
+
+    async def load() -> PreparedResponse:
+        nonlocal degraded
+        data = local_search(query, page, content_type, platform)
+        if data is None:
+            data = await catalog.get_search_page(key)
+        if data is None:
+            data = await tmdb_client.search_content(query, page, content_type, platform, cursor)
+            if data.get('source') == 'tmdb':
+                degraded = availability.any_unresolved(data['results'])
+                if not degraded:
+                    catalog.write_behind(catalog.save_search_page(key, data))
+                catalog.write_behind(catalog.save_availability(availability.take_dirty()))
+        if data.get('source') == 'tmdb':
+            claim_search(query, content_type, platform)
+        if degraded:
+            return PreparedResponse.from_data(trusted_search_response(data), int(SEARCH_DEGRADED_TTL))
+        return PreparedResponse.from_data(trusted_search_response(data), SEARCH_MAX_AGE)
+
+    try:
+        return await search_cache.get_or_load(key, load, lambda prepared: SEARCH_DEGRADED_TTL if degraded else None)
+    except UpstreamUnavailable as e:
+        # Nothing fresh or stale to serve; degrade to the offline catalog without caching it
+        logger.warning(f"TMDB unavailable, serving offline results: {e}")
+        data = offline_catalog.search(query, page, content_type, platform)
+        return PreparedResponse.from_data(trusted_search_response(data))
+
+STREAM_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+def stream_frame(event: str, data: Dict[str, Any], fmt: str) -> bytes:
+    """Encode one streamed search event as an NDJSON line or an SSE message"""
+    if fmt == 'sse':
+        return b'event: %b\ndata: %b\n\n' % (event.encode(), encode_json(data))
+    return encode_json({'type': event, **data}) + b'\n'
+
+async def replay_search(prepared: PreparedResponse, fmt: str):
+    data = orjson.loads(prepared.body)
+    results = data.pop('results')
+    yield stream_frame('header', {**data, 'count': len(results)}, fmt)
+    for position, item in enumerate(results):
+        yield stream_frame('item', {'position': position, 'item': item}, fmt)
+    yield stream_frame('end', {'count': len(results)}, fmt)
+
+async def buffered_stream_page(query: str, page: int, content_type: str, platform: Optional[str],
+                               cursor: Dict[str, Any]) -> Optional[PreparedResponse]:
+    """The prepared page a streamed search should replay, or None if it is to be streamed live.
+
+    Cached, local, persisted, filtered and offline pages all go through the
+    buffered path, so their errors surface as a status before any frame is sent.
+    """
+    key = search_cache_key(query, page, content_type, platform)
+    prepared = search_cache.get(key)
+    if prepared is not None:
+        return prepared
+    if not platform and tmdb_client.live and not search_cache.loading(key):
+        data = local_search(query, page, content_type, platform) or await catalog.get_search_page(key)
+        if data is None:
+            return None
+        prepared = PreparedResponse.from_data(trusted_search_response(data), SEARCH_MAX_AGE)
+        search_cache.set(key, prepared)
+        return prepared
+    return await resolve_parsed_search(query, page, content_type, platform, cursor)
+
+async def streamed_search(query: str, page: int, content_type: str, platform: Optional[str],
+                          cursor: Dict[str, Any], fmt: str, prepared: Optional[PreparedResponse]):
+    """Stream a search page as header, item and end events.
+
+    A page ``buffered_stream_page`` already prepared is replayed; otherwise a
+    live unfiltered TMDB page is streamed as items are enhanced, and the
+    assembled page is then cached as ``cached_search`` would.
+    """
+    if prepared is not None:
+        async for frame in replay_search(prepared, fmt):
+            yield frame
+        return
+    
+    key = search_cache_key(query, page, content_type, platform)
+    stream = tmdb_client.stream_search(query, page, content_type)
+    try:
+        header = await stream.__anext__()
+    except Exception as e:
+        logger.error(f"TMDB search error: {e}")
+        await stream.aclose()
+        try:
+            prepared = await resolve_parsed_search(query, page, content_type, platform, cursor)
+        except HTTPException as error:
+            # Headers are already out; report the failure in-band
+            yield stream_frame('error', {'status': error.status_code, 'detail': error.detail}, fmt)
+            return
+        async for frame in replay_search(prepared, fmt):
+            yield frame
+        return
+    
+    header.pop('source')
+    claim_search(query, content_type, platform)
+    yield stream_frame('header', header, fmt)
+    results = {}
+    try:
+        async for position, item in stream:
+            results[position] = item
+            yield stream_frame('item', {'position': position, 'item': item}, fmt)
+    except Exception as e:
+        logger.error(f"Streamed search error: {e}")
+        yield stream_frame('error', {'detail': "Search failed"}, fmt)
+        return
+    finally:
+        await stream.aclose()
+    yield stream_frame('end', {'count': len(results)}, fmt)
+    
+    header.pop('count')
+    data = {**header, 'results': [results[position] for position in sorted(results)]}
+    if availability.any_unresolved(data['results']):
+        search_cache.set(key, PreparedResponse.from_data(trusted_search_response(data), int(SEARCH_DEGRADED_TTL)),
+                         SEARCH_DEGRADED_TTL)
+    else:
+        search_cache.set(key, PreparedResponse.from_data(trusted_search_response(data), SEARCH_MAX_AGE))
+        catalog.write_behind(catalog.save_search_page(key, {**data, 'source': 'tmdb'}))
+    catalog.write_behind(catalog.save_availability(availability.take_dirty()))
+
+TRENDING_REFRESH_INTERVAL = float(os.environ.get('TRENDING_REFRESH_INTERVAL', 3600))
+trending_fetches = TTLCache('trending_source', ttl=TRENDING_REFRESH_INTERVAL / 2, max_entries=1)
+if shared_cache is not None:
+    trending_fetches.share(shared_cache, encode_json, orjson.loads)
+
+async def fetch_trending() -> List[Dict[str, Any]]:
+    """The trending list, fetched once per interval across all workers so they serve the same one"""
+    if shared_cache is None:
+        return await tmdb_client.fetch_trending()
+    return await trending_fetches.get_or_load('all', tmdb_client.fetch_trending)
+
+trending = TrendingMaterializer(
+    fetch_trending,
+    refresh_interval=TRENDING_REFRESH_INTERVAL,
+    retry_interval=float(os.environ.get('TRENDING_RETRY_INTERVAL', 60)),
+    on_refresh=lambda items: persist_trending(items)
+)
+
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', 'true').lower() == 'true'
+snapshot: Optional[CatalogSnapshot] = None
+
+def snapshot_state() -> tuple:
+    # Shallow copies taken on the event loop; encoding happens in a worker thread
+    return (search_index.documents(), snapshot, list(trending.items), dict(availability.by_content),
+            metadata.dump())
+
+snapshot_writer = SnapshotWriter(
+    Path(os.environ.get('SNAPSHOT_PATH', ROOT_DIR / 'data' / 'catalog.snapshot')),
+    interval=float(os.environ.get('SNAPSHOT_INTERVAL', 300)),
+    collect=snapshot_state
+)
+catalog.subscribe(snapshot_writer.mark_dirty)
+
+# IMAGE_ORIGIN points the proxy at another image host, e.g. bench/tmdb_stub.py
+image_cache = ImageCache(
+    Path(os.environ.get('IMAGE_CACHE_DIR', ROOT_DIR / 'data' / 'images')),
+    max_bytes=int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024)),
+    origin=lambda: os.environ.get('IMAGE_ORIGIN') or metadata.images['secure_base_url'],
+    max_image_bytes=int(os.environ.get('IMAGE_MAX_BYTES', 10 * 1024 * 1024)),
+    timeout=float(os.environ.get('IMAGE_FETCH_TIMEOUT', 10))
+)
+def restore_snapshot(restored: CatalogSnapshot):
+    """Serve the indexes from the mapped snapshot and load its availability, metadata and trending"""
+    search_index.attach(restored)
+    suggest_index.attach(restored)
+    for key, platforms in restored.availability().items():
+        content_type, _, content_id = key.partition(':')
+        availability.set(content_type, int(content_id), platforms, persist=False)
+    stored_metadata = restored.metadata()
+    if stored_metadata:
+        metadata.load(stored_metadata)
+    items = restored.trending()
+    if items:
+        trending.load(items)
+
+async def warm_from_catalog():
+    """Rebuild in-memory state from Mongo, without replacing what a snapshot already provided"""
+    await catalog.ensure_indexes()
+    availability.load(await catalog.load_availability())
+    stored_items = [
+        item for item in await catalog.load_items(LOCAL_SEARCH_MAX_DOCS)
+        if f"{item['content_type']}:{item['id']}" not in search_index
+    ]
+    search_index.add_many(stored_items)
+    suggest_index.add_many(stored_items)
+    stored_metadata = await catalog.load_metadata()
+    if stored_metadata:
+        metadata.load(stored_metadata)
+    if trending.age is None:
+        items = await catalog.load_trending()
+        if items:
+            trending.load(items)
+
+async def persist_trending(items: List[Dict[str, Any]]):
+    if tmdb_client.live:
+        snapshot_writer.mark_dirty()
+        await catalog.save_availability(availability.take_dirty())
+        await catalog.save_trending(items)
+
+async def on_metadata_change():
+    # Cached pages embed genre names and image URLs built from the old tables
+    search_cache.invalidate()
+    if shared_cache is not None:
+        await shared_cache.invalidate(search_cache.name)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    global snapshot
+    if SNAPSHOT_ENABLED:
+        # Workers share one snapshot file, so only the shared cache leader writes it
+        if shared_cache is not None:
+            shared_cache.on_lead(snapshot_writer.start)
+        else:
+            snapshot_writer.start()
+    if shared_cache is not None:
+        await shared_cache.start()
+    snapshot = CatalogSnapshot.open(snapshot_writer.path) if SNAPSHOT_ENABLED else None
+    if snapshot is not None:
+        # Warm immediately from the mapped file; Mongo catches up in the background
+        restore_snapshot(snapshot)
+        catalog.write_behind(warm_from_catalog())
+    else:
+        await warm_from_catalog()
+    if tmdb_client.live:
+        metadata.start(tmdb_client.fetch_metadata, catalog.save_metadata, on_metadata_change)
+    else:
+        # Offline searches answer from the fixture catalog, so suggest its titles too
+        suggest_index.add_many(offline_catalog.items)
+    # Serve the last persisted trending list immediately while the first refresh runs
+    trending.start()
+    loop_lag.start()
+    if profiler.enabled:
+        profiler.install(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def shutdown_clients():
+    await loop_lag.stop()
+    await trending.stop()
+    await metadata.stop()
+    await catalog.flush()
+    await snapshot_writer.stop()
+    await upstream.close()
+    await image_cache.close()
+    if shared_cache is not None:
+        await shared_cache.stop()
+    client.close()
+
+class RequestMetrics:
+    """Request latency by route template and status, plus the in-flight gauge.
+
+    Routes are labelled by their path template (``/api/platforms/{platform_key}``)
+    rather than the raw path so label cardinality stays fixed.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self.latency = Histogram(
+            'http_request_duration_seconds', 'HTTP request latency by route and status', ('method', 'route', 'status')
+        )
+        self._route_paths: Optional[Dict[Callable, str]] = None
+
+    def route_path(self, scope) -> str:
+        if self._route_paths is None:
+            self._route_paths = {route.endpoint: route.path for route in scope['app'].routes if hasattr(route, 'endpoint')}
+        return self._route_paths.get(scope.get('endpoint'), 'unmatched')
+
+class MetricsMiddleware:
+    """Pure ASGI middleware feeding ``RequestMetrics``; no per-request objects beyond a closure"""
+
+    def __init__(self, app, metrics: RequestMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.metrics.in_flight -= 1
+            self.metrics.latency.observe(
+                (scope['method'], self.metrics.route_path(scope), str(status)), time.perf_counter() - started
+            )
+
+class LoopLagMonitor:
+    """Measures event-loop lag as how late a periodic sleep wakes up"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag = Histogram(
+            'event_loop_lag_seconds', 'Delay between a timer being due and the event loop running it',
+            buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+        )
+        self.last = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            due = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.last = max(0.0, time.perf_counter() - due)
+            self.lag.observe((), self.last)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+request_metrics = RequestMetrics()
+app.add_middleware(MetricsMiddleware, metrics=request_metrics)
+loop_lag = LoopLagMonitor(float(os.environ.get('LOOP_LAG_INTERVAL', 0.5)))
+
+class RequestProfile:
+    """Wall-clock sampling profile of one request, written as folded stacks.
+
+    A background thread wakes every ``interval`` seconds and records a stack
+    for each live task the request has spawned: the running task's real thread
+    stack under ``on-cpu``, and suspended tasks' coroutine await chains under
+    ``waiting``. Time spent awaiting TMDB therefore shows up next to time
+    spent enhancing, validating and encoding.
+    """
+
+    def __init__(self, profile_id: str, interval: float):
+        self.id = profile_id
+        self.interval = interval
+        self.tasks: List[asyncio.Task] = []
+        self.samples: Counter = Counter()
+        self._loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'profile-{profile_id}', daemon=True)
+
+    @staticmethod
+    def _label(frame) -> str:
+        code = frame.f_code
+        return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+    def _await_chain(self, task: asyncio.Task) -> List[str]:
+        labels = []
+        awaitable = task.get_coro()
+        while awaitable is not None:
+            frame = getattr(awaitable, 'cr_frame', None) or getattr(awaitable, 'gi_frame', None)
+            if frame is None:
+                # The leaf: a Future, child Task or gather waiting on I/O or other tasks
+                labels.append(f'<{type(awaitable).__name__}>')
+                break
+            labels.append(self._label(frame))
+            awaitable = getattr(awaitable, 'cr_await', None) or getattr(awaitable, 'gi_yieldfrom', None)
+        return labels
+
+    def _thread_stack(self, task: asyncio.Task) -> List[str]:
+        frame = sys._current_frames().get(self._thread_id)
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+        # Drop the event loop's own frames below the task's coroutine
+        root = getattr(task.get_coro(), 'cr_code', None)
+        start = next((i for i, frame in enumerate(frames) if frame.f_code is root), 0)
+        return [self._label(frame) for frame in frames[start:]]
+
+    def sample(self):
+        running = asyncio.current_task(self._loop)
+        for task in list(self.tasks):
+            if task.done():
+                continue
+            if task is running:
+                self.samples[';'.join(['on-cpu', *self._thread_stack(task)])] += 1
+            else:
+                self.samples[';'.join(['waiting', *self._await_chain(task)])] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except (RuntimeError, ValueError):
+                continue  # A task or frame changed under us; skip this tick
+
+    def start(self):
+        self.tasks.append(asyncio.current_task())
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.samples.items()))
+
+class Profiler:
+    """Opt-in per-request profiling, triggered by a secret header or a sample rate.
+
+    Nothing is installed unless ``PROFILE_SECRET`` or ``PROFILE_SAMPLE_RATE`` is
+    set, so the disabled path costs nothing. Output goes to ``PROFILE_DIR`` as
+    ``<id>.folded`` (flamegraph.pl / speedscope input) plus ``<id>.json`` with
+    the route, query parameters, status and duration.
+    """
+
+    HEADER = 'x-profile'
+
+    def __init__(self, secret: str, sample_rate: float, directory: Path, interval: float):
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.directory = directory
+        self.interval = interval
+        self.active: contextvars.ContextVar = contextvars.ContextVar('active_profile', default=None)
+        self.written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.secret) or self.sample_rate > 0
+
+    def trigger(self, scope) -> Optional[str]:
+        if self.secret:
+            for name, value in scope['headers']:
+                if name == b'x-profile' and hmac.compare_digest(value, self.secret.encode()):
+                    return 'header'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sampled'
+        return None
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        """Attribute tasks spawned while a profile is active (gather, ensure_future) to it"""
+        def task_factory(loop, coro, context=None):
+            task = asyncio.Task(coro, loop=loop, context=context)
+            profile = context.get(self.active) if context is not None else self.active.get()
+            if profile is not None:
+                profile.tasks.append(task)
+            return task
+        loop.set_task_factory(task_factory)
+
+    def write(self, profile: RequestProfile, metadata: Dict[str, Any]):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / f'{profile.id}.folded').write_text(profile.folded())
+        (self.directory / f'{profile.id}.json').write_text(json.dumps(metadata, indent=2))
+        self.written += 1
+
+class ProfilingMiddleware:
+    """Profiles requests selected by ``Profiler.trigger`` and tags them with ``X-Profile-Id``"""
+
+    def __init__(self, app, profiler: Profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        trigger = self.profiler.trigger(scope) if scope['type'] == 'http' else None
+        if trigger is None:
+            return await self.app(scope, receive, send)
+
+        route = re.sub(r'[^A-Za-z0-9]+', '-', scope['path']).strip('-') or 'root'
+        profile = RequestProfile(f"{time.strftime('%Y%m%dT%H%M%S')}-{route}-{uuid.uuid4().hex[:8]}", self.profiler.interval)
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message['headers'] = [*message.get('headers', []), (b'x-profile-id', profile.id.encode())]
+            await send(message)
+
+        token = self.profiler.active.set(profile)
+        profile.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            duration = time.perf_counter() - started
+            profile.stop()
+            self.profiler.active.reset(token)
+            metadata = {
+                'id': profile.id,
+                'trigger': trigger,
+                'method': scope['method'],
+                'path': scope['path'],
+                'route': request_metrics.route_path(scope),
+                'query': dict(httpx.QueryParams(scope['query_string'].decode()).multi_items()),
+                'status': status,
+                'duration_ms': round(duration * 1000, 3),
+                'interval_ms': self.profiler.interval * 1000,
+                'samples': sum(profile.samples.values())
+            }
+            try:
+                await asyncio.to_thread(self.profiler.write, profile, metadata)
+            except OSError as e:
+                logger.warning(f"Could not write profile {profile.id}: {e}")
+
+profiler = Profiler(
+    secret=os.environ.get('PROFILE_SECRET', ''),
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+    directory=Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles')),
+    interval=float(os.environ.get('PROFILE_INTERVAL_MS', 5)) / 1000
+)
+if profiler.enabled:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# API Routes
+# Bodies that only change on deploy are serialized once at import time
+STATIC_MAX_AGE = 3600
+
+ROOT_RESPONSE = PreparedResponse.from_data({
+    "message": "KingShit.fu API is running!", 
+    "status": "online", 
+    "platforms": len(SUPPORTED_PLATFORMS),
+    "casting_support": ["chromecast", "airplay", "dlna"],
+    "tv_compatibility": True
+}, STATIC_MAX_AGE)
+
+PLATFORMS_RESPONSE = PreparedResponse.from_data({"platforms": SUPPORTED_PLATFORMS}, STATIC_MAX_AGE)
+
+CAST_SUPPORT_RESPONSE = PreparedResponse.from_data({
+    "casting_capabilities": platform_registry.cast_stats,
+    "supported_protocols": ["Google Cast", "Apple AirPlay", "DLNA"],
+    "tv_optimized": True
+}, STATIC_MAX_AGE)
+
+@app.get("/api/", tags=["Health"])
+async def root(request: Request):
+    return ROOT_RESPONSE.to_response(request)
+
+def parse_search_cursor(q: str, page: int, content_type: str, platform: Optional[str],
+                        cursor: Optional[str]) -> tuple:
+    """Return the (page, pagination state) a search should serve, honouring its cursor"""
+    if not cursor:
+        return page, None
+    try:
+        decoded = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if decoded['key'] != search_cache_key(q, 1, content_type, platform):
+        raise HTTPException(status_code=400, detail="Cursor does not match this search")
+    return decoded['page'], decoded['state']
+
+async def resolve_search(q: str, page: int, content_type: str, platform: Optional[str],
+                         cursor: Optional[str]) -> PreparedResponse:
+    page, state = parse_search_cursor(q, page, content_type, platform, cursor)
+    return await resolve_parsed_search(q, page, content_type, platform, state)
+
+async def resolve_parsed_search(q: str, page: int, content_type: str, platform: Optional[str],
+                                state: Optional[Dict[str, Any]]) -> PreparedResponse:
+    try:
+        return await cached_search(q, page, content_type, platform, state)
+    except SearchPageUnreachable as e:
+        raise HTTPException(status_code=422, detail=f"{e}; follow next_cursor from an earlier page")
+    except Exception as e:
+        logger.error(f"Search error: {e}")
+        raise HTTPException(status_code=500, detail="Search failed")
+
+async def resolve_trending(content_type: str) -> PreparedResponse:
+    try:
+        prepared = await trending.get(content_type)
+        if prepared is None:
+            # No snapshot has ever loaded; fall back to the offline catalog
+            prepared = PreparedResponse.from_data(trusted_trending_response(offline_catalog.trending(content_type)))
+        return prepared
+    except Exception as e:
+        logger.error(f"Trending error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch trending content")
+
+async def resolve_platform_content(platform_key: str, content_type: str, page: int) -> PreparedResponse:
+    if platform_key not in SUPPORTED_PLATFORMS:
+        raise HTTPException(status_code=404, detail="Platform not found")
+    
+    try:
+        # Mock platform-specific content
+        return await cached_search("popular", page, content_type, platform_key)
+    except Exception as e:
+        logger.error(f"Platform content error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch platform content")
+
 @app.get("/api/search", response_model=SearchResponse, tags=["Content"])
 async def search_content(
+    request: Request,
     q: str = Query(..., description="Search query"),
     page: int = Query(1, ge=1, le=500, description="Page number"),
     content_type: str = Query('multi', regex='^(multi|movie|tv)$', description="Content type filter"),
-    platform: Optional[str] = Query(None, description="Platform filter")
+    platform: Optional[str] = Query(None, description="Platform filter"),
+    cursor: Optional[str] = Query(None, description="Continuation token from a previous page's next_cursor"),
+    stream: Optional[Literal['ndjson', 'sse']] = Query(None, description="Stream header and items as they are enriched")
 ):
     """Search for movies and TV shows across free streaming platforms with casting support"""
-    try:
-        data = await tmdb_client.search_content(q, page, content_type, platform)
-        return SearchResponse(**data)
-    except Exception as e:
-        logger.error(f"Search error: {e}")
-        raise HTTPException(status_code=500, detail="Search failed")
+    if stream:
+        page, state = parse_search_cursor(q, page, content_type, platform, cursor)
+        prepared = await buffered_stream_page(q, page, content_type, platform, state)
+        return StreamingResponse(
+            streamed_search(q, page, content_type, platform, state, stream, prepared),
+            media_type=STREAM_MEDIA_TYPES[stream],
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    prepared = await resolve_search(q, page, content_type, platform, cursor)
+    return prepared.to_response(request)
+
+@app.get("/api/suggest", tags=["Content"])
+async def suggest_titles(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Title prefix typed so far"),
+    limit: int = Query(8, ge=1, le=SuggestIndex.MAX_RESULTS, description="Maximum suggestions"),
+    content_type: str = Query('multi', regex='^(multi|movie|tv)$', description="Content type filter")
+):
+    """Typeahead suggestions for titles already in the catalog, most-voted first"""
+    suggestions = suggest_index.suggest(q, limit, content_type)
+    return PreparedResponse.from_data({"query": q, "suggestions": suggestions}, SEARCH_MAX_AGE).to_response(request)
 
 @app.get("/api/trending", response_model=TrendingResponse, tags=["Content"])
 async def get_trending_content(
+    request: Request,
     content_type: str = Query('all', regex='^(all|movie|tv)$', description="Content type filter")
 ):
     """Get trending movies and TV shows available on free platforms with casting support"""
+    prepared = await resolve_trending(content_type)
+    return prepared.to_response(request)
+
+IMAGE_FILE = re.compile(r'/([A-Za-z0-9_-]+\.(?:jpg|jpeg|png|webp|svg))$')
+
+@app.get("/api/image", tags=["Content"])
+async def get_image(
+    request: Request,
+    path: str = Query(..., max_length=512, description="TMDB image path, or an image URL from a content result"),
+    w: Optional[int] = Query(None, ge=1, le=8000, description="Rendered width in device pixels"),
+    kind: Literal['poster', 'backdrop', 'profile', 'still', 'logo'] = Query('poster', description="Image role")
+):
+    """Proxy a TMDB image at the smallest size covering ``w``, cached on local disk"""
+    match = IMAGE_FILE.search(path)
+    if match is None:
+        raise HTTPException(status_code=400, detail="Invalid image path")
     try:
-        data = await tmdb_client.get_trending_content(content_type)
-        return TrendingResponse(**data)
+        return await image_cache.serve(request, metadata.size_for_width(kind, w), '/' + match.group(1))
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Image not found")
     except Exception as e:
-        logger.error(f"Trending error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch trending content")
+        logger.error(f"Image fetch error for {path}: {e}")
+        raise HTTPException(status_code=502, detail="Image origin unavailable")
 
 @app.get("/api/platforms", tags=["Platforms"])
-async def get_supported_platforms():
+async def get_supported_platforms(request: Request):
     """Get list of supported free streaming platforms with casting capabilities"""
-    return {"platforms": SUPPORTED_PLATFORMS}
+    return PLATFORMS_RESPONSE.to_response(request)
 
-@app.get("/api/platforms/{platform_key}", tags=["Platforms"])
+@app.get("/api/platforms/{platform_key}", response_model=SearchResponse, tags=["Platforms"])
 async def get_platform_content(
+    request: Request,
     platform_key: str,
     content_type: str = Query('multi', regex='^(multi|movie|tv)$', description="Content type filter"),
     page: int = Query(1, ge=1, le=100, description="Page number")
 ):
     """Get content available on a specific platform with casting info"""
-    if platform_key not in SUPPORTED_PLATFORMS:
-        raise HTTPException(status_code=404, detail="Platform not found")
-    
-    try:
-        # Mock platform-specific content
-        data = await tmdb_client.search_content("popular", page, content_type, platform_key)
-        return SearchResponse(**data)
-    except Exception as e:
-        logger.error(f"Platform content error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch platform content")
+    prepared = await resolve_platform_content(platform_key, content_type, page)
+    return prepared.to_response(request)
+
+async def resolve_batch_operation(operation: BatchOperation) -> PreparedResponse:
+    if operation.op == 'search':
+        return await resolve_search(operation.q, operation.page, operation.content_type, operation.platform,
+                                    operation.cursor)
+    if operation.op == 'trending':
+        return await resolve_trending(operation.content_type)
+    if operation.op == 'platform':
+        return await resolve_platform_content(operation.platform_key, operation.content_type, operation.page)
+    if operation.op == 'platforms':
+        return PLATFORMS_RESPONSE
+    return CAST_SUPPORT_RESPONSE
+
+@app.post("/api/batch", tags=["Content"])
+async def run_batch(request: Request, batch: BatchRequest):
+    """Run several read requests concurrently and return their bodies in one response.
+
+    Each entry carries its own status, so one failing sub-request does not fail
+    the rest; identical sub-requests are resolved once.
+    """
+    pending: Dict[str, asyncio.Task] = {}
+    tasks = []
+    for operation in batch.requests:
+        key = operation.model_dump_json(exclude={'id'})
+        if key not in pending:
+            pending[key] = asyncio.ensure_future(resolve_batch_operation(operation))
+        tasks.append(pending[key])
+    outcomes = await asyncio.gather(*pending.values(), return_exceptions=True)
+    results = dict(zip(pending.values(), outcomes))
+
+    # Sub-responses are already serialized; splice their bytes in rather than re-encoding
+    entries = []
+    for index, (operation, task) in enumerate(zip(batch.requests, tasks)):
+        outcome = results[task]
+        if isinstance(outcome, PreparedResponse):
+            status, body = 200, outcome.body
+        elif isinstance(outcome, HTTPException):
+            status, body = outcome.status_code, encode_json({"detail": outcome.detail})
+        else:
+            logger.error(f"Batch {operation.op} error: {outcome}")
+            status, body = 500, encode_json({"detail": "Request failed"})
+        entry_id = encode_json(operation.id if operation.id is not None else str(index))
+        entries.append(b'{"id":%b,"op":"%b","status":%d,"body":%b}' % (entry_id, operation.op.encode(), status, body))
+    headers: Dict[str, str] = {}
+    body = negotiated_body(request, b'{"responses":[' + b','.join(entries) + b']}', headers)
+    return Response(content=body, media_type='application/json', headers=headers)
 
 @app.get("/api/cast-support", tags=["Casting"])
-async def get_cast_support():
+async def get_cast_support(request: Request):
     """Get casting support information across all platforms"""
-    cast_stats = {
-        'chromecast': 0,
-        'airplay': 0,
-        'dlna': 0,
-        'total_platforms': len(SUPPORTED_PLATFORMS)
-    }
-    
-    for platform_info in SUPPORTED_PLATFORMS.values():
-        cast_support = platform_info.get('cast_support', {})
-        for cast_type, supported in cast_support.items():
-            if supported and cast_type in cast_stats:
-                cast_stats[cast_type] += 1
-    
+    return CAST_SUPPORT_RESPONSE.to_response(request)
+
+@app.get("/api/cache/stats", tags=["Health"])
+async def get_cache_stats():
+    """Hit/miss/eviction counters for the in-process response caches"""
     return {
-        "casting_capabilities": cast_stats,
-        "supported_protocols": ["Google Cast", "Apple AirPlay", "DLNA"],
-        "tv_optimized": True
+        "caches": {
+            cache.name: cache.stats()
+            for cache in (search_cache, tmdb_client.upstream_pages, tmdb_client.page_states, tmdb_client.provider_cache,
+                          tmdb_client.tv_detail_cache, tmdb_client.search_totals, search_owners)
+        },
+        "trending": trending.stats(),
+        "upstream": upstream.stats(),
+        "availability": availability.stats(),
+        "search_index": search_index.stats(),
+        "snapshot": {**snapshot_writer.stats(), 'loaded_items': len(snapshot) if snapshot is not None else 0},
+        "suggest_index": suggest_index.stats(),
+        "shared": await shared_cache.stats() if shared_cache is not None else None,
+        "images": image_cache.stats(),
+        "pid": os.getpid()
     }
 
+@app.get("/api/metrics", tags=["Health"])
+async def get_metrics():
+    """Prometheus text-format metrics for requests, upstream calls, caches and the event loop"""
+    caches = (search_cache, tmdb_client.upstream_pages, tmdb_client.page_states, tmdb_client.provider_cache,
+              tmdb_client.tv_detail_cache, tmdb_client.search_totals, search_owners)
+    lines = [
+        *request_metrics.latency.render(),
+        *prometheus_metric('http_requests_in_flight', 'gauge', 'HTTP requests currently being served', (),
+                           {(): request_metrics.in_flight}),
+        *upstream.render_metrics(),
+        *prometheus_metric('cache_requests_total', 'counter', 'Cache lookups by result', ('cache', 'result'), {
+            **{(cache.name, 'hit'): cache.hits for cache in caches},
+            **{(cache.name, 'miss'): cache.misses for cache in caches}
+        }),
+        *prometheus_metric('cache_hit_ratio', 'gauge', 'Fraction of cache lookups that hit', ('cache',), {
+            (cache.name,): cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0
+            for cache in caches
+        }),
+        *prometheus_metric('cache_entries', 'gauge', 'Entries currently cached', ('cache',),
+                           {(cache.name,): len(cache) for cache in caches}),
+        *prometheus_metric('cache_bytes', 'gauge', 'Approximate bytes currently cached', ('cache',),
+                           {(cache.name,): cache.bytes for cache in caches}),
+        *loop_lag.lag.render()
+    ]
+    lines += prometheus_metric('event_loop_lag_last_seconds', 'gauge', 'Most recently measured event-loop lag', (),
+                               {(): loop_lag.last})
+    return Response(content='\n'.join(lines) + '\n', media_type='text/plain; version=0.0.4')
+
 @app.get("/api/health", tags=["Health"])
 async def health_check():
     """API health check with platform count and casting info"""
@@ -826,6 +4600,7 @@ async def health_check():
         "api_keys": {
             "tmdb": "configured" if os.environ.get('TMDB_API_KEY') else "missing"
         },
+        "tmdb_mode": "live" if tmdb_client.live else "offline",
         "platforms_count": len(SUPPORTED_PLATFORMS),
         "content_types": ["movie", "tv"],
         "casting_support": ["chromecast", "airplay", "dlna"],
@@ -835,4 +4610,10 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
+    if WEB_CONCURRENCY > 1:
+        # Hand over to the uvicorn CLI so spawned workers import only the app, not this script as well
+        os.execv(sys.executable, [
+            sys.executable, '-m', 'uvicorn', 'server:app', '--app-dir', str(ROOT_DIR),
+            '--host', '0.0.0.0', '--port', '8001', '--workers', str(WEB_CONCURRENCY)
+        ])
     uvicorn.run(app, host="0.0.0.0", port=8001)
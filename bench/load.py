@@ -0,0 +1,283 @@
+"""Load test the backend against a local TMDB stand-in.
+
+Starts ``bench/tmdb_stub.py`` (with optional latency and error injection) and
+the backend under uvicorn, pointed at the stub through ``TMDB_BASE_URL``. It
+then drives a weighted mix of ``/api/search``, ``/api/trending``,
+``/api/platforms/{key}`` and ``/api/platforms`` at a fixed concurrency and
+reports RPS, error rate and p50/p95/p99 latency per endpoint. Results are
+written as JSON so runs can be compared between builds (``--compare``).
+With ``--offline`` no stub is started and the backend serves its built-in
+offline catalog (``TMDB_MODE=offline``), measuring the app alone.
+``--workers 1,2,4`` repeats the run per worker count and reports how RPS
+scales against the first count.
+
+Usage: python bench/load.py [--concurrency 32] [--duration 20] [--warmup 3]
+                            [--workers 1[,2,4]] [--latency-ms 40] [--error-rate 0.0] [--offline]
+                            [--url http://host:port] [--output FILE]
+                            [--compare PREVIOUS.json] [--env KEY=VALUE ...]
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCH_DIR = REPO_ROOT / 'bench'
+BACKEND_DIR = REPO_ROOT / 'backend'
+
+# Search terms drawn with Zipf-like weights so popular queries repeat, like real traffic
+SEARCH_TERMS = [
+    'night', 'river', 'empire', 'ghost', 'summer', 'city', 'storm', 'legacy', 'shadow', 'heart',
+    'dark knight', 'star', 'love', 'war', 'house', 'dragon', 'king', 'space', 'detective', 'island',
+    'zombie', 'family', 'office', 'crime', 'queen', 'planet', 'robot', 'wild', 'secret', 'murder',
+    'comedy', 'horror', 'mystery', 'high school', 'music', 'heist', 'ocean', 'winter', 'alien', 'spy'
+]
+SEARCH_WEIGHTS = [1 / (rank + 1) for rank in range(len(SEARCH_TERMS))]
+
+# Endpoint mix: (name, weight)
+MIX = [('search', 50), ('trending', 20), ('platform_content', 20), ('platforms', 10)]
+
+# The stub has no quota, so by default don't let the TMDB rate limiter cap the run
+DEFAULT_APP_ENV = {
+    'TMDB_API_KEY': 'bench',
+    'UPSTREAM_RATE_LIMIT': '100000',
+    'UPSTREAM_RATE_BURST': '100000',
+    'MONGO_TIMEOUT_MS': '200'
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url, timeout=1.0)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f'{url} did not become ready within {timeout}s')
+
+
+def start_process(args: list, cwd: Path, log: Path, env: dict = None) -> subprocess.Popen:
+    # Output goes to a file: an undrained pipe would block the server once it fills
+    with open(log, 'wb') as output:
+        return subprocess.Popen(args, cwd=cwd, env={**os.environ, **(env or {})},
+                                stdout=output, stderr=subprocess.STDOUT)
+
+
+def stop_process(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def pick_request(platform_keys: list) -> tuple:
+    kind = random.choices([name for name, _ in MIX], weights=[weight for _, weight in MIX])[0]
+    if kind == 'search':
+        params = {'q': random.choices(SEARCH_TERMS, weights=SEARCH_WEIGHTS)[0], 'page': random.choice([1, 1, 1, 2])}
+        if random.random() < 0.3:
+            params['content_type'] = random.choice(['movie', 'tv'])
+        return kind, '/api/search', params
+    if kind == 'trending':
+        return kind, '/api/trending', {'content_type': random.choice(['all', 'all', 'movie', 'tv'])}
+    if kind == 'platform_content':
+        return kind, f'/api/platforms/{random.choice(platform_keys)}', {}
+    return kind, '/api/platforms', {}
+
+
+async def drive(base_url: str, concurrency: int, duration: float, warmup: float) -> tuple:
+    """Run the mix; returns ({endpoint: [(latency, ok)]}, measured seconds)"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        platform_keys = list((await client.get('/api/platforms')).json()['platforms'])
+        samples = {name: [] for name, _ in MIX}
+        started = time.monotonic()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        async def worker():
+            while True:
+                now = time.monotonic()
+                if now >= stop_at:
+                    return
+                kind, path, params = pick_request(platform_keys)
+                sent = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if now >= measure_from:
+                    samples[kind].append((time.perf_counter() - sent, ok))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples, duration
+
+
+def summarize(samples: list, seconds: float) -> dict:
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / seconds, 1),
+        'errors': errors,
+        'error_rate': round(errors / len(samples), 4) if samples else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round((latencies[-1] if latencies else 0) * 1000, 2)
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_report(report: dict, previous: dict = None):
+    print(f"{'endpoint':<18}{'requests':>10}{'rps':>10}{'err%':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, stats in report['endpoints'].items():
+        line = (f"{name:<18}{stats['requests']:>10}{stats['rps']:>10}{stats['error_rate'] * 100:>7.2f}%"
+                f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+        before = (previous or {}).get('endpoints', {}).get(name)
+        if before and before['rps']:
+            line += f"   rps {(stats['rps'] / before['rps'] - 1) * 100:+.1f}%  p95 {stats['p95_ms'] - before['p95_ms']:+.2f}ms"
+        print(line)
+
+
+def print_scaling(reports: list):
+    base = reports[0]
+    print(f"{'workers':<10}{'rps':>10}{'speedup':>10}{'efficiency':>12}{'p95':>10}{'err%':>8}")
+    for report in reports:
+        workers, overall = report['config']['workers'], report['overall']
+        speedup = overall['rps'] / base['overall']['rps'] if base['overall']['rps'] else 0.0
+        efficiency = speedup / (workers / base['config']['workers'])
+        print(f"{workers:<10}{overall['rps']:>10}{speedup:>9.2f}x{efficiency * 100:>11.0f}%"
+              f"{overall['p95_ms']:>10}{overall['error_rate'] * 100:>7.2f}%")
+
+
+async def run(args) -> dict:
+    processes = []
+    try:
+        base_url = args.url
+        if base_url is None:
+            app_port = free_port()
+            args.log_dir.mkdir(parents=True, exist_ok=True)
+            if args.offline:
+                app_env = {**DEFAULT_APP_ENV, 'TMDB_MODE': 'offline'}
+            else:
+                tmdb_port = free_port()
+                processes.append(start_process([
+                    sys.executable, str(BENCH_DIR / 'tmdb_stub.py'), '--port', str(tmdb_port),
+                    '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+                    '--error-rate', str(args.error_rate), '--throttle-rate', str(args.throttle_rate)
+                ], cwd=REPO_ROOT, log=args.log_dir / 'tmdb_stub.log'))
+                await wait_ready(f'http://127.0.0.1:{tmdb_port}/stats')
+                app_env = {**DEFAULT_APP_ENV, 'TMDB_BASE_URL': f'http://127.0.0.1:{tmdb_port}/3',
+                           'IMAGE_ORIGIN': f'http://127.0.0.1:{tmdb_port}/t/p/'}
+            # Workers read their count from WEB_CONCURRENCY to split the TMDB quota and share a cache
+            app_env['WEB_CONCURRENCY'] = str(args.workers)
+            app_env.update(pair.split('=', 1) for pair in args.env)
+            processes.append(start_process([
+                sys.executable, '-m', 'uvicorn', 'server:app', '--host', '127.0.0.1', '--port', str(app_port),
+                '--log-level', 'warning'
+            ], cwd=BACKEND_DIR, log=args.log_dir / 'backend.log', env=app_env))
+            base_url = f'http://127.0.0.1:{app_port}'
+        await wait_ready(f'{base_url}/api/health')
+
+        samples, seconds = await drive(base_url, args.concurrency, args.duration, args.warmup)
+    finally:
+        for process in reversed(processes):
+            stop_process(process)
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'config': {
+            'url': args.url, 'concurrency': args.concurrency, 'duration': args.duration, 'warmup': args.warmup,
+            'workers': args.workers, 'latency_ms': args.latency_ms, 'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate, 'throttle_rate': args.throttle_rate, 'offline': args.offline,
+            'env': args.env
+        },
+        'overall': summarize([sample for values in samples.values() for sample in values], seconds),
+        'endpoints': {name: summarize(values, seconds) for name, values in samples.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before measuring')
+    parser.add_argument('--workers', default='1',
+                        help='Backend worker processes; a comma-separated list runs a scaling sweep')
+    parser.add_argument('--latency-ms', type=float, default=40, help='Stub TMDB mean latency')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='Stub TMDB latency standard deviation')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Stub TMDB fraction of 503 responses')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Stub TMDB fraction of 429 responses')
+    parser.add_argument('--offline', action='store_true',
+                        help='Serve the backend\'s offline catalog instead of starting the stub')
+    parser.add_argument('--url', help='Benchmark an already running backend instead of starting one')
+    parser.add_argument('--env', action='append', default=[], metavar='KEY=VALUE',
+                        help='Extra environment for the backend (repeatable)')
+    parser.add_argument('--log-dir', type=Path, default=BENCH_DIR / 'results' / 'logs',
+                        help='Where the stub and backend write their output')
+    parser.add_argument('--output', type=Path, help='Results file (default bench/results/load-<time>.json)')
+    parser.add_argument('--compare', type=Path, help='Previous results file to print deltas against')
+    args = parser.parse_args()
+
+    worker_counts = [int(count) for count in args.workers.split(',')]
+    reports = []
+    for workers in worker_counts:
+        args.workers = workers
+        reports.append(asyncio.run(run(args)))
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S')
+    if len(reports) == 1:
+        report = reports[0]
+        output = args.output or BENCH_DIR / 'results' / f'load-{stamp}.json'
+    else:
+        report = {'sweep': reports}
+        output = args.output or BENCH_DIR / 'results' / f'scaling-{stamp}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    if len(reports) == 1:
+        previous = json.loads(args.compare.read_text()) if args.compare else None
+        print_report({'endpoints': {**report['endpoints'], 'overall': report['overall']}},
+                     previous and {'endpoints': {**previous['endpoints'], 'overall': previous['overall']}})
+    else:
+        print_scaling(reports)
+    print(f'\nResults written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Per-request CPU cost of serializing a search page.
+
+Compares the response paths the backend has used for ``/api/search``:
+
+* ``response_model``  - ``SearchResponse(**data)`` returned from the route, then
+  re-validated and encoded by FastAPI (the original behaviour)
+* ``validated``       - ``SearchResponse(**data).model_dump_json()``
+* ``trusted``         - ``trusted_search_response(data)`` encoded with orjson
+
+Usage: python bench/serialization.py [--iterations N] [--items N] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+os.environ.setdefault('MONGO_TIMEOUT_MS', '100')
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_model_field  # noqa: E402
+
+import server  # noqa: E402
+
+
+def build_page(items: int) -> dict:
+    results = []
+    for i in range(items):
+        content_type = 'movie' if i % 2 else 'tv'
+        results.append({
+            'id': 1000 + i,
+            'title': f'Benchmark Title {i}',
+            'overview': 'A long enough overview to resemble real TMDB payloads. ' * 4,
+            'poster_path': f'https://image.tmdb.org/t/p/w500/poster{i}.jpg',
+            'backdrop_path': f'https://image.tmdb.org/t/p/w1280/backdrop{i}.jpg',
+            'release_date': '2010-07-15' if content_type == 'movie' else '',
+            'first_air_date': '2011-04-17' if content_type == 'tv' else '',
+            'vote_average': 7.9,
+            'vote_count': 12000 + i,
+            'genre_names': ['Action', 'Drama'],
+            'platforms': server.availability.platforms(content_type, 1000 + i),
+            'content_type': content_type,
+            'seasons': 3 if content_type == 'tv' else None,
+            'episodes': 30 if content_type == 'tv' else None,
+            'cast_support': {'chromecast': True, 'airplay': True, 'dlna': False}
+        })
+    return {'results': results, 'total_results': items, 'page': 1, 'total_pages': 1,
+            'content_type': 'multi', 'platform_filter': None}
+
+
+def response_model_path(field):
+    async def run(data):
+        model = server.SearchResponse(**data)
+        content = await serialize_response(field=field, response_content=model)
+        return JSONResponse(content).body
+    return run
+
+
+def validated_path(data):
+    return server.SearchResponse(**data).model_dump_json().encode('utf-8')
+
+
+def trusted_path(data):
+    return server.encode_json(server.trusted_search_response(data))
+
+
+def measure(fn, data, iterations: int, is_async: bool = False) -> float:
+    import asyncio
+    loop = asyncio.new_event_loop()
+    call = (lambda: loop.run_until_complete(fn(data))) if is_async else (lambda: fn(data))
+    for _ in range(min(50, iterations)):
+        call()
+    start = time.process_time()
+    for _ in range(iterations):
+        call()
+    elapsed = time.process_time() - start
+    loop.close()
+    return elapsed / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=28)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    data = build_page(args.items)
+    field = create_model_field(name='Response_search', type_=server.SearchResponse, mode='serialization')
+
+    results = {
+        'response_model': measure(response_model_path(field), data, args.iterations, is_async=True),
+        'validated': measure(validated_path, data, args.iterations),
+        'trusted': measure(trusted_path, data, args.iterations),
+    }
+
+    if args.json:
+        print(json.dumps({'items': args.items, 'iterations': args.iterations, 'cpu_us_per_request': results}))
+        return
+
+    baseline = results['response_model']
+    print(f"search page with {args.items} items, {args.iterations} iterations")
+    for name, micros in results.items():
+        print(f"  {name:<15} {micros:9.1f} us/request  ({baseline / micros:4.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Local stand-in for the TMDB v3 endpoints the backend calls.
+
+Serves deterministic search, trending, genre, configuration, watch-provider
+and TV-detail payloads, plus placeholder images under ``/t/p/<size>/``, with
+configurable latency and error injection, so the backend can be load-tested
+without a TMDB key or network access. Point the backend at it with
+``TMDB_BASE_URL=http://127.0.0.1:<port>/3`` and
+``IMAGE_ORIGIN=http://127.0.0.1:<port>/t/p/``.
+
+Usage: python bench/tmdb_stub.py [--port 8799] [--latency-ms 40] [--jitter-ms 20]
+                                 [--error-rate 0.0] [--throttle-rate 0.0]
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+PAGE_SIZE = 20
+TOTAL_PAGES = 50
+GENRES = {
+    'movie': [(28, 'Action'), (12, 'Adventure'), (35, 'Comedy'), (80, 'Crime'), (18, 'Drama'), (27, 'Horror')],
+    'tv': [(10759, 'Action & Adventure'), (35, 'Comedy'), (80, 'Crime'), (18, 'Drama'), (9648, 'Mystery')]
+}
+# Provider names as TMDB spells them; the backend maps them onto platform keys
+PROVIDERS = ['Tubi TV', 'Pluto TV', 'The Roku Channel', 'Plex', 'Freevee', 'Crackle', 'Xumo Play', 'Peacock']
+WORDS = ['night', 'river', 'empire', 'ghost', 'summer', 'city', 'storm', 'legacy', 'shadow', 'heart']
+
+
+def stable(*parts) -> int:
+    return int.from_bytes(hashlib.blake2b(':'.join(map(str, parts)).encode(), digest_size=8).digest(), 'big')
+
+
+def item(content_id: int, media_type: str, query: str = '') -> dict:
+    seed = stable(media_type, content_id)
+    title = f"{query.title() + ' ' if query else ''}{WORDS[seed % len(WORDS)].title()} {content_id}"
+    data = {
+        'id': content_id,
+        'media_type': media_type,
+        'overview': f'Stub overview for {title}. ' * 3,
+        'poster_path': f'/poster{content_id}.jpg',
+        'backdrop_path': f'/backdrop{content_id}.jpg',
+        'vote_average': round(5 + seed % 50 / 10, 1),
+        'vote_count': seed % 30000,
+        'popularity': seed % 1000 / 10,
+        'genre_ids': [genre_id for genre_id, _ in GENRES[media_type][seed % 3:seed % 3 + 2]]
+    }
+    if media_type == 'movie':
+        data.update(title=title, release_date=f'{1980 + seed % 45}-0{1 + seed % 9}-15')
+    else:
+        data.update(name=title, first_air_date=f'{1990 + seed % 35}-0{1 + seed % 9}-01')
+    return data
+
+
+def providers(media_type: str, content_id: int) -> dict:
+    seed = stable('providers', media_type, content_id)
+    chosen = [PROVIDERS[(seed >> shift) % len(PROVIDERS)] for shift in (0, 8, 16)]
+    offers = [{'provider_name': name, 'provider_id': 1000 + PROVIDERS.index(name)} for name in dict.fromkeys(chosen)]
+    return {'id': content_id, 'results': {'US': {'free': offers[:1], 'ads': offers[1:]}}}
+
+
+def image_bytes(size: str, filename: str) -> bytes:
+    """A JPEG-tagged placeholder whose length grows with the requested width"""
+    width = int(size[1:]) if size[1:].isdigit() else 2000
+    block = hashlib.blake2b(f'{size}/{filename}'.encode(), digest_size=64).digest()
+    return b'\xff\xd8\xff\xe0' + (block * (width * 60 // len(block) + 1))[:width * 60]
+
+
+def create_app(latency_ms: float = 40, jitter_ms: float = 20, error_rate: float = 0.0,
+               throttle_rate: float = 0.0) -> FastAPI:
+    app = FastAPI(title='TMDB stub')
+    app.state.requests = 0
+
+    @app.middleware('http')
+    async def inject_faults(request: Request, call_next):
+        app.state.requests += 1
+        delay = max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000 if latency_ms or jitter_ms else 0
+        if delay:
+            await asyncio.sleep(delay)
+        roll = random.random()
+        if roll < throttle_rate:
+            return JSONResponse({'status_code': 25, 'status_message': 'Rate limited'}, status_code=429,
+                                headers={'Retry-After': '1'})
+        if roll < throttle_rate + error_rate:
+            return JSONResponse({'status_message': 'Injected failure'}, status_code=503)
+        return await call_next(request)
+
+    @app.get('/3/search/{media_type}')
+    async def search(media_type: str, query: str = '', page: int = 1):
+        base = stable('search', query.lower()) % 1_000_000 * 100 + page * PAGE_SIZE
+        results = []
+        for offset in range(PAGE_SIZE):
+            kind = media_type if media_type in ('movie', 'tv') else ('movie' if offset % 3 else 'tv')
+            results.append(item(base + offset, kind, query))
+        return {'page': page, 'results': results, 'total_pages': TOTAL_PAGES, 'total_results': TOTAL_PAGES * PAGE_SIZE}
+
+    @app.get('/3/trending/all/week')
+    async def trending():
+        return {'page': 1, 'results': [item(500 + i, 'movie' if i % 2 else 'tv') for i in range(PAGE_SIZE)],
+                'total_pages': 1, 'total_results': PAGE_SIZE}
+
+    @app.get('/3/genre/{media_type}/list')
+    async def genres(media_type: str):
+        return {'genres': [{'id': genre_id, 'name': name} for genre_id, name in GENRES.get(media_type, [])]}
+
+    @app.get('/3/configuration')
+    async def configuration():
+        return {'images': {
+            'secure_base_url': 'https://image.tmdb.org/t/p/',
+            'poster_sizes': ['w92', 'w154', 'w185', 'w342', 'w500', 'w780', 'original'],
+            'backdrop_sizes': ['w300', 'w780', 'w1280', 'original']
+        }}
+
+    @app.get('/3/{media_type}/{content_id}/watch/providers')
+    async def watch_providers(media_type: str, content_id: int):
+        return providers(media_type, content_id)
+
+    @app.get('/3/tv/{content_id}')
+    async def tv_details(content_id: int, append_to_response: str = ''):
+        seed = stable('tv', content_id)
+        data = {'id': content_id, 'number_of_seasons': 1 + seed % 12, 'number_of_episodes': 8 + seed % 200}
+        if 'watch/providers' in append_to_response:
+            data['watch/providers'] = providers('tv', content_id)
+        return data
+
+    @app.get('/t/p/{size}/{filename}')
+    async def image(size: str, filename: str):
+        return Response(image_bytes(size, filename), media_type='image/jpeg')
+
+    @app.get('/stats')
+    async def stats():
+        return {'requests': app.state.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--latency-ms', type=float, default=40, help='Mean injected latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=20, help='Standard deviation of the injected latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with 429')
+    args = parser.parse_args()
+    app = create_app(args.latency_ms, args.jitter_ms, args.error_rate, args.throttle_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
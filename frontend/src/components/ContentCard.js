@@ -1,6 +1,7 @@
 import React from 'react';
 import { Star, Play, Calendar, Users, Tv, Film, Clock } from 'lucide-react';
 import { toast } from 'sonner';
+import { imageUrl, imageSrcSet } from '../lib/api';
 
 const ContentCard = ({ content, className = '' }) => {
   const handlePlatformClick = (platform) => {
@@ -42,7 +43,8 @@ const ContentCard = ({ content, className = '' }) => {
       {/* Poster */}
       <div className="relative aspect-[2/3] overflow-hidden">
         <img
-          src={content.poster_path || '/placeholder-movie.jpg'}
+          src={imageUrl(content.poster_path, 342) || '/placeholder-movie.jpg'}
+          srcSet={imageSrcSet(content.poster_path, 342)}
           alt={content.title}
           className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-300"
           onError={(e) => {
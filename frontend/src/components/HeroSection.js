@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Play, Star, ChevronLeft, ChevronRight, Sparkles } from 'lucide-react';
 import { toast } from 'sonner';
+import { imageUrl } from '../lib/api';
 
 const HeroSection = ({ movies = [] }) => {
   const [currentIndex, setCurrentIndex] = useState(0);
@@ -63,7 +64,11 @@ const HeroSection = ({ movies = [] }) => {
       {/* Background Image */}
       <div className="absolute inset-0">
         <img
-          src={currentMovie.backdrop_path || currentMovie.poster_path || '/placeholder-backdrop.jpg'}
+          src={
+            imageUrl(currentMovie.backdrop_path, 1280, 'backdrop') ||
+            imageUrl(currentMovie.poster_path, 780) ||
+            '/placeholder-backdrop.jpg'
+          }
           alt={currentMovie.title}
           className="w-full h-full object-cover"
           onError={(e) => {
@@ -1,6 +1,7 @@
 import React from 'react';
 import { Star, Play, Calendar, Users } from 'lucide-react';
 import { toast } from 'sonner';
+import { imageUrl, imageSrcSet } from '../lib/api';
 
 const MovieCard = ({ movie, className = '' }) => {
   const handlePlatformClick = (platform) => {
@@ -28,7 +29,8 @@ const MovieCard = ({ movie, className = '' }) => {
       {/* Poster */}
       <div className="relative aspect-[2/3] overflow-hidden">
         <img
-          src={movie.poster_path || '/placeholder-movie.jpg'}
+          src={imageUrl(movie.poster_path, 342) || '/placeholder-movie.jpg'}
+          srcSet={imageSrcSet(movie.poster_path, 342)}
           alt={movie.title}
           className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-300"
           onError={(e) => {
@@ -7,3 +7,55 @@ export const api = axios.create({
   baseURL: `${backend}/api`, // <-- this adds the /api prefix
   timeout: 20000,
 });
+
+// --- Images ---
+// Posters and backdrops go through the backend's image proxy, which picks the
+// smallest TMDB size covering the rendered width and caches it on disk.
+export const imageUrl = (url, width, kind = "poster") =>
+  url ? `${backend}/api/image?${new URLSearchParams({ path: url, w: String(width), kind })}` : url;
+
+export const imageSrcSet = (url, width, kind = "poster") =>
+  url ? `${imageUrl(url, width, kind)} 1x, ${imageUrl(url, width * 2, kind)} 2x` : undefined;
+
+// --- Request batching ---
+// Reads issued in the same tick (e.g. the queries a page fires on mount) are
+// sent as one POST /batch, so high-latency clients pay one round trip. A read
+// left on its own goes out as its usual GET, which the browser can revalidate.
+let queue = [];
+
+const GET_PATHS = {
+  search: () => `/search`,
+  trending: () => `/trending`,
+  platform: ({ platform_key }) => `/platforms/${encodeURIComponent(platform_key)}`,
+  platforms: () => `/platforms`,
+  "cast-support": () => `/cast-support`,
+};
+
+const flushBatch = async () => {
+  const pending = queue;
+  queue = [];
+  if (pending.length === 1) {
+    const [{ op, params, resolve, reject }] = pending;
+    const { platform_key, ...query } = params;
+    api.get(GET_PATHS[op](params), { params: query }).then(({ data }) => resolve(data), reject);
+    return;
+  }
+  try {
+    const { data } = await api.post(`/batch`, {
+      requests: pending.map(({ op, params }, index) => ({ op, id: String(index), ...params })),
+    });
+    data.responses.forEach(({ id, status, body }) => {
+      const { resolve, reject } = pending[Number(id)];
+      if (status < 400) resolve(body);
+      else reject(Object.assign(new Error(body?.detail || `Request failed with status ${status}`), { status }));
+    });
+  } catch (err) {
+    pending.forEach(({ reject }) => reject(err));
+  }
+};
+
+export const batchGet = (op, params = {}) =>
+  new Promise((resolve, reject) => {
+    queue.push({ op, params, resolve, reject });
+    if (queue.length === 1) setTimeout(flushBatch, 0);
+  });
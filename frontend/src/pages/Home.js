@@ -1,4 +1,4 @@
-import { api } from "../lib/api";
+import { batchGet } from "../lib/api";
 import React from 'react';
 import { useQuery } from '@tanstack/react-query';
 import { Sparkles, TrendingUp, Clock, Zap, Film, Tv, Users, Globe } from 'lucide-react';
@@ -7,15 +7,10 @@ import ContentCard from '../components/ContentCard';
 import LoadingSpinner from '../components/LoadingSpinner';
 
 
-const fetchTrendingContent = async () => {
-  const { data } = await api.get(`/trending?content_type=all`);
-  return data;
-};
+// Both queries run on mount, so they share one /batch round trip
+const fetchTrendingContent = () => batchGet("trending", { content_type: "all" });
 
-const fetchPlatforms = async () => {
-  const { data } = await api.get(`/platforms`);
-  return data;
-};
+const fetchPlatforms = () => batchGet("platforms");
 
 const Home = () => {
   const { data: trendingData, isLoading, error } = useQuery({
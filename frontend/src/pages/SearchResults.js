@@ -1,5 +1,5 @@
-import { api } from "../lib/api";
-import React, { useEffect, useState } from "react";
+import { api, batchGet } from "../lib/api";
+import React, { useEffect, useRef, useState } from "react";
 import { useSearchParams } from "react-router-dom";
 import { useQuery } from "@tanstack/react-query";
 import { Search, Filter, SortAsc, ChevronDown, Film, Tv, Globe } from "lucide-react";
@@ -7,22 +7,19 @@ import ContentCard from "../components/ContentCard";
 import LoadingSpinner from "../components/LoadingSpinner";
 
 // --- API helpers (Axios via shared api client) ---
-const fetchSearchResults = async (query, page = 1, contentType = "multi", platform) => {
-  const params = new URLSearchParams({
-    q: query ?? "",
-    page: String(page),
-    content_type: contentType,
-  });
-  if (platform) params.append("platform", platform);
+// Only the search fired on mount shares the platforms read's /batch round trip;
+// later searches and page changes use GET so they keep ETag revalidation.
+const fetchSearchResults = async (query, page = 1, contentType = "multi", platform, cursor, batched = false) => {
+  const params = { q: query ?? "", page, content_type: contentType };
+  if (platform) params.platform = platform;
+  if (cursor) params.cursor = cursor;
+  if (batched) return batchGet("search", params);
 
-  const { data } = await api.get(`/search?${params.toString()}`);
+  const { data } = await api.get(`/search`, { params });
   return data;
 };
 
-const fetchPlatforms = async () => {
-  const { data } = await api.get(`/platforms`);
-  return data;
-};
+const fetchPlatforms = () => batchGet("platforms");
 
 // --- Component ---
 const SearchResults = () => {
@@ -30,6 +27,9 @@ const SearchResults = () => {
   const [currentPage, setCurrentPage] = useState(1);
   const [sortBy, setSortBy] = useState("relevance");
   const [showFilters, setShowFilters] = useState(false);
+  // Continuation tokens by page number, so filtered pages resume server-side
+  const cursors = useRef({});
+  const firstLoad = useRef(true);
 
   const query = searchParams.get("q") || "";
   const contentType = searchParams.get("content_type") || "multi";
@@ -37,11 +37,19 @@ const SearchResults = () => {
 
   const { data, isLoading, error } = useQuery({
     queryKey: ["search", query, currentPage, contentType, platformFilter],
-    queryFn: () => fetchSearchResults(query, currentPage, contentType, platformFilter),
+    queryFn: () => {
+      const batched = firstLoad.current;
+      firstLoad.current = false;
+      return fetchSearchResults(query, currentPage, contentType, platformFilter, cursors.current[currentPage], batched);
+    },
     enabled: !!query,
     keepPreviousData: true,
   });
 
+  useEffect(() => {
+    if (data?.next_cursor) cursors.current[data.page + 1] = data.next_cursor;
+  }, [data]);
+
   const { data: platformsData } = useQuery({
     queryKey: ["platforms"],
     queryFn: fetchPlatforms,
@@ -50,8 +58,17 @@ const SearchResults = () => {
 
   useEffect(() => {
     setCurrentPage(1);
+    cursors.current = {};
   }, [query, contentType, platformFilter]);
 
+  // A filtered page can only be requested with its cursor, so offer just the
+  // pages already reached plus the next one; others would be rejected (422).
+  const canReach = (page) =>
+    !platformFilter ||
+    page === 1 ||
+    !!cursors.current[page] ||
+    (!!data?.next_cursor && page === data.page + 1);
+
   const handlePageChange = (page) => {
     setCurrentPage(page);
     window.scrollTo({ top: 0, behavior: "smooth" });
@@ -291,9 +308,9 @@ const SearchResults = () => {
               </button>
 
               <div className="flex space-x-1">
-                {Array.from({ length: Math.min(5, data.total_pages) }, (_, i) => {
-                  const page = i + 1;
-                  return (
+                {Array.from({ length: Math.min(5, data.total_pages) }, (_, i) => i + 1)
+                  .filter(canReach)
+                  .map((page) => (
                     <button
                       key={page}
                       onClick={() => handlePageChange(page)}
@@ -305,13 +322,12 @@ const SearchResults = () => {
                     >
                       {page}
                     </button>
-                  );
-                })}
+                  ))}
               </div>
 
               <button
                 onClick={() => handlePageChange(currentPage + 1)}
-                disabled={currentPage === data.total_pages}
+                disabled={currentPage === data.total_pages || !canReach(currentPage + 1)}
                 className="px-4 py-2 bg-gray-800 text-white rounded-lg disabled:opacity-50 disabled:cursor-not-allowed hover:bg-gray-700 transition-colors"
               >
                 Next
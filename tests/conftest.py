@@ -0,0 +1,13 @@
+import os
+import sys
+from pathlib import Path
+
+# The backend is a single module run from its own directory; import it the same way
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Keep imports offline and quick: no TMDB key, no snapshot, fail fast on Mongo
+os.environ.setdefault('TMDB_API_KEY', '')
+os.environ.setdefault('SNAPSHOT_ENABLED', 'false')
+os.environ.setdefault('MONGO_TIMEOUT_MS', '100')
+os.environ.setdefault('OFFLINE_CATALOG_SIZE', '200')
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import server
+from server import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only the cache's own clock; the event loop keeps the real one
+    clock = Clock()
+    monkeypatch.setattr(server, 'time', type('Time', (), {'monotonic': staticmethod(clock)}))
+    return clock
+
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache('test', ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=30)
+    clock.now += 11
+    assert cache.get('a') is None and cache.get('b') == 2
+    assert len(cache) == 1 and cache.expirations == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache('test', ttl=60, max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
+    assert cache.evictions == 1
+
+
+def test_byte_budget_evicts_and_skips_oversized_values():
+    cache = TTLCache('test', ttl=60, max_bytes=10, sizeof=len)
+    cache.set('a', 'xxxx')
+    cache.set('b', 'yyyy')
+    cache.set('c', 'zzzz')
+    assert cache.get('a') is None and cache.bytes == 8
+    cache.set('d', 'w' * 11)
+    assert cache.get('d') is None and cache.bytes == 8
+
+
+def test_stale_value_is_served_while_the_loader_fails(clock):
+    cache = TTLCache('test', ttl=10, stale_ttl=60)
+    cache.set('a', 'old')
+
+    async def failing():
+        raise RuntimeError('upstream down')
+
+    clock.now += 30
+    assert asyncio.run(cache.get_or_load('a', failing)) == 'old'
+    assert cache.stale_served == 1
+    clock.now += 60
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_load('a', failing))
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache('test', ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 'value'
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load('a', loader) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ['value'] * 5
+    assert calls == [1] and cache.coalesced == 4 and not cache.loading('a')
+
+
+def test_cancelled_first_caller_does_not_fail_the_others():
+    cache = TTLCache('test', ttl=60)
+
+    async def scenario():
+        ready = asyncio.Event()
+
+        async def loader():
+            await ready.wait()
+            return 'value'
+
+        first = asyncio.create_task(cache.get_or_load('a', loader))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_load('a', loader))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        ready.set()
+        return first, await second
+
+    first, value = asyncio.run(scenario())
+    assert first.cancelled() and value == 'value'
+    assert cache.get('a') == 'value'
+
+
+def test_failed_load_reaches_every_caller_and_is_not_cached():
+    cache = TTLCache('test', ttl=60)
+
+    async def loader():
+        await asyncio.sleep(0.01)
+        raise LookupError('missing')
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load('a', loader) for _ in range(3)), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(scenario())] == [LookupError] * 3
+    assert len(cache) == 0 and not cache.loading('a')
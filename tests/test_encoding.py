@@ -0,0 +1,97 @@
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+import server
+from server import PreparedResponse, negotiate_encoding
+
+BODY = b'{"results": [' + b'{"title": "Harbor Lights"},' * 100 + b'{}]}'
+
+
+def request(**headers) -> Request:
+    encoded = [(name.replace('_', '-').encode(), value.encode()) for name, value in headers.items()]
+    return Request({'type': 'http', 'method': 'GET', 'path': '/api/search', 'headers': encoded})
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    # Negotiation only needs br to be offered; compressing with it needs the module
+    monkeypatch.setattr(server, 'CONTENT_ENCODINGS', ('br', 'gzip'))
+    negotiate_encoding.cache_clear()
+    yield
+    negotiate_encoding.cache_clear()
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0.5, gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('br;q=0, gzip;q=0', None),
+    ('identity', None),
+    ('*', 'br'),
+    ('br;q=0, *;q=0.1', 'gzip'),
+    ('*;q=0', None),
+    ('gzip;q=nonsense', None),
+    ('', None),
+    (None, None),
+])
+def test_negotiation_prefers_br_then_gzip_then_identity(with_brotli, accept, expected):
+    assert negotiate_encoding(accept) == expected
+
+
+def test_br_is_never_chosen_without_the_module(monkeypatch):
+    monkeypatch.setattr(server, 'CONTENT_ENCODINGS', ('gzip',))
+    negotiate_encoding.cache_clear()
+    try:
+        assert negotiate_encoding('br') is None
+        assert negotiate_encoding('br, gzip;q=0.1') == 'gzip'
+    finally:
+        negotiate_encoding.cache_clear()
+
+
+def test_each_coding_is_a_variant_with_its_own_etag():
+    prepared = PreparedResponse(BODY)
+    plain = prepared.to_response(request())
+    compressed = prepared.to_response(request(accept_encoding='gzip'))
+    assert plain.headers['etag'] == prepared.etag and 'content-encoding' not in plain.headers
+    assert compressed.headers['etag'] == prepared.etag[:-1] + '-gzip"'
+    assert compressed.headers['content-encoding'] == 'gzip'
+    assert gzip.decompress(compressed.body) == BODY
+    assert plain.headers['vary'] == compressed.headers['vary'] == 'Accept-Encoding'
+
+
+def test_br_variant_round_trips(with_brotli, monkeypatch):
+    brotli = pytest.importorskip('brotli')
+    monkeypatch.setattr(server, 'brotli', brotli)
+    response = PreparedResponse(BODY).to_response(request(accept_encoding='gzip, br'))
+    assert response.headers['etag'].endswith('-br"') and response.headers['content-encoding'] == 'br'
+    assert brotli.decompress(response.body) == BODY
+
+
+def test_small_bodies_are_sent_as_is():
+    prepared = PreparedResponse(b'{"results": []}')
+    response = prepared.to_response(request(accept_encoding='gzip'))
+    assert response.headers['etag'] == prepared.etag
+    assert 'content-encoding' not in response.headers and 'vary' not in response.headers
+
+
+@pytest.mark.parametrize('accept', [None, 'gzip', 'br'])
+def test_each_variant_revalidates_to_a_304(with_brotli, accept):
+    prepared = PreparedResponse(BODY)
+    headers = {'accept_encoding': accept} if accept else {}
+    etag = prepared.variant_etag(accept)
+    response = prepared.to_response(request(if_none_match=etag, **headers))
+    assert response.status_code == 304 and response.body == b''
+    assert response.headers['etag'] == etag
+    # A tag from another coding still names the same body
+    other = prepared.variant_etag('gzip' if accept != 'gzip' else None)
+    assert prepared.to_response(request(if_none_match=f'W/{other}', **headers)).status_code == 304
+
+
+def test_a_changed_body_is_sent_in_full():
+    previous = PreparedResponse(BODY + b' ')
+    response = PreparedResponse(BODY).to_response(
+        request(accept_encoding='gzip', if_none_match=previous.variant_etag('gzip'))
+    )
+    assert response.status_code == 200 and gzip.decompress(response.body) == BODY
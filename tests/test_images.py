@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+import pytest
+from starlette.requests import Request
+
+from server import ImageCache
+
+ORIGIN = 'https://images.example.test/t/p/'
+
+
+def make_cache(tmp_path, handler, **kwargs) -> ImageCache:
+    cache = ImageCache(tmp_path, max_bytes=1024 * 1024, origin=lambda: ORIGIN, **kwargs)
+    cache._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return cache
+
+
+def fetch(cache: ImageCache, image_path: str = '/poster.jpg'):
+    async def scenario():
+        try:
+            return await cache.get('w342', image_path)
+        finally:
+            await cache.close()
+    return asyncio.run(scenario())
+
+
+def test_fetches_from_the_image_origin_and_caches(tmp_path):
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, content=b'jpeg-bytes')
+
+    cache = make_cache(tmp_path, handler)
+    path = fetch(cache)
+    assert path.read_bytes() == b'jpeg-bytes'
+    assert requested == [f'{ORIGIN}w342/poster.jpg']
+    assert cache.stats()['bytes'] == len(b'jpeg-bytes')
+
+
+def test_missing_image_is_a_lookup_error(tmp_path):
+    cache = make_cache(tmp_path, lambda request: httpx.Response(404))
+    with pytest.raises(LookupError):
+        fetch(cache)
+
+
+def test_declared_oversized_image_is_refused(tmp_path):
+    cache = make_cache(tmp_path, lambda request: httpx.Response(200, content=b'x' * 64), max_image_bytes=32)
+    with pytest.raises(ValueError):
+        fetch(cache)
+    assert cache.stats()['files'] == 0
+
+
+def test_streamed_download_stops_at_the_byte_cap(tmp_path):
+    sent = []
+
+    async def body():
+        for _ in range(100):
+            sent.append(16)
+            yield b'x' * 16
+
+    # No Content-Length: only the running count can catch it
+    cache = make_cache(tmp_path, lambda request: httpx.Response(200, content=body()), max_image_bytes=64)
+    with pytest.raises(ValueError):
+        fetch(cache)
+    assert sum(sent) <= 80
+    assert [path.name for path in tmp_path.iterdir()] == ['.usage']
+
+
+def test_byte_budget_covers_every_worker_on_the_directory(tmp_path):
+    # Two caches on one directory stand in for two worker processes
+    workers = [make_cache(tmp_path, lambda request: httpx.Response(200, content=b'x' * 100)) for _ in range(2)]
+    for worker in workers:
+        worker.max_bytes = 450
+
+    async def scenario():
+        for n in range(8):
+            await workers[n % 2].get('w342', f'/poster{n}.jpg')
+        for worker in workers:
+            await worker.close()
+
+    asyncio.run(scenario())
+    stored = [path for path in tmp_path.iterdir() if not path.name.startswith('.')]
+    assert sum(path.stat().st_size for path in stored) <= 450
+    assert (tmp_path / '.usage').read_text() == str(100 * len(stored))
+    assert sum(worker.stats()['evictions'] for worker in workers) == 8 - len(stored)
+
+
+def test_file_evicted_by_another_worker_before_serving_is_fetched_again(tmp_path):
+    fetched = []
+
+    def handler(request):
+        fetched.append(request.url.path)
+        return httpx.Response(200, content=b'jpeg-bytes')
+
+    cache = make_cache(tmp_path, handler)
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/api/image', 'headers': []})
+
+    async def scenario():
+        path = await cache.get('w342', '/poster.jpg')
+        get = cache.get
+
+        async def evicted_after_lookup(size, image_path):
+            found = await get(size, image_path)
+            if not fetched[1:]:
+                found.unlink()  # Another worker's eviction pass, between get() and the response
+            return found
+
+        cache.get = evicted_after_lookup
+        try:
+            return path, await cache.serve(request, 'w342', '/poster.jpg')
+        finally:
+            await cache.close()
+
+    path, response = asyncio.run(scenario())
+    assert response.status_code == 200 and path.exists()
+    assert fetched == ['/t/p/w342/poster.jpg'] * 2
+    assert cache.stats()['refetches'] == 1
+
+
+def test_svg_is_served_as_an_inert_download(tmp_path):
+    cache = make_cache(tmp_path, lambda request: httpx.Response(200, content=b'<svg><script>alert(1)</script></svg>'))
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/api/image', 'headers': []})
+
+    async def scenario():
+        try:
+            return await cache.serve(request, 'w300', '/logo.svg'), await cache.serve(request, 'w342', '/poster.jpg')
+        finally:
+            await cache.close()
+
+    svg, jpeg = asyncio.run(scenario())
+    assert svg.headers['content-security-policy'] == "default-src 'none'"
+    assert svg.headers['content-disposition'] == 'attachment'
+    assert svg.media_type == 'image/svg+xml'
+    assert 'content-security-policy' not in jpeg.headers and 'content-disposition' not in jpeg.headers
@@ -0,0 +1,60 @@
+import orjson
+
+import server
+from server import OfflineCatalog, PreparedResponse, TMDBClient
+
+PAGE_SIZE = TMDBClient.PAGE_SIZE
+
+
+def build(size=300) -> OfflineCatalog:
+    return OfflineCatalog(server.metadata, size)
+
+
+def test_catalog_is_identical_across_builds():
+    first, second = build(), build()
+    assert orjson.dumps(first.items) == orjson.dumps(second.items)
+    assert first.trending() == second.trending()
+    pages = [PreparedResponse.from_data(catalog.search('night', 2, 'multi', None)) for catalog in (first, second)]
+    assert pages[0].etag == pages[1].etag
+
+
+def test_catalog_has_the_requested_size_with_unique_ids_and_titles():
+    catalog = build()
+    assert len(catalog) == 300
+    assert len({(item['content_type'], item['id']) for item in catalog.items}) == 300
+    assert len({item['title'] for item in catalog.items}) == 300
+    assert catalog.search('dark knight', 1, 'multi', None)['results'][0]['id'] == 155
+
+
+def paged(catalog, query, content_type='multi', platform=None):
+    first = catalog.search(query, 1, content_type, platform)
+    pages = [first] + [catalog.search(query, page, content_type, platform)
+                       for page in range(2, first['total_pages'] + 1)]
+    return first, [item for page in pages for item in page['results']], pages
+
+
+def test_search_pages_partition_the_matches():
+    catalog = build()
+    first, results, pages = paged(catalog, 'the')
+    assert first['total_pages'] > 1 and first['source'] == 'offline'
+    assert all(len(page['results']) == PAGE_SIZE for page in pages[:-1])
+    assert len(results) == first['total_results']
+    assert len({item['id'] for item in results}) == len(results)
+    assert catalog.search('the', first['total_pages'] + 1, 'multi', None)['results'] == []
+
+
+def test_browse_queries_page_through_the_most_voted_titles():
+    catalog = build()
+    first, results, _ = paged(catalog, 'popular', content_type='tv')
+    assert first['total_results'] == sum(item['content_type'] == 'tv' for item in catalog.items)
+    assert all(item['content_type'] == 'tv' for item in results)
+    votes = [item['vote_count'] for item in results]
+    assert votes == sorted(votes, reverse=True) and len(results) == first['total_results']
+
+
+def test_platform_filter_pages_only_titles_on_that_platform():
+    catalog = build()
+    platform = max(catalog.by_platform, key=lambda key: len(catalog.by_platform[key]))
+    first, results, _ = paged(catalog, 'popular', platform=platform)
+    assert first['total_results'] == len(catalog.by_platform[platform]) == len(results)
+    assert all(platform in {entry['platform'] for entry in item['platforms']} for item in results)
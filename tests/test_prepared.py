@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+
+import server
+from server import PreparedResponse
+
+
+def test_etag_is_a_hash_of_the_body():
+    first, again = PreparedResponse.from_data({'a': 1}), PreparedResponse.from_data({'a': 1})
+    assert first.etag == again.etag
+    assert first.etag.startswith('"') and first.etag.endswith('"')
+    assert PreparedResponse.from_data({'a': 2}).etag != first.etag
+
+
+def test_pack_round_trip_keeps_body_etag_and_max_age():
+    prepared = PreparedResponse.from_data({'results': [1, 2]}, max_age=300)
+    restored = PreparedResponse.unpack(prepared.pack())
+    assert (restored.body, restored.etag, restored.max_age) == (prepared.body, prepared.etag, 300)
+
+
+def test_if_none_match_forms():
+    prepared = PreparedResponse.from_data({'a': 1})
+    assert prepared.matches(prepared.etag)
+    assert prepared.matches(f'W/{prepared.etag}')
+    assert prepared.matches(f'"other", {prepared.etag}')
+    assert prepared.matches('*')
+    assert not prepared.matches('"other"')
+    assert not prepared.matches(prepared.etag[:-1])
+    assert not prepared.matches(None) and not prepared.matches('')
+
+
+def test_matching_revalidation_is_an_empty_304_with_the_cache_headers():
+    with TestClient(server.app) as client:
+        first = client.get('/api/platforms')
+        repeat = client.get('/api/platforms', headers={'If-None-Match': first.headers['etag']})
+        changed = client.get('/api/platforms', headers={'If-None-Match': '"stale"'})
+    assert first.status_code == 200 and first.headers['etag']
+    assert repeat.status_code == 304 and repeat.content == b''
+    assert repeat.headers['etag'] == first.headers['etag']
+    assert repeat.headers['cache-control'] == first.headers['cache-control']
+    assert changed.status_code == 200 and changed.content == first.content
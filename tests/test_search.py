@@ -0,0 +1,231 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import SearchPageUnreachable, TMDBClient, decode_cursor, encode_cursor, parse_search_cursor
+
+SEARCH_KEY = server.search_cache_key('alien', 1, 'multi', 'tubi')
+STATE = {'u': 3, 'o': 4, 's': 50, 'm': 30, 't': 40, 'r': 800}
+
+
+# --- Cursors ---
+
+def test_cursor_round_trips():
+    decoded = decode_cursor(encode_cursor(SEARCH_KEY, 2, STATE))
+    assert decoded == {'key': SEARCH_KEY, 'page': 2, 'state': STATE}
+
+
+def test_cursor_with_edited_state_is_rejected():
+    token = encode_cursor(SEARCH_KEY, 2, STATE)
+    forged = encode_cursor(SEARCH_KEY, 2, {**STATE, 'm': 0}).split('.')[0] + '.' + token.split('.')[1]
+    with pytest.raises(ValueError):
+        decode_cursor(forged)
+
+
+def test_unsigned_cursor_is_a_bad_request():
+    unsigned = encode_cursor(SEARCH_KEY, 2, STATE).split('.')[0]
+    with pytest.raises(HTTPException) as error:
+        parse_search_cursor('alien', 1, 'multi', 'tubi', unsigned)
+    assert error.value.status_code == 400
+
+
+# --- Filtered replay budget ---
+
+class PlatformIndex:
+    def __init__(self, matching):
+        self.matching = matching
+
+    def on_platform(self, platform):
+        return self.matching
+
+
+def make_tmdb(matches_per_page: int, total_pages: int = 500):
+    client = TMDBClient(server.upstream, PlatformIndex(set()), server.metadata, server.offline_catalog)
+    client.fetched = []
+
+    async def fetch(query, page, content_type):
+        client.fetched.append(page)
+        items = [(('movie', page * 100 + n), {'id': page * 100 + n}) for n in range(20)]
+        return {'items': items, 'total_results': total_pages * 20, 'total_pages': total_pages}
+
+    async def resolve(items, default_type):
+        return None
+
+    client._fetch_search_page = fetch
+    client._resolve_items = resolve
+    client.availability.matching = {('movie', page * 100 + n) for page in range(1, total_pages + 1)
+                                     for n in range(matches_per_page)}
+    return client
+
+
+def test_replay_shares_one_upstream_budget():
+    client = make_tmdb(matches_per_page=1)
+    with pytest.raises(SearchPageUnreachable):
+        asyncio.run(client._search_filtered('alien', 12, 'multi', 'tubi'))
+    assert len(client.fetched) == TMDBClient.MAX_UPSTREAM_PAGES_PER_REQUEST
+
+
+def test_replay_resumes_from_recorded_progress():
+    client = make_tmdb(matches_per_page=7)
+    attempts = []
+    for _ in range(3):
+        client.fetched = []
+        try:
+            page = asyncio.run(client._search_filtered('alien', 6, 'multi', 'tubi'))
+            break
+        except SearchPageUnreachable:
+            attempts.append(client.fetched)
+    assert len(page['results']) == TMDBClient.PAGE_SIZE
+    assert page['next_cursor']
+    # A page that starts partway through an upstream page rereads it uncharged
+    budget = TMDBClient.MAX_UPSTREAM_PAGES_PER_REQUEST + 1
+    assert attempts and all(len(set(fetched)) <= budget for fetched in attempts)
+    assert client.fetched[0] > attempts[-1][0]
+
+
+def test_shallow_replay_fits_the_budget():
+    client = make_tmdb(matches_per_page=14)
+    page = asyncio.run(client._search_filtered('alien', 3, 'multi', 'tubi'))
+    assert len(page['results']) == TMDBClient.PAGE_SIZE
+    assert sorted(set(client.fetched)) == [1, 2, 3, 4, 5, 6]
+
+
+# --- Local answers ---
+
+@pytest.fixture
+def local_index(monkeypatch):
+    index = server.SearchIndex()
+    index.add_many([{'content_type': 'movie', 'id': n, 'title': f'Summer Story {n}', 'vote_count': n}
+                    for n in range(1, 41)])
+    monkeypatch.setattr(server, 'search_index', index)
+    monkeypatch.setattr(server, 'search_owners', server.TTLCache('search_owners', ttl=60))
+    monkeypatch.setattr(server.tmdb_client, 'search_totals', server.TTLCache('search_totals', ttl=60))
+    return index
+
+
+def known_upstream_total(query, total):
+    server.tmdb_client.search_totals.set((query, 'multi'), total)
+
+
+def test_local_search_waits_for_the_upstream_count(local_index):
+    assert server.local_search('summer story', 1, 'multi', None) is None
+
+
+def test_local_search_owns_every_page_of_a_covered_query(local_index):
+    known_upstream_total('summer story', 45)
+    first = server.local_search('summer story', 1, 'multi', None)
+    second = server.local_search('Summer  Story', 2, 'multi', None)
+    assert (first['total_results'], first['total_pages'], first['source']) == (40, 2, 'local')
+    assert len(first['results']) == TMDBClient.PAGE_SIZE and len(second['results']) == 40 - TMDBClient.PAGE_SIZE
+    assert not {item['id'] for item in first['results']} & {item['id'] for item in second['results']}
+
+
+def test_local_search_tolerates_typos(local_index):
+    known_upstream_total('sumer stroy', 0)
+    assert server.local_search('sumer stroy', 1, 'multi', None)['total_results'] == 40
+
+
+def test_local_search_defers_when_it_covers_little_of_upstream(local_index):
+    known_upstream_total('summer story', 1000)
+    assert server.local_search('summer story', 1, 'multi', None) is None
+
+
+def test_local_search_defers_below_the_hit_threshold(local_index):
+    known_upstream_total('summer story 7', 1)
+    assert server.local_search('summer story 7', 1, 'multi', None) is None
+
+
+def test_filtered_query_is_judged_on_unfiltered_coverage(local_index, monkeypatch):
+    known_upstream_total('summer story', 40)
+    monkeypatch.setattr(server.availability, 'on_platform', lambda platform: {'movie:1', 'movie:2'})
+    data = server.local_search('summer story', 1, 'multi', 'tubi')
+    assert (data['total_results'], data['total_pages']) == (2, 1)
+
+
+def test_query_claimed_by_tmdb_stays_upstream(local_index):
+    known_upstream_total('summer story', 40)
+    server.claim_search('summer story', 'multi', None)
+    assert server.local_search('summer story', 2, 'multi', None) is None
+
+
+def test_snapshot_backed_index_matches_an_in_memory_one(tmp_path):
+    items = [{'content_type': 'movie', 'id': n, 'title': f'Summer Story {n}', 'overview': 'A lighthouse keeper',
+              'vote_count': n} for n in range(1, 41)]
+    path = tmp_path / 'catalog.snapshot'
+    server.CatalogSnapshot.write(path, [(f"movie:{item['id']}", item) for item in items], None, [], {}, None)
+    snapshot = server.CatalogSnapshot.open(path)
+    mapped, memory = server.SearchIndex(), server.SearchIndex()
+    mapped.attach(snapshot)
+    memory.add_many(items)
+    for query in ('summer story', 'lighthuose', 'story 7'):
+        assert mapped.search(query) == memory.search(query)
+
+    mapped.add({'content_type': 'movie', 'id': 7, 'title': 'Winter Story', 'vote_count': 7})
+    mapped.remove('movie:8')
+    assert mapped.search('summer')[0] == 38 and 'movie:7' in mapped and 'movie:8' not in mapped
+    assert [doc['title'] for doc in mapped.search('winter')[1]] == ['Winter Story']
+    assert len(mapped.documents()) == 39
+    snapshot.close()
+
+
+# --- Unresolved availability ---
+
+@pytest.fixture
+def upstream_search(monkeypatch):
+    saved = []
+    monkeypatch.setattr(server, 'search_cache', server.TTLCache('search', ttl=300, stale_ttl=600))
+    monkeypatch.setattr(server, 'local_search', lambda *args: None)
+
+    async def get_search_page(key):
+        return None
+
+    async def save_search_page(key, data):
+        saved.append(key)
+
+    async def save_availability(keys):
+        return None
+
+    monkeypatch.setattr(server.catalog, 'get_search_page', get_search_page)
+    monkeypatch.setattr(server.catalog, 'save_search_page', save_search_page)
+    monkeypatch.setattr(server.catalog, 'save_availability', save_availability)
+    return saved
+
+
+def search_page(*ids):
+    async def search_content(query, page, content_type, platform, cursor):
+        results = [{'id': content_id, 'title': 'Fog', 'content_type': 'movie', 'platforms': []} for content_id in ids]
+        return {'results': results, 'page': page, 'total_results': len(ids), 'total_pages': 1, 'source': 'tmdb'}
+    return search_content
+
+
+def test_page_with_unresolved_titles_is_cached_briefly_and_not_persisted(upstream_search, monkeypatch):
+    monkeypatch.setattr(server.tmdb_client, 'search_content', search_page(7001, 7002))
+    server.availability.mark_unresolved('movie', 7002)
+
+    async def scenario():
+        prepared = await server.cached_search('fog', 1, 'multi', None)
+        await asyncio.sleep(0)
+        return prepared
+
+    prepared = asyncio.run(scenario())
+    expires_at = server.search_cache._data[server.search_cache_key('fog', 1, 'multi', None)][0]
+    assert upstream_search == []
+    assert prepared.max_age == int(server.SEARCH_DEGRADED_TTL)
+    assert expires_at - time.monotonic() <= server.SEARCH_DEGRADED_TTL
+
+
+def test_resolved_page_is_persisted(upstream_search, monkeypatch):
+    monkeypatch.setattr(server.tmdb_client, 'search_content', search_page(7003))
+    server.availability.mark_unresolved('movie', 7003)
+    server.availability.set('movie', 7003, {})
+
+    async def scenario():
+        prepared = await server.cached_search('mist', 1, 'multi', None)
+        await asyncio.sleep(0)
+        return prepared
+
+    assert asyncio.run(scenario()).max_age == server.SEARCH_MAX_AGE
+    assert upstream_search == [server.search_cache_key('mist', 1, 'multi', None)]
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import tempfile
+
+from server import SharedCache, SharedCacheStore
+
+
+def test_store_refuses_a_set_from_before_an_invalidation():
+    store = SharedCacheStore(max_bytes=1024)
+    assert store.set('search', b'k', b'old', ttl=60, generation=0)
+    assert store.invalidate('search') == 1
+    assert store.get('search', b'k') is None
+    assert not store.set('search', b'k', b'stale', ttl=60, generation=0)
+    assert store.set('search', b'k', b'fresh', ttl=60, generation=1)
+    assert store.get('search', b'k')[0] == b'fresh'
+
+
+async def until(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+def workers(scenario):
+    # Unix socket paths are short; keep them out of pytest's deep tmp_path
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'cache.sock')
+        caches = [SharedCache(path, max_bytes=1024, backoff=0.05) for _ in range(2)]
+
+        async def run():
+            try:
+                await scenario(*caches)
+            finally:
+                for cache in caches:
+                    await cache.stop()
+
+        asyncio.run(run())
+
+
+def test_invalidation_reaches_other_workers_and_bumps_the_generation():
+    async def scenario(leader, follower):
+        dropped = []
+        follower.on_invalidate('search', lambda: dropped.append('search'))
+        await leader.start()
+        await follower.start()
+        await until(lambda: dropped)  # Subscribing starts from a clean slate
+        dropped.clear()
+
+        await follower.set('search', b'page', b'v1', ttl=60, generation=follower.generation('search'))
+        assert (await leader.get('search', b'page'))[0] == b'v1'
+        await leader.invalidate('search')
+        await until(lambda: follower.generation('search') == 1)
+        assert dropped == ['search']
+        assert await follower.get('search', b'page') is None
+        await follower.set('search', b'page', b'late', ttl=60, generation=0)
+        assert await follower.get('search', b'page') is None
+
+    workers(scenario)
+
+
+def test_follower_takes_over_when_the_leader_stops():
+    async def scenario(leader, follower):
+        elected = []
+        leader.on_lead(lambda: elected.append('leader'))
+        follower.on_lead(lambda: elected.append('follower'))
+        await leader.start()
+        await follower.start()
+        assert leader.leader and not follower.leader
+        await leader.set('search', b'page', b'v1', ttl=60, generation=0)
+
+        await leader.stop()
+        await until(lambda: follower.leader)
+        assert elected == ['leader', 'follower']
+        # The new leader starts empty; Mongo stays the durable tier
+        assert await follower.get('search', b'page') is None
+        await follower.set('search', b'page', b'v2', ttl=60, generation=0)
+        assert (await follower.get('search', b'page'))[0] == b'v2'
+
+    workers(scenario)
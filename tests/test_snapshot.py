@@ -0,0 +1,62 @@
+import asyncio
+
+from server import CatalogSnapshot, SnapshotWriter
+
+ITEMS = [
+    {'content_type': 'movie', 'id': 42, 'title': 'Harbor Lights', 'vote_count': 7},
+    {'content_type': 'tv', 'id': 7, 'title': 'Night Shift', 'vote_count': 3},
+    {'content_type': 'movie', 'id': 5, 'title': 'Quiet Water', 'vote_count': 11},
+]
+
+
+def docs(items):
+    return [(f"{item['content_type']}:{item['id']}", item) for item in items]
+
+
+def test_round_trip_through_the_mapped_file(tmp_path):
+    path = tmp_path / 'catalog.snapshot'
+    trending = [{'id': 42, 'content_type': 'movie'}]
+    availability = {'movie:42': {'netflix': 'hd'}}
+    metadata = {'genres': {'movie': {'18': 'Drama'}}}
+    assert CatalogSnapshot.write(path, docs(ITEMS) + [('person:1', {'id': 1})], None, trending, availability, metadata) == 3
+
+    snapshot = CatalogSnapshot.open(path)
+    assert len(snapshot) == 3
+    assert snapshot.get('movie:42') == ITEMS[0] and snapshot.get('tv:42') is None
+    assert [item['id'] for item in snapshot.items()] == [5, 42, 7]
+    assert (snapshot.trending(), snapshot.availability(), snapshot.metadata()) == (trending, availability, metadata)
+
+    # Items passed as None are copied from the previous file
+    rewritten = tmp_path / 'rewritten.snapshot'
+    CatalogSnapshot.write(rewritten, [('movie:42', None), ('tv:7', {**ITEMS[1], 'vote_count': 4})], snapshot, [], {}, None)
+    copy = CatalogSnapshot.open(rewritten)
+    assert copy.get('movie:42') == ITEMS[0] and copy.get('tv:7')['vote_count'] == 4 and copy.get('movie:5') is None
+    assert copy.metadata() is None
+    copy.close()
+    snapshot.close()
+
+
+def test_truncated_or_foreign_files_are_ignored(tmp_path):
+    path = tmp_path / 'catalog.snapshot'
+    CatalogSnapshot.write(path, docs(ITEMS), None, [], {}, None)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    assert CatalogSnapshot.open(path) is None
+    path.write_bytes(b'NOTSNAP!' + data[8:])
+    assert CatalogSnapshot.open(path) is None
+    assert CatalogSnapshot.open(tmp_path / 'missing.snapshot') is None
+
+
+def test_only_a_started_writer_saves_on_stop(tmp_path):
+    path = tmp_path / 'catalog.snapshot'
+
+    async def scenario(start):
+        writer = SnapshotWriter(path, interval=3600, collect=lambda: (docs(ITEMS), None, [], {}, None))
+        writer.mark_dirty()
+        if start:
+            writer.start()
+        await writer.stop()
+        return writer.writes
+
+    assert asyncio.run(scenario(start=False)) == 0 and not path.exists()
+    assert asyncio.run(scenario(start=True)) == 1 and CatalogSnapshot.open(path) is not None
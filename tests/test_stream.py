@@ -0,0 +1,64 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from server import SearchPageUnreachable
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, 'search_cache', server.TTLCache('search', ttl=300))
+    monkeypatch.setattr(server, 'local_search', lambda *args: None)
+
+    async def get_search_page(key):
+        return None
+
+    monkeypatch.setattr(server.catalog, 'get_search_page', get_search_page)
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def unreachable(*args):
+    raise SearchPageUnreachable("Page 12 needs more than 10 upstream pages; reached page 3")
+
+
+def frames(response):
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_streamed_replay_reports_errors_as_a_status(client, monkeypatch):
+    async def search_content(*args):
+        unreachable()
+
+    monkeypatch.setattr(server.tmdb_client, 'search_content', search_content)
+    params = {'q': 'fog', 'platform': 'tubi', 'page': 12}
+    assert client.get('/api/search', params=params).status_code == 422
+    assert client.get('/api/search', params={**params, 'stream': 'ndjson'}).status_code == 422
+
+
+def test_streamed_replay_of_an_offline_page(client):
+    response = client.get('/api/search', params={'q': 'dark knight', 'stream': 'ndjson'})
+    events = frames(response)
+    assert response.status_code == 200
+    assert events[0]['type'] == 'header' and events[-1]['type'] == 'end'
+    assert [event['position'] for event in events if event['type'] == 'item'] == list(range(events[0]['count']))
+
+
+def test_live_stream_failure_after_headers_ends_with_an_error_frame(client, monkeypatch):
+    async def stream_search(*args):
+        raise RuntimeError('TMDB down')
+        yield
+
+    async def search_content(*args):
+        unreachable()
+
+    monkeypatch.setattr(server.tmdb_client, 'api_key', 'key')
+    monkeypatch.setattr(server.tmdb_client, 'mode', 'live')
+    monkeypatch.setattr(server.tmdb_client, 'stream_search', stream_search)
+    monkeypatch.setattr(server.tmdb_client, 'search_content', search_content)
+    response = client.get('/api/search', params={'q': 'fog', 'stream': 'ndjson'})
+    assert response.status_code == 200
+    assert frames(response) == [{'type': 'error', 'status': 422, 'detail': frames(response)[0]['detail']}]
+    assert 'next_cursor' in frames(response)[0]['detail']
@@ -0,0 +1,90 @@
+from fastapi.testclient import TestClient
+
+import server
+from server import CatalogSnapshot, SuggestIndex
+
+
+def title(content_id, name, votes=10, content_type='movie'):
+    return {'id': content_id, 'title': name, 'content_type': content_type, 'vote_count': votes}
+
+
+def suggested(index, query, **kwargs):
+    return [item['title'] for item in index.suggest(query, **kwargs)]
+
+
+def test_bulk_load_replaces_renamed_titles():
+    index = SuggestIndex()
+    index.add_many([title(1, 'Zebra Story')])
+    index.add_many([title(1, 'Apple Story')] + [title(n, f'Mango {n}') for n in range(2, 10)])
+    assert suggested(index, 'zeb') == []
+    assert suggested(index, 'app') == ['Apple Story']
+    assert [entry for entry in index.entries if entry[1] == 'movie:1'] == [('apple story', 'movie:1'),
+                                                                           ('story', 'movie:1')]
+    assert index.entries == sorted(index.entries)
+
+
+def test_bulk_load_keeps_the_last_copy_of_a_repeated_title():
+    index = SuggestIndex()
+    index.add_many([title(1, 'Kilo'), title(1, 'Lima')])
+    assert index.entries == [('lima', 'movie:1')]
+    assert suggested(index, 'kil') == []
+
+
+def test_long_prefixes_are_cached_and_kept_current():
+    index = SuggestIndex()
+    index.add_many([title(n, f'The Alpha {n}', votes=n) for n in range(1, 40)])
+    assert suggested(index, 'the alpha 3', limit=3) == ['The Alpha 39', 'The Alpha 38', 'The Alpha 37']
+    assert 'the alpha 3' in index._top
+
+    index.add(title(100, 'The Alpha 300', votes=500))
+    assert suggested(index, 'the alpha 3', limit=2) == ['The Alpha 300', 'The Alpha 39']
+    index.remove('movie:100')
+    assert suggested(index, 'the alpha 3', limit=1) == ['The Alpha 39']
+
+
+def test_prefix_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(SuggestIndex, 'MAX_CACHED_PREFIXES', 2)
+    index = SuggestIndex()
+    index.add_many([title(1, 'Alpha'), title(2, 'Bravo'), title(3, 'Charlie')])
+    for query in ('a', 'b', 'a', 'c'):
+        index.suggest(query)
+    assert list(index._top) == ['a', 'c']
+
+
+def test_offline_catalog_feeds_suggestions(monkeypatch):
+    monkeypatch.setattr(server, 'suggest_index', SuggestIndex())
+    with TestClient(server.app) as client:
+        suggestions = client.get('/api/suggest', params={'q': 'the dark'}).json()['suggestions']
+    assert 'The Dark Knight' in [item['title'] for item in suggestions]
+
+
+def mapped_snapshot(tmp_path, items):
+    path = tmp_path / 'catalog.snapshot'
+    CatalogSnapshot.write(path, [(f"{item['content_type']}:{item['id']}", item) for item in items], None, [], {}, None)
+    return CatalogSnapshot.open(path)
+
+
+def test_snapshot_titles_are_served_from_the_mapped_file(tmp_path, monkeypatch):
+    snapshot = mapped_snapshot(tmp_path, [title(n, f'Snapshot Title {n}', votes=n) for n in range(1, 5001)])
+    parsed = []
+    get = snapshot.get
+    monkeypatch.setattr(snapshot, 'get', lambda key: parsed.append(key) or get(key))
+    index = SuggestIndex()
+    index.attach(snapshot)
+    assert len(index) == 5000 and index.entries == []
+    assert suggested(index, 'snapshot title 500', limit=1) == ['Snapshot Title 5000']
+    assert parsed == ['movie:5000']
+    snapshot.close()
+
+
+def test_updated_title_masks_its_snapshot_entry(tmp_path):
+    snapshot = mapped_snapshot(tmp_path, [title(1, 'Harbor Lights', votes=5), title(2, 'Harbor Nights', votes=9)])
+    index = SuggestIndex()
+    index.attach(snapshot)
+    assert suggested(index, 'harbor') == ['Harbor Nights', 'Harbor Lights']
+    index.add(title(2, 'Quiet Nights', votes=9))
+    assert suggested(index, 'harbor') == ['Harbor Lights']
+    assert suggested(index, 'nights') == ['Quiet Nights']
+    index.remove('movie:1')
+    assert suggested(index, 'harbor') == [] and len(index) == 1
+    snapshot.close()
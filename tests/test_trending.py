@@ -0,0 +1,51 @@
+import asyncio
+
+from server import TrendingMaterializer
+
+
+def movie(content_id):
+    return {'id': content_id, 'title': f'Movie {content_id}', 'content_type': 'movie'}
+
+
+def run_for(materializer, seconds):
+    async def scenario():
+        materializer.start()
+        await asyncio.sleep(seconds)
+        await materializer.stop()
+    asyncio.run(scenario())
+
+
+def test_failing_refresh_hook_does_not_stop_the_schedule():
+    async def fetch():
+        return [movie(1)]
+
+    async def on_refresh(items):
+        raise RuntimeError('mongo down')
+
+    materializer = TrendingMaterializer(fetch, refresh_interval=0.01, retry_interval=0.01, on_refresh=on_refresh)
+    run_for(materializer, 0.1)
+    assert materializer.refreshes > 1 and materializer.failures == 0
+
+
+def test_malformed_refresh_keeps_the_last_snapshot_and_retries():
+    responses = [[movie(1)], [{'id': 2}], [movie(3)]]
+
+    async def fetch():
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    materializer = TrendingMaterializer(fetch, refresh_interval=0.01, retry_interval=0.01)
+    run_for(materializer, 0.1)
+    assert materializer.failures == 1 and materializer.refreshes > 1
+    assert materializer.items == [movie(3)]
+
+
+def test_malformed_list_is_not_swapped_in():
+    materializer = TrendingMaterializer(None, refresh_interval=60, retry_interval=60)
+    materializer.load([movie(1)])
+
+    async def fetch():
+        return [{'id': 2}]
+
+    materializer.fetch = fetch
+    assert asyncio.run(materializer._refresh()) is False
+    assert materializer.items == [movie(1)] and materializer.last_error
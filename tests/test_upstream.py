@@ -0,0 +1,240 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import server
+from server import CircuitBreaker, RetryBudget, TokenBucket, UpstreamClient, UpstreamUnavailable
+
+URL = 'https://api.example.test/3/movie/1'
+
+
+def make_client(handler, **kwargs) -> UpstreamClient:
+    options = {'rate_limit': 1000, 'rate_burst': 1000, 'breaker_threshold': 2, 'breaker_cooldown': 0.05,
+               'max_retries': 0, 'hedge': False}
+    client = UpstreamClient(**{**options, **kwargs})
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def open_breaker(client: UpstreamClient) -> CircuitBreaker:
+    breaker = client._host(URL).breaker
+    for _ in range(breaker.threshold):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    return breaker
+
+
+def ok(request):
+    return httpx.Response(200, json={})
+
+
+# --- TokenBucket ---
+
+def test_token_bucket_allows_burst_then_refuses():
+    bucket = TokenBucket(rate=1, capacity=3)
+    assert [bucket.try_acquire() for _ in range(4)] == [True, True, True, False]
+
+
+def test_token_bucket_acquire_waits_for_refill():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=1)
+        assert await bucket.acquire(max_wait=0)
+        started = time.monotonic()
+        assert await bucket.acquire(max_wait=1)
+        return time.monotonic() - started, bucket.throttled
+
+    waited, throttled = asyncio.run(scenario())
+    assert waited >= 0.015
+    assert throttled == 1
+
+
+def test_token_bucket_rejects_when_wait_exceeds_limit():
+    async def scenario():
+        bucket = TokenBucket(rate=1, capacity=1)
+        assert await bucket.acquire(max_wait=0)
+        return await bucket.acquire(max_wait=0.1), bucket.rejected
+
+    assert asyncio.run(scenario()) == (False, 1)
+
+
+# --- RetryBudget ---
+
+def test_retry_budget_spends_and_refills_by_ratio():
+    budget = RetryBudget(ratio=0.5, max_balance=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    assert budget.exhausted == 1
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_retry_budget_balance_is_capped():
+    budget = RetryBudget(ratio=1, max_balance=2)
+    for _ in range(10):
+        budget.deposit()
+    assert budget.balance == 2
+
+
+# --- CircuitBreaker ---
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker(threshold=3, cooldown=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_breaker_half_open_lets_one_probe_through():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.record_failure()
+    breaker._opened_at -= 60
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_cancelled_probe_releases_half_open_slot():
+    async def scenario():
+        async def hang(request):
+            await asyncio.sleep(10)
+
+        client = make_client(hang)
+        breaker = open_breaker(client)
+        await asyncio.sleep(0.06)
+        probe = asyncio.create_task(client.get(URL))
+        await asyncio.sleep(0.01)
+        assert breaker.probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert not breaker.probing
+        assert breaker.state == CircuitBreaker.OPEN
+        # After the next cooldown a fresh probe gets through and closes the circuit
+        await asyncio.sleep(0.06)
+        client._client = httpx.AsyncClient(transport=httpx.MockTransport(ok))
+        response = await client.get(URL)
+        return response.status_code, breaker.state
+
+    assert asyncio.run(scenario()) == (200, CircuitBreaker.CLOSED)
+
+
+def test_rate_limited_probe_releases_half_open_slot():
+    async def scenario():
+        client = make_client(ok, rate_limit=0.001, rate_burst=1, queue_timeout=0)
+        breaker = open_breaker(client)
+        client._host(URL).bucket.tokens = 0
+        await asyncio.sleep(0.06)
+        with pytest.raises(UpstreamUnavailable):
+            await client.get(URL)
+        return breaker.probing, breaker.state
+
+    assert asyncio.run(scenario()) == (False, CircuitBreaker.OPEN)
+
+
+# --- UpstreamClient retries and hedging ---
+
+def test_retries_retryable_status_then_succeeds():
+    calls = []
+
+    def flaky(request):
+        calls.append(request)
+        return httpx.Response(503 if len(calls) == 1 else 200, headers={'Retry-After': '0'})
+
+    async def scenario():
+        client = make_client(flaky, max_retries=2, breaker_threshold=5)
+        return (await client.get(URL)).status_code, client._host(URL).retries
+
+    assert asyncio.run(scenario()) == (200, 1)
+    assert len(calls) == 2
+
+
+def test_gives_up_with_upstream_unavailable_after_retries():
+    async def scenario():
+        client = make_client(lambda request: httpx.Response(500, headers={'Retry-After': '0'}),
+                             max_retries=1, breaker_threshold=5)
+        with pytest.raises(UpstreamUnavailable):
+            await client.get(URL)
+        return client._host(URL).retries
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_slow_request_is_hedged_and_fast_copy_wins():
+    calls = []
+
+    async def first_slow(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={'copy': len(calls)})
+
+    async def scenario():
+        client = make_client(first_slow, hedge=True, hedge_min_delay=0.01)
+        host = client._host(URL)
+        for _ in range(host.latency.min_samples):
+            host.latency.record(0.001)
+        started = time.monotonic()
+        response = await client.get(URL)
+        return response.json(), host.hedges, host.hedge_wins, time.monotonic() - started
+
+    body, hedges, wins, elapsed = asyncio.run(scenario())
+    assert body == {'copy': 2}
+    assert (hedges, wins) == (1, 1)
+    assert elapsed < 0.5
+
+
+def test_hedge_needs_retry_budget():
+    async def slow(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200)
+
+    async def scenario():
+        client = make_client(slow, hedge=True, hedge_min_delay=0.01, retry_budget=0, rate_limit=0.001)
+        client.budget.balance = 0
+        host = client._host(URL)
+        for _ in range(host.latency.min_samples):
+            host.latency.record(0.001)
+        await client.get(URL)
+        return host.hedges, host.bucket.tokens
+
+    hedges, tokens = asyncio.run(scenario())
+    # Only the first attempt took a rate-limit token
+    assert hedges == 0 and tokens > 998.5
+
+
+def test_hedge_without_a_rate_limit_token_keeps_the_retry_budget():
+    async def slow(request):
+        await asyncio.sleep(0.05)
+        return httpx.Response(200)
+
+    async def scenario():
+        client = make_client(slow, hedge=True, hedge_min_delay=0.01, rate_limit=0.001, rate_burst=1)
+        host = client._host(URL)
+        for _ in range(host.latency.min_samples):
+            host.latency.record(0.001)
+        balance = client.budget.balance
+        await client.get(URL)
+        return host.hedges, client.budget.balance - balance, client.budget.spent
+
+    hedges, change, spent = asyncio.run(scenario())
+    assert hedges == 0 and spent == 0 and change >= 0